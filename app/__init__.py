@@ -1,25 +1,97 @@
 from flask import Flask, render_template
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
+from sqlalchemy import event
 
-db = SQLAlchemy()
+from app.routing import READ_BIND, RoutingSession, init_read_routing
+
+db = SQLAlchemy(session_options={"class_": RoutingSession})
 login_manager = LoginManager()
 
 
+def _apply_sqlite_pragmas(engine, pragmas):
+    """Run ``PRAGMA name = value`` on every new connection of ``engine``."""
+
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+        cursor.close()
+
+
 def create_app(config_object="app.config.Config"):
     app = Flask(__name__)
     app.config.from_object(config_object)
+    if not app.config.get("SECRET_KEY"):
+        raise RuntimeError(
+            "SECRET_KEY is not set; the production profile reads it from the "
+            "environment and will not sign sessions with a public default"
+        )
+    read_uri = app.config.get("SQLALCHEMY_READ_URI")
+    if read_uri:
+        app.config["SQLALCHEMY_BINDS"] = {
+            **app.config.get("SQLALCHEMY_BINDS", {}),
+            READ_BIND: read_uri,
+        }
 
     db.init_app(app)
     login_manager.init_app(app)
     login_manager.login_view = "auth.login"
 
+    from app.cache import TTLCache
+    from app.live import Broker, Relay
+
+    app.extensions["user_cache"] = TTLCache(
+        maxsize=app.config["USER_CACHE_SIZE"], ttl=app.config["USER_CACHE_TTL"]
+    )
+    app.extensions["card_cache"] = TTLCache(maxsize=app.config["CARD_CACHE_SIZE"])
+    broker = app.extensions["live"] = Broker(
+        queue_size=app.config["LIVE_QUEUE_SIZE"],
+        replay_size=app.config["LIVE_REPLAY_SIZE"],
+    )
+    relay = app.extensions["live_relay"] = Relay(
+        app,
+        broker,
+        interval=app.config["LIVE_POLL_SECONDS"],
+        retention=app.config["LIVE_EVENT_RETENTION_SECONDS"],
+        backlog=app.config["LIVE_REPLAY_SIZE"],
+    )
+
     # import models so metadata is registered
     from app import models  # noqa: F401
 
-    # create tables on startup (dev only, fine for this class)
     with app.app_context():
-        db.create_all()
+        pragmas = app.config.get("SQLITE_PRAGMAS")
+        if pragmas and db.engine.dialect.name == "sqlite":
+            _apply_sqlite_pragmas(db.engine, pragmas)
+            if READ_BIND in db.engines:
+                # the journal mode belongs to the file; a read-only
+                # connection may not change it
+                _apply_sqlite_pragmas(
+                    db.engines[READ_BIND],
+                    {k: v for k, v in pragmas.items() if k != "journal_mode"},
+                )
+        from app.migrations import check_schema
+        from app.search import search_index_available
+
+        schema_ok = check_schema(app)
+        app.extensions["search"] = schema_ok and search_index_available()
+        if schema_ok and app.config.get("SEED_DEMO_DATA"):
+            from app.seed import seed_demo_data
+
+            seed_demo_data()
+
+    if not schema_ok:
+        # `flask db-upgrade` still works; the site waits for it
+        @app.before_request
+        def schema_out_of_date():
+            return "Database schema is out of date; run `flask db-upgrade`.", 503
+
+    # pick up events other processes publish, and hand this request's own
+    # events to its streams once they are committed
+    app.before_request(relay.start)
+    app.after_request(relay.after_request)
 
     from app.auth.routes import auth_bp
     from app.main.routes import main_bp
@@ -27,6 +99,20 @@ def create_app(config_object="app.config.Config"):
     app.register_blueprint(auth_bp)
     app.register_blueprint(main_bp)
 
+    if app.config["JOB_RUNNER"] == "thread":
+        from app.jobs import JobRunner
+
+        runner = app.extensions["jobs"] = JobRunner(app, app.config["JOB_WORKERS"])
+        # resume jobs a previous process left queued or half-run
+        app.before_request(runner.start)
+
+    from app.commands import register_commands
+    from app.instrumentation import init_instrumentation
+
+    register_commands(app)
+    init_instrumentation(app)
+    init_read_routing(app)
+
     @app.errorhandler(404)
     def not_found(error):
         return (
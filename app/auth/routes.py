@@ -6,27 +6,8 @@ from app.models import User
 from app import db
 
 
-def _ensure_demo_users():
-    """Create a couple of demo users if DB is empty.
-
-    - prof@example.com  (instructor)
-    - ta@example.com    (ta)
-    - student@example.com (student)
-    """
-    if User.query.first() is not None:
-        return
-
-    prof = User(email="prof@example.com", role="instructor")
-    ta = User(email="ta@example.com", role="ta")
-    student = User(email="student@example.com", role="student")
-    db.session.add_all([prof, ta, student])
-    db.session.commit()
-
-
 @auth_bp.route("/login", methods=["GET", "POST"])
 def login():
-    _ensure_demo_users()
-
     if current_user.is_authenticated:
         return redirect(url_for("main.index"))
 
@@ -0,0 +1,157 @@
+import os
+import re
+import signal
+import threading
+
+import click
+
+from app import db, migrations
+from app.importer import FORMATS, guess_format, import_tasks
+from app.jobs import run_pending_jobs, worker_name
+from app.models import Course, CourseTaskRollup, Task
+from app.search import rebuild_search_index
+from app.seed import seed_demo_data
+
+
+def register_commands(app):
+    """Attach the maintenance commands to ``flask``."""
+
+    @app.cli.command("rebuild-analytics")
+    def rebuild_analytics():
+        """Resync the per-course analytics rollups from the task table."""
+        CourseTaskRollup.rebuild()
+        db.session.commit()
+        click.echo(f"Rebuilt analytics for {Course.query.count()} course(s).")
+
+    @app.cli.command("rebuild-search")
+    def rebuild_search():
+        """Repopulate the full-text search index from tasks and comments."""
+        if not app.extensions.get("search"):
+            raise click.ClickException("Full-text search needs SQLite with FTS5.")
+        rebuild_search_index()
+        click.echo(f"Indexed {Task.query.count()} task(s) and their comments.")
+
+    @app.cli.command("seed-demo")
+    def seed_demo():
+        """Load the demo users, courses and tasks into an empty database."""
+        if seed_demo_data():
+            click.echo("Demo data created.")
+        else:
+            click.echo("Courses already exist; nothing to seed.")
+
+    @app.cli.command("import-tasks")
+    @click.argument("path", type=click.Path(exists=True, dir_okay=False))
+    @click.option(
+        "--course", "course_code", help="Import every row into this course code."
+    )
+    @click.option(
+        "--format",
+        "fmt",
+        type=click.Choice(FORMATS),
+        help="Defaults to the file extension.",
+    )
+    def import_tasks_command(path, course_code, fmt):
+        """Bulk-import tasks from a CSV or JSON Lines file."""
+        course = None
+        if course_code:
+            course = Course.query.filter_by(code=course_code).first()
+            if course is None:
+                raise click.ClickException(f"No course with code {course_code!r}.")
+        with open(path, "rb") as stream:
+            report = import_tasks(stream, fmt or guess_format(path), course=course)
+        for line, message in report.errors:
+            click.echo(f"line {line}: {message}", err=True)
+        if not report.ok:
+            raise click.ClickException(
+                f"{report.error_count} invalid row(s); nothing was imported."
+            )
+        click.echo(f"Imported {report.created} task(s).")
+
+    @app.cli.command("jobs-worker")
+    @click.option("--once", is_flag=True, help="Drain the queue, then exit.")
+    @click.option(
+        "--poll",
+        default=2.0,
+        show_default=True,
+        help="Seconds to wait between checks of an empty queue.",
+    )
+    def jobs_worker(once, poll):
+        """Run queued background jobs; SIGTERM stops after the current job."""
+        stop = threading.Event()
+        previous = {
+            signum: signal.signal(signum, lambda *_: stop.set())
+            for signum in (signal.SIGINT, signal.SIGTERM)
+        }
+        name = worker_name("cli")
+        total = 0
+        try:
+            while not stop.is_set():
+                total += run_pending_jobs(name, stop)
+                if once:
+                    break
+                stop.wait(poll)
+        finally:
+            for signum, handler in previous.items():
+                signal.signal(signum, handler)
+        click.echo(f"Ran {total} job(s).")
+
+    @app.cli.command("db-upgrade")
+    @click.option("--to", "target", type=int, help="Stop at this revision.")
+    def db_upgrade(target):
+        """Apply pending schema migrations (default: up to the latest)."""
+        try:
+            applied = migrations.upgrade(target)
+        except migrations.MigrationError as exc:
+            raise click.ClickException(str(exc))
+        for module in applied:
+            click.echo(f"Applied {module.revision}: {module.description}")
+        click.echo(f"Database at revision {migrations.current_revision()}.")
+
+    @app.cli.command("db-downgrade")
+    @click.argument("target", type=int)
+    def db_downgrade(target):
+        """Revert schema migrations above revision TARGET."""
+        try:
+            applied = migrations.downgrade(target)
+        except migrations.MigrationError as exc:
+            raise click.ClickException(str(exc))
+        for module in applied:
+            click.echo(f"Reverted {module.revision}: {module.description}")
+        click.echo(f"Database at revision {migrations.current_revision()}.")
+
+    @app.cli.command("db-current")
+    def db_current():
+        """Show the database's schema revision and the latest one."""
+        current = migrations.current_revision()
+        head = migrations.head()
+        state = "up to date" if current == head else "needs `flask db-upgrade`"
+        click.echo(f"Database at revision {current}; latest is {head} ({state}).")
+
+    @app.cli.command("db-revision")
+    @click.argument("message")
+    def db_revision(message):
+        """Create an empty migration file for the next revision."""
+        number = migrations.head() + 1
+        slug = re.sub(r"\W+", "_", message.lower()).strip("_")[:40] or "revision"
+        from app.migrations import versions
+
+        path = os.path.join(os.path.dirname(versions.__file__), f"{number:04d}_{slug}.py")
+        with open(path, "x", encoding="utf-8") as out:
+            out.write(_REVISION_TEMPLATE.format(message=message, number=number))
+        click.echo(f"Created {path}")
+
+
+_REVISION_TEMPLATE = '''"""{message}"""
+
+revision = {number}
+description = {message!r}
+
+
+def upgrade(conn):
+    # new databases already match the models here; keep this idempotent
+    raise NotImplementedError
+
+
+def downgrade(conn):
+    raise NotImplementedError
+'''
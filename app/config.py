@@ -1,7 +1,121 @@
 import os
+
 basedir = os.path.abspath(os.path.dirname(__file__))
 
+
+def _env_int(name, default):
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+
+# request threads per web process; gunicorn.conf.py reads the same variable
+_THREADS = _env_int("MICROCANVAS_THREADS", 16)
+
+
 class Config:
     SECRET_KEY = "development-key"
-    SQLALCHEMY_DATABASE_URI = "sqlite:///" + os.path.join(basedir, "microcanvas.db")
+    SQLALCHEMY_DATABASE_URI = os.environ.get(
+        "DATABASE_URL", "sqlite:///" + os.path.join(basedir, "microcanvas.db")
+    )
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # read-only copy for GET requests: a replica, or locally the same SQLite
+    # file opened read-only, "sqlite:///file:/path/to.db?mode=ro&uri=true";
+    # unset sends everything to DATABASE_URL
+    SQLALCHEMY_READ_URI = os.environ.get("DATABASE_READ_URL")
+    # after a write, that browser reads from the primary for this long, so
+    # replica lag never hides its own change
+    READ_YOUR_WRITES_SECONDS = _env_int("READ_YOUR_WRITES_SECONDS", 5)
+    # PRAGMA name -> value, run on every new SQLite connection
+    SQLITE_PRAGMAS = {}
+    # seed demo data once at startup; production leaves this off and runs
+    # `flask seed-demo` explicitly if it wants the demo accounts at all
+    SEED_DEMO_DATA = os.environ.get("MICROCANVAS_SEED_DEMO", "1") == "1"
+    # apply pending schema migrations at startup; production runs
+    # `flask db-upgrade` once per deploy and workers only check the revision
+    SCHEMA_AUTO_UPGRADE = os.environ.get("MICROCANVAS_AUTO_MIGRATE", "1") == "1"
+    # upcoming deadlines listed on the dashboard
+    DASHBOARD_DEADLINES = 5
+    # cards per board column before a "Load more" link
+    BOARD_PAGE_SIZE = 25
+    # login snapshots cached per process; the TTL bounds how long another
+    # worker can serve a stale role after it changes
+    USER_CACHE_SIZE = 2048
+    USER_CACHE_TTL = 60
+    # rendered task cards kept per process, keyed by task version and role
+    CARD_CACHE_SIZE = 4096
+    # rows per executemany chunk for bulk task imports
+    IMPORT_BATCH_SIZE = 1000
+    # rows fetched per server-side cursor batch when streaming exports
+    EXPORT_BATCH_SIZE = 1000
+    # pooled connections a production worker opens before taking traffic;
+    # one per request thread (see gunicorn.conf.py)
+    WARMUP_CONNECTIONS = _THREADS
+    # per-request query counts/timings in Server-Timing and the slow log
+    SQL_INSTRUMENTATION = True
+    SLOW_REQUEST_MS = _env_int("SLOW_REQUEST_MS", 500)
+    SLOW_QUERY_SAMPLES = 3
+    # serve /debug/sql outside debug mode too
+    SQL_DEBUG_PAGE = False
+    # full-text search results per page
+    SEARCH_PAGE_SIZE = 20
+    # live board streams: events buffered per client before it is dropped,
+    # events kept per board for Last-Event-ID catch-up, seconds between
+    # keepalives, and seconds before a stream closes so the browser
+    # reconnects (and a worker thread is not held forever)
+    LIVE_QUEUE_SIZE = 100
+    LIVE_REPLAY_SIZE = 100
+    LIVE_HEARTBEAT_SECONDS = 15
+    LIVE_STREAM_SECONDS = 300
+    # every open board holds one request thread for its whole stream; past
+    # this many per process new boards are served without live updates, so
+    # a quarter of the threads are always left for pages
+    LIVE_MAX_STREAMS = _env_int("LIVE_MAX_STREAMS", _THREADS * 3 // 4)
+    # seconds between checks for events published by other processes (0:
+    # only this process's own events), and how long events are kept
+    LIVE_POLL_SECONDS = 1
+    LIVE_EVENT_RETENTION_SECONDS = 3600
+    # background jobs: "thread" runs them in a pool inside each web process,
+    # "external" only queues them for `flask jobs-worker`
+    JOB_RUNNER = os.environ.get("MICROCANVAS_JOB_RUNNER", "thread")
+    JOB_WORKERS = 2
+    # uploads waiting for a worker and finished export files
+    JOB_DIR = os.environ.get("MICROCANVAS_JOB_DIR", os.path.join(basedir, "jobs"))
+    # a running job that has not reported for this long is requeued, and
+    # gives up after this many tries
+    JOB_STALE_SECONDS = 600
+    JOB_MAX_ATTEMPTS = 3
+    # task imports larger than this run as a background job
+    IMPORT_BACKGROUND_BYTES = 1024 * 1024
+
+
+class ProductionConfig(Config):
+    """Settings for real deployments; select with MICROCANVAS_CONFIG.
+
+    The database URI and pool come from the environment, so the same
+    profile runs against the bundled SQLite file or a server database.
+    """
+
+    # no fallback: the development key is public, so sessions and CSRF
+    # tokens signed with it could be forged; create_app refuses to start
+    SECRET_KEY = os.environ.get("SECRET_KEY")
+    SEED_DEMO_DATA = os.environ.get("MICROCANVAS_SEED_DEMO", "0") == "1"
+    SCHEMA_AUTO_UPGRADE = os.environ.get("MICROCANVAS_AUTO_MIGRATE", "0") == "1"
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        "pool_size": _env_int("DB_POOL_SIZE", 10),
+        "max_overflow": _env_int("DB_MAX_OVERFLOW", 20),
+        "pool_timeout": _env_int("DB_POOL_TIMEOUT", 30),
+        "pool_recycle": _env_int("DB_POOL_RECYCLE", 1800),
+        "pool_pre_ping": True,
+    }
+    # WAL lets readers run alongside the single writer, and NORMAL sync is
+    # durable across application crashes in WAL mode. Writers wait up to
+    # busy_timeout ms for the lock instead of failing with "database is
+    # locked". Sizes: 256 MiB of mmap, 64 MiB page cache (negative = KiB).
+    SQLITE_PRAGMAS = {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": _env_int("SQLITE_BUSY_TIMEOUT_MS", 5000),
+        "mmap_size": 256 * 1024 * 1024,
+        "cache_size": -64 * 1024,
+        "temp_store": "MEMORY",
+    }
@@ -1,5 +1,9 @@
 from flask_wtf import FlaskForm
+from flask_wtf.file import FileField, FileRequired
 from wtforms import (
+    FieldList,
+    Form,
+    FormField,
     StringField,
     PasswordField,
     BooleanField,
@@ -28,11 +32,39 @@ class TaskForm(FlaskForm):
     submit = SubmitField("Save Task")
 
 
+class TaskImportForm(FlaskForm):
+    file = FileField("CSV or JSON Lines file", validators=[FileRequired()])
+    format = SelectField(
+        "Format",
+        choices=[("auto", "From file name"), ("csv", "CSV"), ("jsonl", "JSON Lines")],
+    )
+    submit = SubmitField("Import tasks")
+
+
 class TaskStatusForm(FlaskForm):
     status = SelectField("Status", choices=[], validators=[DataRequired()])
     submit = SubmitField("Update")
 
 
+class TaskStatusEntryForm(Form):
+    """One (task, status) pair inside BulkTaskStatusForm."""
+
+    task_id = IntegerField("Task", validators=[DataRequired()])
+    status = SelectField("Status", choices=[], validators=[DataRequired()])
+
+
+class BulkTaskStatusForm(FlaskForm):
+    # FieldList silently drops entries past max_entries, so the route
+    # rejects larger batches before binding
+    MAX_UPDATES = 500
+
+    # posted as updates-0-task_id, updates-0-status, updates-1-task_id, ...
+    updates = FieldList(
+        FormField(TaskStatusEntryForm), min_entries=1, max_entries=MAX_UPDATES
+    )
+    submit = SubmitField("Move tasks")
+
+
 class TaskCommentForm(FlaskForm):
     body = TextAreaField("Comment", validators=[DataRequired()])
     submit = SubmitField("Post feedback")
@@ -51,3 +83,9 @@ class TeamForm(FlaskForm):
 class TeamMemberForm(FlaskForm):
     user_id = SelectField("Add member", coerce=int, validators=[DataRequired()])
     submit = SubmitField("Add to team")
+
+
+class JobSubmitForm(FlaskForm):
+    """CSRF-only form behind the "run in background" buttons."""
+
+    submit = SubmitField("Run in background")
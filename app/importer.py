@@ -0,0 +1,194 @@
+"""Streaming bulk import of tasks from CSV or JSON Lines.
+
+Rows are read one at a time, validated with the same rules as TaskForm and
+inserted with executemany in IMPORT_BATCH_SIZE chunks, so memory stays flat
+however large the file is. Recognised columns: ``title``, ``description``,
+``due_date`` (YYYY-MM-DD), ``points``, ``team`` (team name) and, when no
+course is fixed by the caller, ``course`` (course code).
+
+The import is all-or-nothing: rows are inserted as they validate, and the
+transaction is rolled back at the end if any row was rejected.
+"""
+import csv
+import io
+import json
+
+from flask import current_app
+from sqlalchemy import insert, select, true
+from werkzeug.datastructures import MultiDict
+
+from app import db
+from app.forms import TaskForm
+from app.models import Course, CourseTaskRollup, Task, Team
+
+FORMATS = ("csv", "jsonl")
+
+# errors past this many are counted but not kept
+MAX_REPORTED_ERRORS = 50
+
+
+class ImportReport:
+    def __init__(self):
+        self.created = 0
+        self.error_count = 0
+        self.errors = []  # (line number, message)
+
+    @property
+    def ok(self) -> bool:
+        return self.error_count == 0
+
+    def reject(self, line, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line, message))
+
+
+def guess_format(filename):
+    return "jsonl" if filename and filename.lower().endswith((".jsonl", ".ndjson")) else "csv"
+
+
+def _read_rows(stream, fmt, report):
+    """Yield ``(line, row dict or None)`` pairs without reading ahead.
+
+    A file that is not UTF-8, or CSV the reader cannot parse, ends the
+    rows with one error on ``report`` instead of raising.
+    """
+    text = stream
+    if not isinstance(stream, io.TextIOBase):
+        text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    line = 0
+    try:
+        if fmt == "csv":
+            reader = csv.DictReader(text)
+            for row in reader:
+                line = reader.line_num
+                yield line, row
+            return
+        for line, raw in enumerate(text, start=1):
+            if not raw.strip():
+                continue
+            try:
+                row = json.loads(raw)
+            except ValueError:
+                row = None
+            yield line, row if isinstance(row, dict) else None
+    except UnicodeDecodeError:
+        # decoding runs a chunk ahead, so the bad byte may be a few lines on
+        report.reject(line + 1, "file is not UTF-8 text; save it as UTF-8 and retry")
+    except csv.Error as exc:
+        report.reject(line + 1, f"not valid CSV: {exc}")
+
+
+def _form_errors(form):
+    return "; ".join(
+        f"{name}: {' '.join(messages)}" for name, messages in form.errors.items()
+    )
+
+
+def import_tasks(stream, fmt="csv", course=None, batch_size=None, heartbeat=None):
+    """Import tasks from a binary or text ``stream`` and commit them.
+
+    ``course`` pins every row to one Course; otherwise each row names its
+    course by code. ``heartbeat``, if given, is called once per
+    ``batch_size`` rows read, so a long import can tell its job runner it
+    is still alive without committing. Returns an ImportReport.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"unknown import format {fmt!r}")
+    batch_size = batch_size or current_app.config["IMPORT_BATCH_SIZE"]
+    report = ImportReport()
+
+    # one lookup each for course codes and team names, O(courses + teams)
+    if course is not None:
+        courses = {course.code.lower(): course.id}
+        team_filter = Team.course_id == course.id
+    else:
+        courses = {}
+        for course_id, code in db.session.execute(
+            select(Course.id, Course.code).order_by(Course.id)
+        ):
+            courses.setdefault(code.lower(), course_id)
+        team_filter = true()
+    teams = {}
+    choices = {}
+    for team_id, course_id, name in db.session.execute(
+        select(Team.id, Team.course_id, Team.name).where(team_filter)
+    ):
+        teams.setdefault((course_id, name.strip().lower()), team_id)
+        choices.setdefault(course_id, [(0, "Whole course")]).append((team_id, name))
+
+    batch = []
+
+    def flush():
+        db.session.execute(insert(Task), batch)
+        CourseTaskRollup.record_changes(
+            (row["course_id"], None, (Task.STATUS_TODO, False, row["due_date"]))
+            for row in batch
+        )
+        report.created += len(batch)
+        batch.clear()
+
+    for seen, (line, row) in enumerate(_read_rows(stream, fmt, report), start=1):
+        if heartbeat is not None and seen % batch_size == 0:
+            heartbeat()
+        if row is None:
+            report.reject(line, "not a JSON object")
+            continue
+        row = {key: "" if value is None else str(value).strip() for key, value in row.items()}
+
+        if course is not None:
+            course_id = course.id
+        else:
+            course_id = courses.get(row.get("course", "").lower())
+            if course_id is None:
+                report.reject(line, f"course: unknown course {row.get('course')!r}")
+                continue
+
+        team_id = 0
+        if row.get("team"):
+            team_id = teams.get((course_id, row["team"].lower()))
+            if team_id is None:
+                report.reject(line, f"team: unknown team {row['team']!r}")
+                continue
+
+        form = TaskForm(
+            formdata=MultiDict(
+                {
+                    "title": row.get("title", ""),
+                    "description": row.get("description", ""),
+                    "due_date": row.get("due_date", ""),
+                    "points": row.get("points", ""),
+                    "team_id": str(team_id),
+                }
+            ),
+            meta={"csrf": False},
+        )
+        form.team_id.choices = choices.get(course_id, [(0, "Whole course")])
+        if not form.validate():
+            report.reject(line, _form_errors(form))
+            continue
+        if not report.ok:
+            # keep validating to report every error, but stop writing
+            continue
+
+        batch.append(
+            {
+                "title": form.title.data,
+                "description": form.description.data or None,
+                "due_date": form.due_date.data,
+                "points": form.points.data or 100,
+                "course_id": course_id,
+                "team_id": form.team_id.data or None,
+            }
+        )
+        if len(batch) >= batch_size:
+            flush()
+
+    if report.ok:
+        if batch:
+            flush()
+        db.session.commit()
+    else:
+        db.session.rollback()
+        report.created = 0
+    return report
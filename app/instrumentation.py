@@ -0,0 +1,152 @@
+"""Per-request SQL timing, Server-Timing headers and the slow-request log.
+
+SQLAlchemy cursor events time every statement the app's engines run while
+a request is active. After each request the totals go into a
+``Server-Timing`` header and a per-endpoint profile. Requests slower than
+SLOW_REQUEST_MS are also logged as one JSON line on the
+``microcanvas.slow_requests`` logger. In debug mode, or with SQL_DEBUG_PAGE,
+the profile is browsable at ``/debug/sql``.
+"""
+import json
+import logging
+import threading
+import time
+
+from flask import (
+    abort,
+    current_app,
+    g,
+    has_request_context,
+    render_template,
+    request,
+)
+from sqlalchemy import event
+
+from app import db
+
+slow_log = logging.getLogger("microcanvas.slow_requests")
+
+
+class EndpointProfile:
+    """Running totals for one endpoint, shown on the debug page."""
+
+    def __init__(self):
+        self.requests = 0
+        self.queries = 0
+        self.db_ms = 0.0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def add(self, queries, db_ms, total_ms):
+        self.requests += 1
+        self.queries += queries
+        self.db_ms += db_ms
+        self.total_ms += total_ms
+        self.max_ms = max(self.max_ms, total_ms)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_started"].pop()
+    if not has_request_context() or "sql_stats" not in g:
+        return
+    elapsed = (time.perf_counter() - started) * 1000
+    stats = g.sql_stats
+    stats["count"] += 1
+    stats["db_ms"] += elapsed
+    slowest = stats["slowest"]
+    slowest.append((elapsed, statement))
+    slowest.sort(key=lambda item: item[0], reverse=True)
+    del slowest[current_app.config["SLOW_QUERY_SAMPLES"] :]
+
+
+def _discard_failed_query(context):
+    # a statement that raised never reaches after_cursor_execute
+    # (errors raised while flushing a bound value have no cursor attribute)
+    if context.connection is not None and getattr(context, "cursor", None):
+        started = context.connection.info.get("query_started")
+        if started:
+            started.pop()
+
+
+def _start_request():
+    g.sql_stats = {
+        "count": 0,
+        "db_ms": 0.0,
+        "slowest": [],
+        "started": time.perf_counter(),
+    }
+
+
+def _finish_request(response):
+    stats = g.pop("sql_stats", None)
+    if stats is None:
+        return response
+    total_ms = (time.perf_counter() - stats["started"]) * 1000
+    response.headers.add(
+        "Server-Timing",
+        f'db;dur={stats["db_ms"]:.1f};desc="{stats["count"]} queries", '
+        f"app;dur={total_ms:.1f}",
+    )
+
+    endpoint = request.endpoint or "<unmatched>"
+    profiles = current_app.extensions["sql_profile"]
+    with profiles["lock"]:
+        profile = profiles["endpoints"].setdefault(endpoint, EndpointProfile())
+        profile.add(stats["count"], stats["db_ms"], total_ms)
+
+    if total_ms >= current_app.config["SLOW_REQUEST_MS"]:
+        slow_log.warning(
+            json.dumps(
+                {
+                    "endpoint": endpoint,
+                    "method": request.method,
+                    "path": request.full_path.rstrip("?"),
+                    "status": response.status_code,
+                    "duration_ms": round(total_ms, 1),
+                    "db_ms": round(stats["db_ms"], 1),
+                    "queries": stats["count"],
+                    "slowest": [
+                        {"ms": round(ms, 2), "sql": " ".join(sql.split())}
+                        for ms, sql in stats["slowest"]
+                    ],
+                }
+            )
+        )
+    return response
+
+
+def sql_profile_page():
+    if not (current_app.debug or current_app.config.get("SQL_DEBUG_PAGE")):
+        abort(404)
+    profiles = current_app.extensions["sql_profile"]
+    with profiles["lock"]:
+        rows = sorted(
+            profiles["endpoints"].items(),
+            key=lambda item: item[1].db_ms,
+            reverse=True,
+        )
+    caches = {
+        name: current_app.extensions[name].stats()
+        for name in ("user_cache", "card_cache")
+    }
+    return render_template("debug/sql.html", rows=rows, caches=caches)
+
+
+def init_instrumentation(app):
+    if not app.config.get("SQL_INSTRUMENTATION"):
+        return
+    app.extensions["sql_profile"] = {"lock": threading.Lock(), "endpoints": {}}
+    with app.app_context():
+        engines = list(db.engines.values())
+    for engine in engines:  # the primary plus any read replica
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(engine, "handle_error", _discard_failed_query)
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+
+    app.add_url_rule("/debug/sql", "debug_sql", sql_profile_page)
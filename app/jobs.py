@@ -0,0 +1,403 @@
+"""Background jobs: bulk imports, exports, analytics rebuilds, team fills.
+
+Handlers are registered per ``Job.kind`` with :func:`handler`. Routes queue
+work with :func:`submit_job` and return immediately. The job then runs on
+one of two runners:
+
+* ``JOB_RUNNER = "thread"``: a small pool inside each web process, woken
+  on submit and on the first request after a restart.
+* ``JOB_RUNNER = "external"``: the web process only queues, and
+  ``flask jobs-worker`` processes the table.
+
+The queue is the ``job`` table itself, so queued work survives restarts.
+Running jobs send a heartbeat whenever they report progress, or through
+``JobContext.heartbeat`` when they cannot commit part way. A running
+job whose heartbeat is older than JOB_STALE_SECONDS is requeued, and it
+fails once it has used JOB_MAX_ATTEMPTS tries.
+
+Database errors such as "database is locked" are retried the same way,
+up to JOB_MAX_ATTEMPTS. A job's upload (``params["path"]``) is kept
+until the job finishes for good, so a retry can read it again.
+
+Progress is committed together with the job's own work, so it only moves
+at points where the handler commits. Imports are all-or-nothing and jump
+from 0 to 100.
+"""
+import logging
+import os
+import shutil
+import socket
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from flask import current_app
+from sqlalchemy import and_, func, select, update
+from sqlalchemy.exc import OperationalError
+from werkzeug.utils import secure_filename
+
+from app import db
+from app.exporter import encode, export_rows
+from app.importer import import_tasks
+from app.models import (
+    Course,
+    CourseMembership,
+    CourseTaskRollup,
+    Job,
+    Task,
+    Team,
+    TeamMembership,
+)
+
+log = logging.getLogger(__name__)
+
+HANDLERS = {}
+
+
+class JobError(Exception):
+    """An expected failure; the message is shown to the user as-is."""
+
+    def __init__(self, message, result=None):
+        super().__init__(message)
+        self.result = result
+
+
+def handler(kind):
+    def register(func):
+        HANDLERS[kind] = func
+        return func
+
+    return register
+
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+def worker_name(role):
+    return f"{socket.gethostname()}:{os.getpid()}:{role}:{threading.current_thread().name}"
+
+
+def _job_dir(*parts):
+    path = os.path.join(current_app.config["JOB_DIR"], *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def save_upload(stream, suffix):
+    """Copy an uploaded file under JOB_DIR so a worker can read it later."""
+    path = os.path.join(_job_dir("uploads"), f"{uuid.uuid4().hex}.{suffix}")
+    with open(path, "wb") as out:
+        shutil.copyfileobj(stream, out)
+    return path
+
+
+def submit_job(kind, params, owner=None):
+    """Queue a job and nudge the in-process runner, if there is one."""
+    if kind not in HANDLERS:
+        raise ValueError(f"unknown job kind {kind!r}")
+    job = Job(kind=kind, params=params, owner_id=owner.id if owner else None)
+    db.session.add(job)
+    db.session.commit()
+    runner = current_app.extensions.get("jobs")
+    if runner is not None:
+        runner.wake()
+    return job
+
+
+class JobContext:
+    """What a handler gets: the job's params plus progress and file helpers."""
+
+    def __init__(self, job):
+        self.job = job
+        self.params = dict(job.params or {})
+
+    def progress(self, done, total):
+        """Record progress and heartbeat; commits the handler's work so far."""
+        self.job.progress = min(99, done * 100 // total) if total else 0
+        self.job.heartbeat_at = _now()
+        db.session.commit()
+
+    def heartbeat(self):
+        """Heartbeat in a short transaction of its own, leaving the handler's open.
+
+        On SQLite, once the handler has written it holds the database write
+        lock, so nobody can requeue the job anyway; the heartbeat is skipped
+        rather than waiting on that lock.
+        """
+        if _holds_sqlite_write_lock():
+            return
+        with db.engine.begin() as conn:
+            conn.execute(
+                update(Job)
+                .where(Job.id == self.job.id, Job.status == Job.STATUS_RUNNING)
+                .values(heartbeat_at=_now())
+            )
+
+    def result_file(self, filename):
+        """Path for the job's downloadable output, recorded on the job."""
+        path = os.path.join(
+            _job_dir("results"), f"{self.job.id}-{secure_filename(filename)}"
+        )
+        self.job.result_path = path
+        return path
+
+
+def _holds_sqlite_write_lock():
+    if db.engine.dialect.name != "sqlite" or not db.session().in_transaction():
+        return False
+    # pysqlite only opens a transaction on its connection before a write
+    return db.session.connection().connection.dbapi_connection.in_transaction
+
+
+def requeue_stale_jobs():
+    """Hand jobs whose worker stopped reporting back to the queue."""
+    config = current_app.config
+    now = _now()
+    stale = and_(
+        Job.status == Job.STATUS_RUNNING,
+        Job.heartbeat_at < now - timedelta(seconds=config["JOB_STALE_SECONDS"]),
+    )
+    expired = db.session.scalars(
+        select(Job).where(stale, Job.attempts >= config["JOB_MAX_ATTEMPTS"])
+    ).all()
+    db.session.execute(
+        update(Job)
+        .where(stale, Job.attempts >= config["JOB_MAX_ATTEMPTS"])
+        .values(
+            status=Job.STATUS_FAILED,
+            error="The worker running this job stopped responding.",
+            finished_at=now,
+        )
+    )
+    db.session.execute(
+        update(Job).where(stale).values(status=Job.STATUS_QUEUED, worker=None)
+    )
+    db.session.commit()
+    for job in expired:
+        _discard_upload(job)
+
+
+def _discard_upload(job):
+    """Remove a finished job's upload; retries need it until then."""
+    path = (job.params or {}).get("path")
+    if path:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def claim_next_job(worker):
+    """Atomically move the oldest queued job to running; None if idle."""
+    while True:
+        job_id = db.session.scalar(
+            select(Job.id)
+            .where(Job.status == Job.STATUS_QUEUED)
+            .order_by(Job.id)
+            .limit(1)
+        )
+        if job_id is None:
+            db.session.commit()
+            return None
+        now = _now()
+        claimed = db.session.execute(
+            update(Job)
+            .where(Job.id == job_id, Job.status == Job.STATUS_QUEUED)
+            .values(
+                status=Job.STATUS_RUNNING,
+                worker=worker,
+                attempts=Job.attempts + 1,
+                started_at=now,
+                heartbeat_at=now,
+            )
+        ).rowcount
+        db.session.commit()
+        if claimed:
+            return db.session.get(Job, job_id)
+        # another worker won the race; try the next one
+
+
+def run_job(job):
+    job_id = job.id
+    status, error, result = Job.STATUS_SUCCEEDED, None, None
+    try:
+        func = HANDLERS.get(job.kind)
+        if func is None:
+            raise JobError(f"Unknown job kind {job.kind!r}.")
+        result = func(JobContext(job))
+    except JobError as exc:
+        db.session.rollback()
+        status, error, result = Job.STATUS_FAILED, str(exc), exc.result
+    except OperationalError as exc:
+        db.session.rollback()
+        log.warning("job %s (%s) hit a database error: %s", job_id, job.kind, exc)
+        attempts = db.session.get(Job, job_id).attempts
+        status = (
+            Job.STATUS_QUEUED
+            if attempts < current_app.config["JOB_MAX_ATTEMPTS"]
+            else Job.STATUS_FAILED
+        )
+        error = f"{type(exc).__name__}: {exc.orig}"
+    except Exception as exc:
+        db.session.rollback()
+        log.exception("job %s (%s) failed", job_id, job.kind)
+        status, error = Job.STATUS_FAILED, f"{type(exc).__name__}: {exc}"
+
+    job = db.session.get(Job, job_id)
+    job.status = status
+    job.error = error
+    job.result = result
+    if status == Job.STATUS_QUEUED:
+        # transient (locked or busy database): back in line for another try
+        job.worker = None
+        db.session.commit()
+        return job
+    if status == Job.STATUS_SUCCEEDED:
+        job.progress = 100
+    job.finished_at = _now()
+    db.session.commit()
+    _discard_upload(job)
+    return job
+
+
+def run_pending_jobs(worker, stop=None):
+    """Run queued jobs until the queue is empty or ``stop`` is set."""
+    requeue_stale_jobs()
+    count = 0
+    while stop is None or not stop.is_set():
+        job = claim_next_job(worker)
+        if job is None:
+            break
+        run_job(job)
+        count += 1
+    return count
+
+
+class JobRunner:
+    """Thread pool that drains the job table inside a web process."""
+
+    def __init__(self, app, workers):
+        self.app = app
+        self._executor = ThreadPoolExecutor(workers, thread_name_prefix="job")
+        self._started = False
+
+    def wake(self):
+        self._executor.submit(self._drain)
+
+    def start(self):
+        """Pick up work left queued by a previous process, once."""
+        if not self._started:
+            self._started = True
+            self.wake()
+
+    def _drain(self):
+        with self.app.app_context():
+            try:
+                run_pending_jobs(worker_name("thread"))
+            except Exception:
+                log.exception("background job runner failed")
+            finally:
+                db.session.remove()
+
+
+@handler("import_tasks")
+def _import_tasks(ctx):
+    course = db.session.get(Course, ctx.params["course_id"])
+    if course is None:
+        raise JobError("The course no longer exists.")
+    with open(ctx.params["path"], "rb") as stream:
+        report = import_tasks(
+            stream, ctx.params["fmt"], course=course, heartbeat=ctx.heartbeat
+        )
+    if not report.ok:
+        raise JobError(
+            f"{report.error_count} invalid row(s); nothing was imported.",
+            result={"errors": report.errors, "error_count": report.error_count},
+        )
+    return {"created": report.created}
+
+
+@handler("export_tasks")
+def _export_tasks(ctx):
+    """Write a gradebook export in task-id batches, reporting per batch."""
+    column = Task.course_id if ctx.params["scope"] == "course" else Task.team_id
+    where = column == ctx.params["id"]
+    fmt = ctx.params["fmt"]
+    total = db.session.scalar(select(func.count()).select_from(Task).where(where))
+    batch_size = current_app.config["EXPORT_BATCH_SIZE"]
+    done, last_id = 0, 0
+    with open(
+        ctx.result_file(f"{ctx.params['filename']}.{fmt}"),
+        "w",
+        encoding="utf-8",
+        newline="",
+    ) as out:
+        out.writelines(encode([], fmt))  # the CSV header; nothing for JSON Lines
+        while True:
+            ids = db.session.scalars(
+                select(Task.id)
+                .where(where, Task.id > last_id)
+                .order_by(Task.id)
+                .limit(batch_size)
+            ).all()
+            if not ids:
+                break
+            rows = export_rows(and_(where, Task.id.between(ids[0], ids[-1])))
+            out.writelines(encode(rows, fmt, header=False))
+            done += len(ids)
+            last_id = ids[-1]
+            ctx.progress(done, total)
+    return {"tasks": done}
+
+
+@handler("rebuild_analytics")
+def _rebuild_analytics(ctx):
+    course_ids = db.session.scalars(select(Course.id).order_by(Course.id)).all()
+    for start in range(0, len(course_ids), 50):
+        CourseTaskRollup.rebuild(course_ids[start : start + 50])
+        ctx.progress(start + 50, len(course_ids))
+    return {"courses": len(course_ids)}
+
+
+@handler("assign_teams")
+def _assign_teams(ctx):
+    """Put every course student who is on no team into the smallest team."""
+    course_id = ctx.params["course_id"]
+    sizes = dict(
+        db.session.execute(
+            select(Team.id, func.count(TeamMembership.id))
+            .outerjoin(TeamMembership, TeamMembership.team_id == Team.id)
+            .where(Team.course_id == course_id)
+            .group_by(Team.id)
+        ).all()
+    )
+    if not sizes:
+        raise JobError("This course has no teams yet.")
+    on_a_team = (
+        select(TeamMembership.id)
+        .join(Team, Team.id == TeamMembership.team_id)
+        .where(
+            Team.course_id == course_id,
+            TeamMembership.user_id == CourseMembership.user_id,
+        )
+        .exists()
+    )
+    students = db.session.scalars(
+        select(CourseMembership.user_id)
+        .where(
+            CourseMembership.course_id == course_id,
+            CourseMembership.role == "student",
+            ~on_a_team,
+        )
+        .order_by(CourseMembership.id)
+    ).all()
+
+    for done, user_id in enumerate(students, start=1):
+        team_id = min(sizes, key=lambda team: (sizes[team], team))
+        sizes[team_id] += 1
+        db.session.add(TeamMembership(team_id=team_id, user_id=user_id))
+        if done % 500 == 0:
+            ctx.progress(done, len(students))
+    return {"assigned": len(students)}
@@ -0,0 +1,312 @@
+"""Pub/sub behind the live board streams.
+
+Write routes call :func:`publish_task_changes` just before they commit.
+It adds each event as a ``live_event`` row to the same transaction, so an
+event exists exactly when its change does. The :class:`Relay` of every web
+process copies new rows into that process's :class:`Broker`, the
+publisher's at the end of the request and the others within
+LIVE_POLL_SECONDS. Each open
+``/courses/<id>/events`` or ``/teams/<id>/events`` stream holds a
+:class:`Subscription` on the matching channel. An event is encoded to SSE
+text once and the same string is handed to every subscriber, so fan-out
+costs one queue append per open board.
+
+Event ids are ``live_event`` row ids, the same in every process, so a
+browser that reconnects to another worker with ``Last-Event-ID`` picks up
+what it missed from that worker's replay buffer; if it fell further
+behind than the buffer holds, it is told to reload.
+"""
+import json
+import logging
+import queue
+import threading
+import time
+from collections import defaultdict, deque
+from datetime import datetime, timedelta, timezone
+
+from flask import current_app, g
+from sqlalchemy import delete, func, select
+
+from app import db
+from app.models import LiveEvent, Task, TaskComment
+
+log = logging.getLogger(__name__)
+
+
+def course_channel(course_id):
+    return f"course:{course_id}"
+
+
+def team_channel(team_id):
+    return f"team:{team_id}"
+
+
+class Subscription:
+    """One stream's view of a channel; iterate :meth:`get` until ``None``."""
+
+    def __init__(self, broker, channel, maxsize):
+        self.broker = broker
+        self.channel = channel
+        self.queue = queue.Queue(maxsize)
+        self.overflowed = False
+        # ids up to here reached the browser already (from another worker)
+        self.after = 0
+
+    def offer(self, message):
+        try:
+            self.queue.put_nowait(message)
+        except queue.Full:
+            # a stalled client must not hold memory or slow the publisher;
+            # the stream ends and the browser reconnects with Last-Event-ID
+            self.overflowed = True
+
+    def get(self, timeout):
+        """Next SSE message, ``""`` on timeout, ``None`` once overflowed."""
+        if self.overflowed:
+            return None
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return ""
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class Broker:
+    """Thread-safe channel -> subscribers fan-out with a per-channel replay."""
+
+    def __init__(self, queue_size=100, replay_size=100):
+        self.queue_size = queue_size
+        self.replay_size = replay_size
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+        self._replay = defaultdict(lambda: deque(maxlen=self.replay_size))
+        self._evicted = {}
+        self._floor = 0
+        self._next_id = 1
+
+    @property
+    def last_id(self):
+        return self._next_id - 1
+
+    def start_after(self, event_id):
+        """Events up to ``event_id`` happened before this broker knew of them."""
+        with self._lock:
+            self._floor = event_id
+            self._next_id = max(self._next_id, event_id + 1)
+
+    def subscribe(self, channel, last_event_id=None):
+        """Register on ``channel``; replays buffered events after ``last_event_id``."""
+        subscription = Subscription(self, channel, self.queue_size)
+        with self._lock:
+            self._subscribers[channel].add(subscription)
+            if last_event_id is not None:
+                # a browser coming from a worker whose relay is ahead of
+                # ours must not get those events twice
+                subscription.after = last_event_id
+                if last_event_id < max(self._evicted.get(channel, 0), self._floor):
+                    # missed more than the replay holds
+                    subscription.offer("event: reload\ndata: {}\n\n")
+                else:
+                    for event_id, message in self._replay.get(channel, ()):
+                        if event_id > last_event_id:
+                            subscription.offer(message)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.channel]
+
+    def publish(self, channels, event, data, event_id=None):
+        """Send one event to every subscriber of each channel in ``channels``.
+
+        ``event_id`` defaults to the next local id; relayed events bring
+        their row id, and one this broker has already sent is skipped
+        (returns ``None``).
+        """
+        payload = json.dumps(data, separators=(",", ":"))
+        with self._lock:
+            if event_id is None:
+                event_id = self._next_id
+            elif event_id < self._next_id:
+                return None
+            self._next_id = event_id + 1
+            message = f"id: {event_id}\nevent: {event}\ndata: {payload}\n\n"
+            for channel in channels:
+                replay = self._replay[channel]
+                if len(replay) == replay.maxlen:
+                    self._evicted[channel] = replay[0][0]
+                replay.append((event_id, message))
+                for subscription in self._subscribers.get(channel, ()):
+                    if event_id > subscription.after:
+                        subscription.offer(message)
+        return event_id
+
+    def subscriber_count(self, channel=None):
+        with self._lock:
+            if channel is not None:
+                return len(self._subscribers.get(channel, ()))
+            return sum(len(subs) for subs in self._subscribers.values())
+
+
+class Relay:
+    """Copies new ``live_event`` rows into this process's broker.
+
+    A request that published calls :meth:`poll` once it is done, so
+    streams on the same process see the change at once. A daemon thread,
+    started by the first request, polls every ``interval`` seconds for rows
+    written by other processes and deletes rows older than ``retention``
+    seconds. With ``interval`` 0 there is no thread: only local events are
+    relayed, and publishers prune instead.
+
+    Rows are read in id order. SQLite hands out ids in commit order; on a
+    server database a row that commits after a higher id has been relayed
+    is skipped, and its board catches up on the task's next event.
+    """
+
+    BATCH = 500
+    PRUNE_EVERY = 60
+
+    def __init__(self, app, broker, interval, retention, backlog):
+        self.app = app
+        self.broker = broker
+        self.interval = interval
+        self.retention = retention
+        self.backlog = backlog
+        self._lock = threading.Lock()
+        self._primed = False
+        self._thread = None
+        self._pruned_at = None
+
+    def start(self):
+        """Start the poller thread, once."""
+        if self.interval <= 0 or self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="live-relay", daemon=True
+                )
+                self._thread.start()
+
+    def poll(self):
+        """Relay rows newer than the broker's last event; returns how many."""
+        with self._lock:
+            if not self._primed:
+                # a new process replays only the recent past
+                newest = db.session.scalar(select(func.max(LiveEvent.id))) or 0
+                self.broker.start_after(max(0, newest - self.backlog))
+                self._primed = True
+            relayed = 0
+            while True:
+                rows = db.session.execute(
+                    select(
+                        LiveEvent.id, LiveEvent.channels, LiveEvent.event, LiveEvent.data
+                    )
+                    .where(LiveEvent.id > self.broker.last_id)
+                    .order_by(LiveEvent.id)
+                    .limit(self.BATCH)
+                ).all()
+                for event_id, channels, event, data in rows:
+                    self.broker.publish(
+                        channels.split(), event, json.loads(data), event_id=event_id
+                    )
+                relayed += len(rows)
+                if len(rows) < self.BATCH:
+                    return relayed
+
+    def after_request(self, response):
+        if g.pop("live_events", False):
+            self.poll()
+        return response
+
+    def prune_due(self):
+        return (
+            self._pruned_at is None
+            or time.monotonic() - self._pruned_at >= self.PRUNE_EVERY
+        )
+
+    def prune(self):
+        """Delete events older than ``retention``; the caller commits."""
+        self._pruned_at = time.monotonic()
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=self.retention)
+        return db.session.execute(
+            delete(LiveEvent).where(LiveEvent.created_at < cutoff)
+        ).rowcount
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            with self.app.app_context():
+                try:
+                    self.poll()
+                    if self.prune_due():
+                        self.prune()
+                        db.session.commit()
+                except Exception:
+                    log.exception("live event relay failed")
+                finally:
+                    db.session.remove()
+
+
+def publish_task_changes(task_ids):
+    """Publish the status, score and comment count of changed tasks.
+
+    Call it after the change is flushed and before the commit: the events
+    are added to the session as ``live_event`` rows and commit, or roll
+    back, with the change. One grouped query covers the whole batch; every
+    task goes to its course channel and, if it belongs to one, its team
+    channel. Returns the event payloads, keyed by task id, so callers can
+    answer with them too.
+    """
+    payloads = {}
+    if not task_ids:
+        return payloads
+    comment_counts = (
+        select(TaskComment.task_id, func.count().label("comments"))
+        .where(TaskComment.task_id.in_(task_ids))
+        .group_by(TaskComment.task_id)
+        .subquery()
+    )
+    rows = db.session.execute(
+        select(
+            Task.id,
+            Task.course_id,
+            Task.team_id,
+            Task.status,
+            Task.score,
+            func.coalesce(comment_counts.c.comments, 0),
+        )
+        .outerjoin(comment_counts, comment_counts.c.task_id == Task.id)
+        .where(Task.id.in_(task_ids))
+    )
+    events = []
+    for task_id, course_id, team_id, status, score, comments in rows:
+        channels = [course_channel(course_id)]
+        if team_id is not None:
+            channels.append(team_channel(team_id))
+        payloads[task_id] = {
+            "id": task_id,
+            "status": status,
+            "score": score,
+            "comments": comments,
+        }
+        events.append(
+            LiveEvent(
+                channels=" ".join(channels),
+                event="task",
+                data=json.dumps(payloads[task_id], separators=(",", ":")),
+            )
+        )
+    db.session.add_all(events)
+    relay = current_app.extensions["live_relay"]
+    if relay.interval <= 0 and relay.prune_due():
+        # no poller thread to keep the table short
+        relay.prune()
+    g.live_events = True
+    return payloads
@@ -0,0 +1,45 @@
+from flask import current_app, render_template
+from flask_login import current_user
+from flask_wtf.csrf import generate_csrf
+from markupsafe import Markup
+from sqlalchemy.orm import selectinload
+
+from app.models import Task, TaskComment
+
+# Stands in for the per-session CSRF token inside cached card HTML.
+CSRF_PLACEHOLDER = "__card_csrf_token__"
+
+
+def render_task_cards(tasks, board):
+    """Card HTML for ``tasks`` on a ``"course"`` or ``"team"`` board.
+
+    Cards are cached per (board, task id, task version, viewer role), so a
+    card is only re-rendered after its status, grade or comments change.
+    Comments are only loaded, in one query, for the cards that miss.
+    Returns the card list plus this call's (hits, misses).
+    """
+    cache = current_app.extensions["card_cache"]
+    keys = [(board, task.id, task.version, current_user.role) for task in tasks]
+    cards = [cache.get(key) for key in keys]
+
+    missed = [task for task, card in zip(tasks, cards) if card is None]
+    if missed:
+        Task.query.options(
+            selectinload(Task.comments).joinedload(TaskComment.author)
+        ).filter(Task.id.in_([task.id for task in missed])).all()
+        for index, card in enumerate(cards):
+            if card is None:
+                card = render_template(
+                    "main/_task_card.html",
+                    task=tasks[index],
+                    board=board,
+                    viewer=current_user,
+                    status_choices=Task.STATUS_CHOICES,
+                    csrf_token=CSRF_PLACEHOLDER,
+                )
+                cache.set(keys[index], card)
+                cards[index] = card
+
+    token = generate_csrf() if current_app.config.get("WTF_CSRF_ENABLED", True) else ""
+    cards = [Markup(card.replace(CSRF_PLACEHOLDER, token)) for card in cards]
+    return cards, (len(tasks) - len(missed), len(missed))
@@ -0,0 +1,108 @@
+"""Cheap validators for conditional GETs on the boards and analytics.
+
+Each validator is one aggregate SELECT over indexed columns. Routes call
+``not_modified`` before loading anything through the ORM; if the client's
+ETag still matches it returns a bare 304, otherwise the ETag is stashed
+on ``g`` and attached to the full response.
+"""
+import hashlib
+import time
+from datetime import date
+
+from flask import current_app, g, request, session
+from flask_login import current_user
+from sqlalchemy import func, literal, select
+
+from app import db
+from app.models import (
+    Course,
+    CourseMembership,
+    CourseTaskRollup,
+    Task,
+    Team,
+    TeamMembership,
+)
+
+
+def _stats(*columns, where):
+    return select(*columns).where(where).scalar_subquery()
+
+
+def _task_stats(where):
+    return (
+        _stats(func.count(Task.id), where=where),
+        _stats(func.max(Task.updated_at), where=where),
+    )
+
+
+def course_board_state(course_id):
+    # Task.touch() runs on every status, grade and comment change, so the
+    # task timestamps already cover the feedback shown on the cards.
+    team_members = TeamMembership.team_id.in_(
+        select(Team.id).where(Team.course_id == course_id)
+    )
+    return (
+        *_task_stats(Task.course_id == course_id),
+        _stats(func.count(Team.id), where=Team.course_id == course_id),
+        _stats(func.max(Team.id), where=Team.course_id == course_id),
+        _stats(func.count(TeamMembership.id), where=team_members),
+        _stats(func.max(TeamMembership.id), where=team_members),
+    )
+
+
+def team_board_state(team_id):
+    course_id = select(Team.course_id).where(Team.id == team_id).scalar_subquery()
+    roster = CourseMembership.course_id == course_id
+    return (
+        *_task_stats(Task.team_id == team_id),
+        _stats(func.count(TeamMembership.id), where=TeamMembership.team_id == team_id),
+        _stats(func.max(TeamMembership.id), where=TeamMembership.team_id == team_id),
+        _stats(func.count(CourseMembership.id), where=roster),
+        _stats(func.max(CourseMembership.id), where=roster),
+    )
+
+
+def analytics_state():
+    return (
+        select(func.count(Course.id)).scalar_subquery(),
+        select(func.count(CourseTaskRollup.course_id)).scalar_subquery(),
+        select(func.max(CourseTaskRollup.updated_at)).scalar_subquery(),
+        # late counts roll over at midnight
+        literal(date.today().isoformat()),
+    )
+
+
+def not_modified(state):
+    """Return True if the client's cached copy of this page is current.
+
+    ``state`` is a tuple of scalar subqueries built by one of the
+    ``*_state`` helpers, evaluated in a single SELECT. The ETag also covers
+    the viewer, since boards render per user and role, and a CSRF-lifetime
+    bucket so cached forms never outlive their tokens.
+
+    Validation is ETag-only: no Last-Modified is sent and If-Modified-Since
+    is ignored. Counts, ids and the viewer change the page without moving
+    any date (a deleted task or a new team member), so a date alone would
+    hand out stale 304s.
+    """
+    parts = tuple(db.session.execute(select(*state)).one())
+
+    time_limit = current_app.config.get("WTF_CSRF_TIME_LIMIT", 3600)
+    bucket = int(time.time() // (time_limit / 2)) if time_limit else 0
+    digest = hashlib.sha1(
+        repr((request.endpoint, current_user.id, current_user.role, bucket, parts)).encode()
+    ).hexdigest()
+    g.etag = digest
+
+    if "_flashes" in session:
+        # a pending flash message has to be rendered, not served from cache
+        return False
+    return request.if_none_match.contains_weak(digest)
+
+
+def attach_validators(response):
+    digest = g.get("etag")
+    if digest is not None and response.status_code in (200, 304):
+        response.set_etag(digest, weak=True)
+        response.headers["Cache-Control"] = "private, no-cache"
+    return response
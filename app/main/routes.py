@@ -1,12 +1,48 @@
-from datetime import date
-
-from flask import render_template, redirect, url_for, flash, request, abort
+import os
+import re
+import time
+from collections import defaultdict
+from datetime import date, datetime, timezone
+
+from flask import (
+    render_template,
+    redirect,
+    url_for,
+    flash,
+    request,
+    abort,
+    current_app,
+    g,
+    jsonify,
+    send_file,
+    stream_with_context,
+)
 from flask_login import current_user, login_required
+from sqlalchemy import bindparam, or_, select, tuple_, union_all, update
+from werkzeug.datastructures import MultiDict
+from sqlalchemy.orm import joinedload, selectinload
+
 from app.main import main_bp
+from app.main.cards import render_task_cards
+from app.main.conditional import (
+    analytics_state,
+    attach_validators,
+    course_board_state,
+    not_modified,
+    team_board_state,
+)
 from app import db
+from app.exporter import MIMETYPES, encode, export_rows
+from app.importer import guess_format, import_tasks
+from app.jobs import save_upload, submit_job
+from app.live import course_channel, publish_task_changes, team_channel
+from app.search import search as search_tasks
+from app.routing import use_primary
 from app.models import (
     Course,
     CourseMembership,
+    CourseTaskRollup,
+    Job,
     Task,
     TaskComment,
     Team,
@@ -14,7 +50,10 @@ from app.models import (
     User,
 )
 from app.forms import (
+    BulkTaskStatusForm,
+    JobSubmitForm,
     TaskForm,
+    TaskImportForm,
     TaskStatusForm,
     TaskCommentForm,
     GradeForm,
@@ -23,102 +62,181 @@ from app.forms import (
 )
 
 
-def _ensure_sample_data():
-    """Create demo courses and tasks if DB is empty.
+def _encode_cursor(task):
+    due = task.due_date.isoformat() if task.due_date else ""
+    return f"{due}:{task.id}"
 
-    Combined with auth._ensure_demo_users(), this gives us:
-    - Users: instructor, ta, student
-    - Courses: CMPE 131, ISE 140
-    - A few tasks in each course
-    """
-    if Course.query.first() is not None:
-        return
-
-    def user(email, role):
-        record = User.query.filter_by(email=email).first()
-        if record is None:
-            record = User(email=email, role=role)
-            db.session.add(record)
-            db.session.flush()
-        return record
-
-    prof = user("prof@example.com", "instructor")
-    ta = user("ta@example.com", "ta")
-    student = user("student@example.com", "student")
-    student2 = user("student2@example.com", "student")
-
-    course1 = Course(code="CMPE 131", title="Software Engineering")
-    course2 = Course(code="ISE 140", title="Operations Planning and Control")
-    db.session.add_all([course1, course2])
-    db.session.flush()
-
-    memberships = [
-        CourseMembership(user=prof, course=course1, role="instructor"),
-        CourseMembership(user=ta, course=course1, role="ta"),
-        CourseMembership(user=student, course=course1, role="student"),
-        CourseMembership(user=student2, course=course1, role="student"),
-        CourseMembership(user=prof, course=course2, role="instructor"),
-        CourseMembership(user=student, course=course2, role="student"),
-    ]
-    db.session.add_all(memberships)
-    db.session.flush()
-
-    alpha = Team(name="Velocity", course=course1)
-    beta = Team(name="Nimbus", course=course1)
-    db.session.add_all([alpha, beta])
-    db.session.flush()
-
-    db.session.add_all(
-        [
-            TeamMembership(user=student, team=alpha),
-            TeamMembership(user=ta, team=alpha),
-            TeamMembership(user=student2, team=beta),
-        ]
-    )
 
-    t1 = Task(
-        title="Project proposal",
-        description="Submit 1-page project idea.",
-        course=course1,
-        status="todo",
-        points=50,
-        team=alpha,
-    )
-    t2 = Task(
-        title="Unit test suite",
-        description="Add tests for your Flask routes.",
-        course=course1,
-        status="in_progress",
-        points=100,
-        team=beta,
-    )
-    t3 = Task(
-        title="HW 3 – Forecasting",
-        description="Solve forecasting problems 1–5.",
-        course=course2,
-        status="todo",
-        points=75,
+def _decode_cursor(value):
+    """Parse a ``due_date:id`` board cursor; undated tasks have no due part."""
+    due, _, ident = value.partition(":")
+    try:
+        return (date.fromisoformat(due) if due else None), int(ident)
+    except ValueError:
+        abort(400)
+
+
+def _board_page(query, cursor, limit):
+    """Up to ``limit`` tasks after ``cursor`` in (due_date, id) order, undated last.
+
+    Dated and undated tasks are picked in separate UNION ALL legs, each
+    walking the (..., status, due_date, id) board index in order; a single
+    ``ORDER BY due_date IS NULL, ...`` would sort every task in the column.
+    Only the at most ``2 * limit`` picked rows are sorted together.
+    """
+    due_date, task_id = cursor or (None, None)
+    ids = query.with_entities(Task.id)
+    legs = []
+    if cursor is None or due_date is not None:
+        # the row-value comparison is false for NULL dates too, and lets
+        # the index seek straight to the cursor
+        dated = ids.filter(
+            tuple_(Task.due_date, Task.id) > tuple_(due_date, task_id)
+            if cursor
+            else Task.due_date.isnot(None)
+        )
+        legs.append(dated.order_by(Task.due_date, Task.id).limit(limit).subquery())
+    undated = ids.filter(Task.due_date.is_(None))
+    if cursor and due_date is None:
+        undated = undated.filter(Task.id > task_id)
+    legs.append(undated.order_by(Task.id).limit(limit).subquery())
+    picked = union_all(*(select(leg.c.id) for leg in legs))
+    # by primary key only: repeating the column filters here would make the
+    # planner walk the whole column through the board index again
+    return (
+        Task.query.options(joinedload(Task.team))
+        .filter(Task.id.in_(picked))
+        .order_by(Task.due_date.is_(None), Task.due_date, Task.id)
+        .limit(limit)
+        .all()
     )
 
-    db.session.add_all([t1, t2, t3])
-    db.session.commit()
 
+def _build_status_columns(task_query, board):
+    """One page of cards per status column, ordered by (due_date, id).
 
-def _build_status_columns(tasks):
+    Each column reads its own ``<status>_after`` cursor from the query
+    string and fetches at most BOARD_PAGE_SIZE cards, plus one to know
+    whether a "Load more" link is needed. Card HTML comes from
+    render_task_cards, with cache counters left in ``g.card_cache``.
+    """
+    page_size = current_app.config["BOARD_PAGE_SIZE"]
     columns = []
     for value, label in Task.STATUS_CHOICES:
+        param = f"{value}_after"
+        query = task_query.filter(Task.status == value)
+        cursor = request.args.get(param)
+        tasks = _board_page(
+            query, _decode_cursor(cursor) if cursor else None, page_size + 1
+        )
+
+        args = request.args.to_dict()
+        args.pop(param, None)
+        more_url = None
+        if len(tasks) > page_size:
+            tasks = tasks[:page_size]
+            more_url = url_for(
+                request.endpoint,
+                **request.view_args,
+                **args,
+                **{param: _encode_cursor(tasks[-1])},
+            )
         columns.append(
             {
                 "key": value,
                 "label": label,
-                "tasks": [task for task in tasks if task.status == value],
+                "tasks": tasks,
+                "cards": [],
+                "more_url": more_url,
+                "first_url": (
+                    url_for(request.endpoint, **request.view_args, **args)
+                    if cursor
+                    else None
+                ),
             }
         )
+
+    cards, g.card_cache = render_task_cards(
+        [task for column in columns for task in column["tasks"]], board
+    )
+    cards = iter(cards)
+    for column in columns:
+        column["cards"] = [next(cards) for _ in column["tasks"]]
     return columns
 
 
-def _get_or_404(model, ident):
-    record = db.session.get(model, ident)
+@main_bp.after_request
+def _report_card_cache(response):
+    stats = g.get("card_cache")
+    if stats is not None:
+        response.headers["X-Card-Cache"] = f"hits={stats[0]}, misses={stats[1]}"
+    return response
+
+
+main_bp.after_request(attach_validators)
+
+
+def _team_candidates(team):
+    """(id, email) of course students not yet on ``team``, as one anti-join."""
+    already_on_team = (
+        select(TeamMembership.id)
+        .where(TeamMembership.team_id == team.id)
+        .where(TeamMembership.user_id == CourseMembership.user_id)
+        .exists()
+    )
+    rows = db.session.execute(
+        select(User.id, User.email)
+        .join(CourseMembership, CourseMembership.user_id == User.id)
+        .where(
+            CourseMembership.course_id == team.course_id,
+            CourseMembership.role == "student",
+            ~already_on_team,
+        )
+        .order_by(CourseMembership.id)
+    )
+    return [tuple(row) for row in rows]
+
+
+def _upcoming_deadlines(user, course_ids, limit):
+    """The first ``limit`` open, dated tasks in ``course_ids`` by due date.
+
+    Overdue tasks stay on the list, first, until someone completes them.
+    Each course contributes one range scan of ix_task_upcoming (open, dated
+    tasks by course and due date) stopped after ``limit`` rows, all in one
+    UNION ALL statement, so the cost follows the number of courses rather
+    than their size. Students see course-wide tasks and their own teams'.
+    """
+    # inlined so SQLite can match the partial index's "status != 2"
+    done = bindparam(
+        "done", Task.STATUS_DONE, type_=Task.status.type, literal_execute=True
+    )
+    per_course = []
+    for course_id in course_ids:
+        query = select(Task.id, Task.title, Task.due_date, Task.course_id).where(
+            Task.course_id == course_id,
+            Task.status != done,
+            Task.due_date.isnot(None),
+        )
+        if user.is_student:
+            query = query.where(
+                or_(Task.team_id.is_(None), Task.team_id.in_(user.team_ids))
+            )
+        per_course.append(
+            query.order_by(Task.due_date, Task.id).limit(limit).subquery().select()
+        )
+    if not per_course:
+        return []
+    upcoming = union_all(*per_course).subquery()
+    return db.session.execute(
+        select(upcoming, Course.code.label("course_code"))
+        .join(Course, Course.id == upcoming.c.course_id)
+        .order_by(upcoming.c.due_date, upcoming.c.id)
+        .limit(limit)
+    ).all()
+
+
+def _get_or_404(model, ident, *options):
+    record = db.session.get(model, ident, options=options or None)
     if record is None:
         abort(404)
     return record
@@ -127,31 +245,30 @@ def _get_or_404(model, ident):
 @main_bp.route("/")
 @login_required
 def index():
-    _ensure_sample_data()
-
-    if current_user.is_authenticated and current_user.course_memberships:
-        course_ids = [m.course_id for m in current_user.course_memberships]
-        courses = [m.course for m in current_user.course_memberships]
-        task_query = Task.query.filter(Task.course_id.in_(course_ids))
+    if current_user.course_ids:
+        course_ids = current_user.course_ids
+        courses = Course.query.filter(Course.id.in_(course_ids)).order_by(Course.id).all()
     else:
         courses = Course.query.all()
-        task_query = Task.query
 
-    upcoming_tasks = (
-        task_query.order_by(Task.due_date.is_(None), Task.due_date).limit(5).all()
+    # without enrollments the dashboard covers every course, as it lists them
+    upcoming_tasks = _upcoming_deadlines(
+        current_user,
+        [course.id for course in courses],
+        current_app.config["DASHBOARD_DEADLINES"],
     )
 
     return render_template(
         "main/index.html",
         courses=courses,
         upcoming_tasks=upcoming_tasks,
+        today=date.today(),
     )
 
 
 @main_bp.route("/courses")
 @login_required
 def courses():
-    _ensure_sample_data()
     all_courses = Course.query.all()
     return render_template("main/courses.html", courses=all_courses)
 
@@ -159,19 +276,24 @@ def courses():
 @main_bp.route("/courses/<int:course_id>")
 @login_required
 def course_detail(course_id):
-    course = _get_or_404(Course, course_id)
-
-    status_form = TaskStatusForm()
-    status_form.status.choices = Task.STATUS_CHOICES
-    comment_form = TaskCommentForm()
+    if not_modified(course_board_state(course_id)):
+        return "", 304
+
+    course = _get_or_404(
+        Course,
+        course_id,
+        selectinload(Course.teams)
+        .selectinload(Team.memberships)
+        .joinedload(TeamMembership.user),
+    )
 
     return render_template(
         "main/course.html",
+        job_form=JobSubmitForm(),
         course=course,
-        status_columns=_build_status_columns(course.tasks),
-        status_form=status_form,
-        comment_form=comment_form,
-        status_choices=Task.STATUS_CHOICES,
+        status_columns=_build_status_columns(
+            Task.query.filter_by(course_id=course.id), "course"
+        ),
         teams=course.teams,
         team_form=TeamForm(),
     )
@@ -201,6 +323,9 @@ def new_task(course_id):
         if form.team_id.data:
             task.team = db.session.get(Team, form.team_id.data) if form.team_id.data else None
         db.session.add(task)
+        CourseTaskRollup.record_change(course.id, None, task.rollup_state())
+        db.session.flush()
+        publish_task_changes([task.id])
         db.session.commit()
         flash("Task created.")
         return redirect(url_for("main.course_detail", course_id=course.id))
@@ -212,6 +337,50 @@ def new_task(course_id):
     return render_template("main/task_form.html", form=form, course=course)
 
 
+def _upload_size(upload):
+    stream = upload.stream
+    position = stream.tell()
+    size = stream.seek(0, os.SEEK_END)
+    stream.seek(position)
+    return size
+
+
+@main_bp.route("/courses/<int:course_id>/tasks/import", methods=["GET", "POST"])
+@login_required
+def import_course_tasks(course_id):
+    course = _get_or_404(Course, course_id)
+    if not current_user.is_instructor:
+        abort(403)
+
+    form = TaskImportForm()
+    report = None
+    if form.validate_on_submit():
+        upload = form.file.data
+        fmt = form.format.data
+        if fmt == "auto":
+            fmt = guess_format(upload.filename)
+        if _upload_size(upload) > current_app.config["IMPORT_BACKGROUND_BYTES"]:
+            job = submit_job(
+                "import_tasks",
+                {
+                    "course_id": course.id,
+                    "path": save_upload(upload.stream, fmt),
+                    "fmt": fmt,
+                },
+                owner=current_user,
+            )
+            return _job_submitted(job)
+        report = import_tasks(upload.stream, fmt, course=course)
+        if report.ok:
+            flash(f"Imported {report.created} task(s).")
+            return redirect(url_for("main.course_detail", course_id=course.id))
+        flash(f"Import rejected: {report.error_count} invalid row(s), nothing was saved.")
+
+    return render_template(
+        "main/task_import.html", form=form, course=course, report=report
+    )
+
+
 @main_bp.route("/tasks/<int:task_id>/status", methods=["POST"])
 @login_required
 def update_task_status(task_id):
@@ -219,15 +388,144 @@ def update_task_status(task_id):
     form = TaskStatusForm()
     form.status.choices = Task.STATUS_CHOICES
 
+    mode = _fragment_mode()
     if not form.validate_on_submit():
+        if mode == "json":
+            return jsonify(errors=form.errors), 400
         abort(400)
 
+    before = task.rollup_state()
     task.status = form.status.data
+    task.touch()
+    CourseTaskRollup.record_change(task.course_id, before, task.rollup_state())
+    payloads = publish_task_changes([task.id])
     db.session.commit()
+    if mode:
+        return _card_response(task, payloads[task.id], mode)
     flash("Task status updated.")
     return redirect(request.referrer or url_for("main.course_detail", course_id=task.course_id))
 
 
+def _prefers_json():
+    return request.accept_mimetypes.best_match(["text/html", "application/json"]) == (
+        "application/json"
+    )
+
+
+def _fragment_mode():
+    """How a card mutation should answer instead of redirecting.
+
+    ``"html"`` for htmx-style requests (``HX-Request: true``), ``"json"``
+    when the client prefers JSON over HTML, otherwise ``None``. Checked
+    before any write so a bad ``?board=`` cannot half-apply a change.
+    """
+    if request.headers.get("HX-Request") == "true":
+        if request.args.get("board", "course") not in ("course", "team"):
+            abort(400)
+        return "html"
+    if _prefers_json():
+        return "json"
+    return None
+
+
+def _card_response(task, payload, mode):
+    """The updated card: its ``_task_card.html`` markup or the live payload.
+
+    HTML fragments render for the board named in ``?board=`` (course by
+    default) through the card cache, like the boards themselves.
+    """
+    if mode == "json":
+        return jsonify(payload)
+    cards, _ = render_task_cards([task], request.args.get("board", "course"))
+    return cards[0]
+
+
+_BULK_ENTRY_KEY = re.compile(r"^updates-\d+-")
+
+
+def _bulk_status_formdata(payload):
+    """Flatten ``{"updates": [{"task_id", "status"}, ...]}`` into form fields."""
+    formdata = MultiDict()
+    updates = payload.get("updates") if isinstance(payload, dict) else None
+    for index, item in enumerate(updates if isinstance(updates, list) else []):
+        if isinstance(item, dict):
+            formdata[f"updates-{index}-task_id"] = str(item.get("task_id", ""))
+            formdata[f"updates-{index}-status"] = str(item.get("status", ""))
+    formdata["csrf_token"] = request.headers.get("X-CSRFToken", "")
+    return formdata
+
+
+@main_bp.route("/tasks/status", methods=["POST"])
+@login_required
+def bulk_update_task_status():
+    """Move many cards at once, from a form post or a JSON body.
+
+    Every pair is validated up front; then the whole batch is applied in
+    one transaction with one UPDATE per target status.
+    """
+    if not current_user.is_instructor:
+        abort(403)
+
+    formdata = (
+        _bulk_status_formdata(request.get_json(silent=True))
+        if request.is_json
+        else request.form
+    )
+    submitted = {
+        key.split("-", 2)[1] for key in formdata if _BULK_ENTRY_KEY.match(key)
+    }
+    if len(submitted) > BulkTaskStatusForm.MAX_UPDATES:
+        message = (
+            f"At most {BulkTaskStatusForm.MAX_UPDATES} updates per batch; "
+            f"got {len(submitted)}. Nothing was changed."
+        )
+        if request.is_json:
+            return jsonify(errors={"updates": [message]}), 413
+        abort(413, description=message)
+
+    form = BulkTaskStatusForm(formdata=formdata)
+    for entry in form.updates:
+        entry.status.choices = Task.STATUS_CHOICES
+
+    if not form.validate_on_submit():
+        if request.is_json:
+            return jsonify(errors=form.errors), 400
+        abort(400)
+
+    wanted = {entry.task_id.data: entry.status.data for entry in form.updates}
+    tasks = Task.query.filter(Task.id.in_(wanted)).all()
+    if len(tasks) != len(wanted):
+        abort(404)
+
+    by_status = defaultdict(list)
+    changes = []
+    for task in tasks:
+        status = wanted[task.id]
+        if task.status == status:
+            continue
+        before = task.rollup_state()
+        by_status[status].append(task.id)
+        changes.append((task.course_id, before, (status, *before[1:])))
+
+    now = datetime.now(timezone.utc)
+    for status, task_ids in by_status.items():
+        # same bookkeeping as Task.touch(), done in SQL
+        db.session.execute(
+            update(Task)
+            .where(Task.id.in_(task_ids))
+            .values(status=status, version=Task.version + 1, updated_at=now),
+            execution_options={"synchronize_session": False},
+        )
+    CourseTaskRollup.record_changes(changes)
+    publish_task_changes([task_id for ids in by_status.values() for task_id in ids])
+    db.session.commit()
+
+    if request.is_json:
+        return jsonify(updated=len(changes), unchanged=len(tasks) - len(changes))
+    flash(f"Moved {len(changes)} task(s).")
+    return redirect(request.referrer or url_for("main.index"))
+
+
 @main_bp.route("/tasks/<int:task_id>/comments", methods=["POST"])
 @login_required
 def add_task_comment(task_id):
@@ -235,16 +533,22 @@ def add_task_comment(task_id):
     if not current_user.can_review_tasks:
         abort(403)
 
+    mode = _fragment_mode()
     form = TaskCommentForm()
-    if form.validate_on_submit():
-        body = form.body.data.strip()
-        if not body:
-            flash("Comment cannot be empty.")
-            return redirect(request.referrer or url_for("main.course_detail", course_id=task.course_id))
-        comment = TaskComment(body=body, task=task, author=current_user)
+    body = form.body.data.strip() if form.validate_on_submit() else ""
+    if body:
+        comment = TaskComment(body=body, task=task, author_id=current_user.id)
         db.session.add(comment)
+        task.touch()
+        payloads = publish_task_changes([task.id])
         db.session.commit()
+        if mode:
+            return _card_response(task, payloads[task.id], mode)
         flash("Feedback posted.")
+    elif mode == "json":
+        return jsonify(errors={"body": ["Comment cannot be empty."]}), 400
+    elif mode:
+        abort(400)
     else:
         flash("Comment cannot be empty.")
     return redirect(request.referrer or url_for("main.course_detail", course_id=task.course_id))
@@ -260,12 +564,24 @@ def grade_task(task_id):
     task = _get_or_404(Task, task_id)
     form = GradeForm()
 
+    mode = _fragment_mode() if request.method == "POST" else None
     if form.validate_on_submit():
+        before = task.rollup_state()
         task.score = form.score.data
+        task.touch()
+        CourseTaskRollup.record_change(task.course_id, before, task.rollup_state())
+        payloads = publish_task_changes([task.id])
         db.session.commit()
+        if mode:
+            return _card_response(task, payloads[task.id], mode)
         flash("Grade saved.")
         return redirect(url_for("main.course_detail", course_id=task.course_id))
 
+    if mode == "json":
+        return jsonify(errors=form.errors), 400
+    if mode:
+        abort(400)
+
     # preload existing score
     if task.score is not None and form.score.data is None:
         form.score.data = task.score
@@ -294,33 +610,30 @@ def create_team(course_id):
 @main_bp.route("/teams/<int:team_id>")
 @login_required
 def team_detail(team_id):
-    team = _get_or_404(Team, team_id)
+    if not_modified(team_board_state(team_id)):
+        return "", 304
+
+    team = _get_or_404(
+        Team,
+        team_id,
+        joinedload(Team.course),
+        selectinload(Team.memberships).joinedload(TeamMembership.user),
+    )
 
     member_form = TeamMemberForm()
-    course_member_ids = {m.user_id for m in team.course.memberships if m.role == "student"}
-    existing_ids = {m.user_id for m in team.memberships}
-    available_students = course_member_ids - existing_ids
-    member_choices = [
-        (m.user.id, m.user.email)
-        for m in team.course.memberships
-        if m.user_id in available_students
-    ]
-    if not member_choices:
-        member_choices = []
-    member_form.user_id.choices = member_choices
-
-    status_form = TaskStatusForm()
-    status_form.status.choices = Task.STATUS_CHOICES
-    comment_form = TaskCommentForm()
+    # only instructors get the add-member form
+    member_form.user_id.choices = (
+        _team_candidates(team) if current_user.is_instructor else []
+    )
 
     return render_template(
         "main/team.html",
+        job_form=JobSubmitForm(),
         team=team,
-        status_columns=_build_status_columns(team.tasks),
+        status_columns=_build_status_columns(
+            Task.query.filter_by(team_id=team.id), "team"
+        ),
         member_form=member_form,
-        status_form=status_form,
-        comment_form=comment_form,
-        status_choices=Task.STATUS_CHOICES,
     )
 
 
@@ -332,12 +645,7 @@ def add_team_member(team_id):
         abort(403)
 
     form = TeamMemberForm()
-    available = [
-        (m.user.id, m.user.email)
-        for m in team.course.memberships
-        if m.role == "student"
-        and m.user_id not in {member.user_id for member in team.memberships}
-    ]
+    available = _team_candidates(team)
     form.user_id.choices = available
 
     if not available:
@@ -353,44 +661,283 @@ def add_team_member(team_id):
     return redirect(url_for("main.team_detail", team_id=team.id))
 
 
+def _event_stream(channel):
+    """A text/event-stream response fed by the live board broker.
+
+    The subscription is taken before the response is returned so nothing
+    published in between is lost. The generator never touches the database
+    or request context; it ends after LIVE_STREAM_SECONDS (the browser
+    reconnects with Last-Event-ID) or when the client falls too far behind.
+
+    Each stream holds a request thread until then, so past LIVE_MAX_STREAMS
+    this process answers 503 instead; EventSource does not retry that, and
+    the board carries on without live updates.
+    """
+    config = current_app.config
+    broker = current_app.extensions["live"]
+    if broker.subscriber_count() >= config["LIVE_MAX_STREAMS"]:
+        return current_app.response_class(
+            "Too many live board streams on this server.",
+            503,
+            mimetype="text/plain",
+        )
+    subscription = broker.subscribe(
+        channel, request.headers.get("Last-Event-ID", type=int)
+    )
+    heartbeat = config["LIVE_HEARTBEAT_SECONDS"]
+    deadline = time.monotonic() + config["LIVE_STREAM_SECONDS"]
+
+    def generate():
+        try:
+            yield f"retry: {heartbeat * 1000}\n\n"
+            while time.monotonic() < deadline:
+                message = subscription.get(timeout=heartbeat)
+                if message is None:
+                    break
+                yield message or ": keepalive\n\n"
+        finally:
+            subscription.close()
+
+    response = current_app.response_class(generate(), mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+
+@main_bp.route("/courses/<int:course_id>/events")
+@login_required
+def course_events(course_id):
+    course = _get_or_404(Course, course_id)
+    return _event_stream(course_channel(course.id))
+
+
+@main_bp.route("/teams/<int:team_id>/events")
+@login_required
+def team_events(team_id):
+    team = _get_or_404(Team, team_id)
+    return _event_stream(team_channel(team.id))
+
+
+def _export_response(where, fmt, filename):
+    if not current_user.can_review_tasks:
+        abort(403)
+    return current_app.response_class(
+        stream_with_context(encode(export_rows(where), fmt)),
+        mimetype=MIMETYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{fmt}"'},
+    )
+
+
+def _course_export_name(course):
+    return "-".join(course.code.lower().split()) + "-gradebook"
+
+
+def _team_export_name(team):
+    return f"team-{team.id}-gradebook"
+
+
+@main_bp.route("/courses/<int:course_id>/export.<any(csv, jsonl):fmt>")
+@login_required
+def export_course_tasks(course_id, fmt):
+    course = _get_or_404(Course, course_id)
+    return _export_response(
+        Task.course_id == course.id, fmt, _course_export_name(course)
+    )
+
+
+@main_bp.route("/teams/<int:team_id>/export.<any(csv, jsonl):fmt>")
+@login_required
+def export_team_tasks(team_id, fmt):
+    team = _get_or_404(Team, team_id)
+    return _export_response(Task.team_id == team.id, fmt, _team_export_name(team))
+
+
+def _job_submitted(job):
+    """202 + job JSON for API clients, otherwise off to the job's page."""
+    location = url_for("main.job_detail", job_id=job.id)
+    if _prefers_json():
+        return jsonify(job.to_dict()), 202, {"Location": location}
+    flash("Started in the background.")
+    return redirect(location)
+
+
+def _submit_job(kind, params, allowed):
+    if not allowed:
+        abort(403)
+    if request.is_json:
+        form = JobSubmitForm(
+            formdata=MultiDict({"csrf_token": request.headers.get("X-CSRFToken", "")})
+        )
+    else:
+        form = JobSubmitForm()
+    if not form.validate_on_submit():
+        abort(400)
+    return _job_submitted(submit_job(kind, params, owner=current_user))
+
+
+@main_bp.route(
+    "/courses/<int:course_id>/export.<any(csv, jsonl):fmt>/job", methods=["POST"]
+)
+@login_required
+def export_course_tasks_job(course_id, fmt):
+    course = _get_or_404(Course, course_id)
+    params = {
+        "scope": "course",
+        "id": course.id,
+        "fmt": fmt,
+        "filename": _course_export_name(course),
+    }
+    return _submit_job("export_tasks", params, current_user.can_review_tasks)
+
+
+@main_bp.route("/teams/<int:team_id>/export.<any(csv, jsonl):fmt>/job", methods=["POST"])
+@login_required
+def export_team_tasks_job(team_id, fmt):
+    team = _get_or_404(Team, team_id)
+    params = {
+        "scope": "team",
+        "id": team.id,
+        "fmt": fmt,
+        "filename": _team_export_name(team),
+    }
+    return _submit_job("export_tasks", params, current_user.can_review_tasks)
+
+
+@main_bp.route("/courses/<int:course_id>/teams/assign", methods=["POST"])
+@login_required
+def assign_course_teams(course_id):
+    course = _get_or_404(Course, course_id)
+    return _submit_job(
+        "assign_teams", {"course_id": course.id}, current_user.is_instructor
+    )
+
+
+@main_bp.route("/analytics/rebuild", methods=["POST"])
+@login_required
+def rebuild_analytics():
+    return _submit_job("rebuild_analytics", {}, current_user.is_instructor)
+
+
+def _own_job(job_id):
+    job = _get_or_404(Job, job_id)
+    if job.owner_id != current_user.id:
+        abort(403)
+    return job
+
+
+@main_bp.route("/jobs")
+@login_required
+def jobs():
+    recent = (
+        Job.query.filter_by(owner_id=current_user.id)
+        .order_by(Job.id.desc())
+        .limit(25)
+        .all()
+    )
+    if _prefers_json():
+        return jsonify(jobs=[job.to_dict() for job in recent])
+    return render_template("main/jobs.html", jobs=recent)
+
+
+@main_bp.route("/jobs/<int:job_id>")
+@login_required
+def job_detail(job_id):
+    job = _own_job(job_id)
+    if _prefers_json():
+        return jsonify(job.to_dict())
+    return render_template("main/job.html", job=job)
+
+
+@main_bp.route("/jobs/<int:job_id>/result")
+@login_required
+def job_result(job_id):
+    job = _own_job(job_id)
+    if job.status != Job.STATUS_SUCCEEDED or not job.result_path:
+        abort(404)
+    if not os.path.isfile(job.result_path):
+        abort(404)
+    name = os.path.basename(job.result_path).split("-", 1)[1]
+    fmt = name.rsplit(".", 1)[-1]
+    return send_file(
+        job.result_path,
+        mimetype=MIMETYPES.get(fmt, "application/octet-stream"),
+        as_attachment=True,
+        download_name=name,
+    )
+
+
 @main_bp.route("/analytics")
 @login_required
 def analytics():
     if not (current_user.is_instructor or current_user.is_ta):
         abort(403)
 
-    _ensure_sample_data()
-    courses = Course.query.all()
-    status_labels = dict(Task.STATUS_CHOICES)
     today = date.today()
+    # checked wherever GETs read from; refreshed from the primary, since the
+    # late counts it computes are written back as they are
+    if CourseTaskRollup.needs_refresh(today):
+        use_primary()
+        if CourseTaskRollup.ensure_current(today):
+            db.session.commit()
+    if not_modified(analytics_state()):
+        return "", 304
+
+    status_labels = Task.STATUS_LABELS
     summaries = []
-
-    for course in courses:
-        counts = {value: 0 for value, _ in Task.STATUS_CHOICES}
-        late = 0
-        for task in course.tasks:
-            counts[task.status] = counts.get(task.status, 0) + 1
-            if task.due_date and task.due_date < today and task.status != Task.STATUS_DONE:
-                late += 1
-        total = sum(counts.values())
-        completion = (counts[Task.STATUS_DONE] / total * 100) if total else 0
+    rows = (
+        db.session.query(Course, CourseTaskRollup)
+        .join(Course.rollup)
+        .order_by(Course.id)
+    )
+    for course, rollup in rows:
+        total = rollup.total
         summaries.append(
             {
                 "course": course,
-                "counts": counts,
+                "counts": rollup.counts,
                 "total": total,
-                "late": late,
-                "completion": completion,
+                "graded": rollup.graded_count,
+                "late": rollup.late_count,
+                "completion": (rollup.done_count / total * 100) if total else 0,
             }
         )
 
     return render_template(
         "main/analytics.html",
+        job_form=JobSubmitForm(),
         course_summaries=summaries,
         status_labels=status_labels,
     )
 
 
+@main_bp.route("/search")
+@login_required
+def search():
+    terms = request.args.get("q", "").strip()
+    page = request.args.get("page", 1, type=int)
+    if page < 1:
+        abort(400)
+    enabled = current_app.extensions.get("search", False)
+
+    results, has_next = [], False
+    if enabled and terms:
+        results, has_next = search_tasks(
+            terms,
+            current_user.course_ids,
+            page=page,
+            page_size=current_app.config["SEARCH_PAGE_SIZE"],
+        )
+
+    return render_template(
+        "main/search.html",
+        terms=terms,
+        page=page,
+        results=results,
+        has_next=has_next,
+        enabled=enabled,
+    )
+
+
 @main_bp.route("/feature")
 def feature():
     # still just a stub; can describe future ideas here
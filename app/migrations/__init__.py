@@ -0,0 +1,188 @@
+"""Versioned schema migrations.
+
+The database records its schema revision in the one-row
+``schema_revision`` table. Each module in ``app/migrations/versions`` is a
+revision: a ``revision`` number, a ``description`` and ``upgrade`` /
+``downgrade`` functions. They get a connection whose transaction also
+bumps the recorded revision, so a revision lands completely or not at all
+(SQLite and PostgreSQL both run DDL transactionally). A revision that
+cannot run inside a transaction sets ``transactional = False``, gets the
+engine instead and must be safe to re-run.
+
+New databases are created from the models, stamped at the baseline and
+then upgraded through the later revisions like any other, so those must
+cope with a schema that already has their change: create indexes and
+tables with ``IF NOT EXISTS`` or check with ``has_index``/``has_column``
+first. Databases from before this module existed start at revision 0 and
+run the baseline.
+
+At startup ``check_schema`` reads the revision and nothing else. Workers
+then either upgrade (``SCHEMA_AUTO_UPGRADE``, the development default) or
+refuse requests until ``flask db-upgrade`` has run, which is how
+production ships schema changes: migrate once, then roll the workers.
+"""
+import importlib
+import logging
+import pkgutil
+import re
+from functools import lru_cache
+
+from sqlalchemy import Column, Integer, MetaData, Table, inspect, insert, select, update
+from sqlalchemy.exc import OperationalError, ProgrammingError
+
+from app import db
+
+log = logging.getLogger(__name__)
+
+BASELINE = 1
+
+_metadata = MetaData()
+schema_revision = Table(
+    "schema_revision", _metadata, Column("revision", Integer, nullable=False)
+)
+
+_MODULE_NAME = re.compile(r"^(\d{4})_\w+$")
+
+
+class MigrationError(RuntimeError):
+    pass
+
+
+class IrreversibleMigration(MigrationError):
+    pass
+
+
+@lru_cache(maxsize=None)
+def revisions():
+    """The revision modules in order, checked to run 1, 2, 3, ..."""
+    from app.migrations import versions
+
+    modules = []
+    for info in pkgutil.iter_modules(versions.__path__):
+        if _MODULE_NAME.match(info.name):
+            modules.append(importlib.import_module(f"{versions.__name__}.{info.name}"))
+    modules.sort(key=lambda module: module.revision)
+    numbers = [module.revision for module in modules]
+    if numbers != list(range(1, len(modules) + 1)):
+        raise MigrationError(f"revisions must run 1..n without gaps, found {numbers}")
+    return tuple(modules)
+
+
+def head():
+    return revisions()[-1].revision
+
+
+def current_revision(engine=None):
+    """The database's revision, or None if it has never been migrated."""
+    engine = engine or db.engine
+    with engine.connect() as conn:
+        try:
+            return conn.execute(select(schema_revision.c.revision)).scalar()
+        except (OperationalError, ProgrammingError):  # no schema_revision table
+            return None
+
+
+def has_index(conn, table, name):
+    return name in {index["name"] for index in inspect(conn).get_indexes(table)}
+
+
+def has_column(conn, table, name):
+    return name in {column["name"] for column in inspect(conn).get_columns(table)}
+
+
+def _set_revision(conn, old, new):
+    if old is None:
+        conn.execute(insert(schema_revision).values(revision=new))
+        return
+    moved = conn.execute(
+        update(schema_revision)
+        .where(schema_revision.c.revision == old)
+        .values(revision=new)
+    ).rowcount
+    if moved != 1:
+        raise MigrationError(
+            f"expected the database at revision {old}; another process is migrating"
+        )
+
+
+def _initialise(engine):
+    """Start tracking revisions: stamp new databases, mark old ones as 0."""
+    existing = inspect(engine).has_table("task")
+    with engine.begin() as conn:
+        _metadata.create_all(conn)
+        if not existing:
+            db.metadata.create_all(conn)
+        _set_revision(conn, None, BASELINE if not existing else 0)
+    return BASELINE if not existing else 0
+
+
+def _run(engine, module, step, old, new):
+    log.info("schema %s -> %s: %s", old, new, module.description)
+    if getattr(module, "transactional", True):
+        with engine.begin() as conn:
+            # the guarded bump comes first so a second migrator blocks on
+            # the write lock and then fails instead of repeating the work
+            _set_revision(conn, old, new)
+            step(conn)
+    else:
+        step(engine)
+        with engine.begin() as conn:
+            _set_revision(conn, old, new)
+
+
+def upgrade(target=None, engine=None):
+    """Apply revisions up to ``target`` (default: head). Returns those run."""
+    engine = engine or db.engine
+    target = head() if target is None else target
+    if not 0 <= target <= head():
+        raise MigrationError(f"no revision {target}; head is {head()}")
+    current = current_revision(engine)
+    if current is None:
+        current = _initialise(engine)
+    applied = []
+    for module in revisions():
+        if current < module.revision <= target:
+            _run(engine, module, module.upgrade, current, module.revision)
+            current = module.revision
+            applied.append(module)
+    return applied
+
+
+def downgrade(target, engine=None):
+    """Revert revisions above ``target``, newest first. Returns those run."""
+    engine = engine or db.engine
+    current = current_revision(engine)
+    if current is None:
+        raise MigrationError("the database has no schema revision yet")
+    if not BASELINE <= target <= current:
+        raise MigrationError(
+            f"can only downgrade to a revision between {BASELINE} and {current}"
+        )
+    applied = []
+    for module in reversed(revisions()):
+        if target < module.revision <= current:
+            _run(engine, module, module.downgrade, current, module.revision - 1)
+            current = module.revision - 1
+            applied.append(module)
+    return applied
+
+
+def check_schema(app):
+    """Startup check: True if the schema matches the code.
+
+    One query when it does. Otherwise upgrades if ``SCHEMA_AUTO_UPGRADE``
+    is set, or logs why not and returns False.
+    """
+    current = current_revision()
+    if current == head():
+        return True
+    if app.config["SCHEMA_AUTO_UPGRADE"] and (current is None or current < head()):
+        upgrade()
+        return True
+    app.logger.error(
+        "database schema is at revision %s but this code needs %s; run "
+        "`flask db-upgrade` (or deploy the matching code)",
+        current,
+        head(),
+    )
+    return False
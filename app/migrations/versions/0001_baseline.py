@@ -0,0 +1,164 @@
+"""Baseline: bring a database from before versioned migrations up to date.
+
+Those databases were kept current by ``create_all`` plus the in-place
+upgrades below, run on every start. This revision runs them one last
+time: create the tables added since, convert ``task.status`` to integer
+codes and add the indexes the old tables lack. Each step checks the live
+schema first, which also makes the revision safe to re-run.
+
+New databases are created from the models and stamped at this revision,
+so it never runs for them.
+"""
+import logging
+
+from sqlalchemy import inspect
+from sqlalchemy.schema import CreateTable
+from sqlalchemy.types import Integer
+
+from app import db
+from app.migrations import IrreversibleMigration
+from app.models import Task, TaskStatusCode
+
+log = logging.getLogger(__name__)
+
+revision = 1
+description = "baseline for databases made by create_all"
+# the status rebuild toggles foreign_keys, which only works outside a
+# transaction; every step checks before it changes anything
+transactional = False
+
+# task columns added after the first release, with values for old rows
+_TASK_BACKFILL = {"version": "1", "updated_at": "CURRENT_TIMESTAMP"}
+
+
+def _status_code_case(column="status"):
+    whens = " ".join(
+        f"WHEN '{key}' THEN {code}" for key, code in TaskStatusCode.CODES.items()
+    )
+    # anything unrecognised was never a valid form choice; park it in To do
+    return f"CASE {column} {whens} ELSE {TaskStatusCode.CODES[Task.STATUS_TODO]} END"
+
+
+def upgrade_task_status(engine):
+    """Convert ``task.status`` from its old VARCHAR keys to SMALLINT codes.
+
+    SQLite cannot change a column type or add a CHECK constraint in place,
+    so the table is rebuilt from the current model, with the rows copied
+    across through a CASE and the indexes and triggers recreated. That is
+    the standard 12-step table rebuild, done in one transaction. PostgreSQL converts the
+    column with ``ALTER ... TYPE ... USING``. Returns True if it migrated.
+    """
+    columns = {column["name"]: column for column in inspect(engine).get_columns("task")}
+    if isinstance(columns["status"]["type"], Integer):
+        return False
+
+    table = Task.__table__
+    if engine.dialect.name == "sqlite":
+        with engine.connect() as conn:
+            foreign_keys = conn.exec_driver_sql("PRAGMA foreign_keys").scalar()
+            if foreign_keys:
+                # only takes effect outside a transaction; pysqlite does not
+                # open one for PRAGMAs, so this commit just ends autobegin
+                conn.exec_driver_sql("PRAGMA foreign_keys = OFF")
+            conn.commit()
+            try:
+                with conn.begin():
+                    # triggers that mention task would stop the rename; park
+                    # them and put them back afterwards
+                    triggers = conn.exec_driver_sql(
+                        "SELECT name, sql FROM sqlite_master WHERE type = 'trigger'"
+                    ).all()
+                    for name, _ in triggers:
+                        conn.exec_driver_sql(f'DROP TRIGGER "{name}"')
+                    create = str(CreateTable(table).compile(conn)).replace(
+                        f"CREATE TABLE {table.name} ",
+                        f"CREATE TABLE {table.name}_upgrade ",
+                        1,
+                    )
+                    conn.exec_driver_sql(create)
+                    names, values = [], []
+                    for column in table.columns:
+                        if column.name == "status":
+                            value = _status_code_case()
+                        elif column.name in columns:
+                            value = column.name
+                        else:
+                            value = _TASK_BACKFILL[column.name]
+                        names.append(column.name)
+                        values.append(value)
+                    conn.exec_driver_sql(
+                        f"INSERT INTO {table.name}_upgrade ({', '.join(names)}) "
+                        f"SELECT {', '.join(values)} FROM {table.name}"
+                    )
+                    conn.exec_driver_sql(f"DROP TABLE {table.name}")
+                    conn.exec_driver_sql(
+                        f"ALTER TABLE {table.name}_upgrade RENAME TO {table.name}"
+                    )
+                    for index in table.indexes:
+                        index.create(conn)
+                    for _, sql in triggers:
+                        conn.exec_driver_sql(sql)
+                    problems = conn.exec_driver_sql("PRAGMA foreign_key_check").all()
+                    if problems:
+                        raise RuntimeError(
+                            f"task upgrade left dangling foreign keys: {problems[:5]}"
+                        )
+            finally:
+                if foreign_keys:
+                    conn.exec_driver_sql("PRAGMA foreign_keys = ON")
+                    conn.commit()
+    elif engine.dialect.name == "postgresql":
+        check = next(
+            constraint
+            for constraint in table.constraints
+            if constraint.name == "ck_task_status"
+        )
+        with engine.begin() as conn:
+            conn.exec_driver_sql(
+                "ALTER TABLE task ALTER COLUMN status TYPE SMALLINT "
+                f"USING {_status_code_case()}"
+            )
+            conn.exec_driver_sql(
+                f"ALTER TABLE task ADD CONSTRAINT {check.name} CHECK ({check.sqltext})"
+            )
+    else:
+        raise RuntimeError(
+            f"task.status still holds text keys and there is no automatic "
+            f"upgrade for {engine.dialect.name}; map {TaskStatusCode.CODES} by hand"
+        )
+
+    log.info("converted task.status to integer codes")
+    return True
+
+
+def create_missing_indexes(engine):
+    """Create model indexes that an existing table does not have yet.
+
+    ``create_all`` only builds indexes together with a new table, so an
+    index added to a model later would otherwise never reach old databases.
+    Returns the names created.
+    """
+    inspector = inspect(engine)
+    created = []
+    with engine.begin() as conn:
+        for table in db.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {index["name"] for index in inspector.get_indexes(table.name)}
+            for index in sorted(table.indexes, key=lambda index: index.name):
+                if index.name not in existing:
+                    index.create(conn)
+                    created.append(index.name)
+    if created:
+        log.info("created indexes: %s", ", ".join(created))
+    return created
+
+
+def upgrade(engine):
+    db.metadata.create_all(engine)
+    upgrade_task_status(engine)
+    create_missing_indexes(engine)
+
+
+def downgrade(engine):
+    raise IrreversibleMigration("the baseline revision cannot be downgraded")
@@ -0,0 +1,13 @@
+"""Full-text search table and the triggers that keep it in sync."""
+from app.search import drop_search_index, install_search_index
+
+revision = 2
+description = "FTS5 search index over tasks and comments"
+
+
+def upgrade(conn):
+    install_search_index(conn)
+
+
+def downgrade(conn):
+    drop_search_index(conn)
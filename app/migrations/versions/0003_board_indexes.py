@@ -0,0 +1,34 @@
+"""Board indexes that return each status column already in page order.
+
+The boards page a column by (due_date, id) within (course or team,
+status). The old (course_id, status) and (team_id, status) indexes found
+the column but left every task in it to be sorted for each page; the
+wider indexes walk it in order and still serve the per-status counts.
+"""
+from app.models import Task
+
+revision = 3
+description = "course and team board indexes on (status, due_date, id)"
+
+_OLD = {
+    "ix_task_course_status": ("course_id", "status"),
+    "ix_task_team_status": ("team_id", "status"),
+}
+_NEW = ("ix_task_course_board", "ix_task_team_board")
+
+
+def upgrade(conn):
+    for index in Task.__table__.indexes:
+        if index.name in _NEW:
+            index.create(conn, checkfirst=True)
+    for name in _OLD:
+        conn.exec_driver_sql(f"DROP INDEX IF EXISTS {name}")
+
+
+def downgrade(conn):
+    for name, columns in _OLD.items():
+        conn.exec_driver_sql(
+            f"CREATE INDEX IF NOT EXISTS {name} ON task ({', '.join(columns)})"
+        )
+    for name in _NEW:
+        conn.exec_driver_sql(f"DROP INDEX IF EXISTS {name}")
@@ -0,0 +1,18 @@
+"""Live board events shared between web processes.
+
+Publishers write one row per event and every process relays new rows to
+its own streams, so a change reaches every open board whichever worker
+served it.
+"""
+from app.models import LiveEvent
+
+revision = 4
+description = "live_event table for cross-process board streams"
+
+
+def upgrade(conn):
+    LiveEvent.__table__.create(conn, checkfirst=True)
+
+
+def downgrade(conn):
+    LiveEvent.__table__.drop(conn, checkfirst=True)
@@ -0,0 +1 @@
+"""One module per schema revision, named ``NNNN_slug.py``."""
@@ -1,10 +1,34 @@
-from datetime import datetime, timezone
+from collections import defaultdict
+from datetime import date, datetime, timezone
 
 from app import db, login_manager
+from flask import current_app, has_app_context
 from flask_login import UserMixin
+from sqlalchemy import and_, case, event, func, or_, update
+from sqlalchemy.orm import Session, selectinload
 
 
-class User(UserMixin, db.Model):
+class RoleMixin:
+    """Role checks shared by User rows and cached UserSnapshots."""
+
+    @property
+    def is_instructor(self) -> bool:
+        return self.role == "instructor"
+
+    @property
+    def is_student(self) -> bool:
+        return self.role == "student"
+
+    @property
+    def is_ta(self) -> bool:
+        return self.role == "ta"
+
+    @property
+    def can_review_tasks(self) -> bool:
+        return self.role in ("instructor", "ta")
+
+
+class User(RoleMixin, UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     email = db.Column(db.String(120), unique=True, nullable=False)
     # global role for now: "student", "instructor", "ta"
@@ -29,26 +53,89 @@ class User(UserMixin, db.Model):
     def __repr__(self) -> str:
         return f"<User {self.email} ({self.role})>"
 
-    @property
-    def is_instructor(self) -> bool:
-        return self.role == "instructor"
 
-    @property
-    def is_student(self) -> bool:
-        return self.role == "student"
+class UserSnapshot(RoleMixin, UserMixin):
+    """Detached, read-only view of a user that Flask-Login hands out.
 
-    @property
-    def is_ta(self) -> bool:
-        return self.role == "ta"
+    It carries just what requests need (id, email, role, enrolled course
+    ids and team ids), so it can live in an in-process cache between
+    requests.
+    Use ``id`` where a foreign key is needed rather than the object itself.
+    """
 
-    @property
-    def can_review_tasks(self) -> bool:
-        return self.role in ("instructor", "ta")
+    def __init__(self, id, email, role, course_ids, team_ids=()):
+        self.id = id
+        self.email = email
+        self.role = role
+        self.course_ids = tuple(course_ids)
+        self.team_ids = tuple(team_ids)
+
+    def __repr__(self) -> str:
+        return f"<UserSnapshot {self.email} ({self.role})>"
+
+    @classmethod
+    def load(cls, user_id):
+        user = db.session.get(
+            User,
+            user_id,
+            options=[
+                selectinload(User.course_memberships),
+                selectinload(User.team_memberships),
+            ],
+        )
+        if user is None:
+            return None
+        return cls(
+            user.id,
+            user.email,
+            user.role,
+            sorted(m.course_id for m in user.course_memberships),
+            sorted(m.team_id for m in user.team_memberships),
+        )
 
 
 @login_manager.user_loader
 def load_user(user_id):
-    return db.session.get(User, int(user_id))
+    user_id = int(user_id)
+    cache = current_app.extensions["user_cache"]
+    snapshot = cache.get(user_id)
+    if snapshot is None:
+        snapshot = UserSnapshot.load(user_id)
+        if snapshot is not None:
+            cache.set(user_id, snapshot)
+    return snapshot
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_stale_users(session, flush_context):
+    """Remember users whose role, course or team memberships were written."""
+    stale = session.info.setdefault("stale_user_ids", set())
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, User):
+            # adding a comment touches author.task_comments; that is not
+            # a change to anything the snapshot holds
+            if obj in session.dirty and not session.is_modified(
+                obj, include_collections=False
+            ):
+                continue
+            stale.add(obj.id)
+        elif isinstance(obj, (CourseMembership, TeamMembership)):
+            stale.add(obj.user_id if obj.user_id is not None else obj.user.id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_stale_users(session):
+    stale = session.info.pop("stale_user_ids", None)
+    if stale and has_app_context():
+        cache = current_app.extensions.get("user_cache")
+        if cache is not None:
+            for user_id in stale:
+                cache.pop(user_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_stale_users(session):
+    session.info.pop("stale_user_ids", None)
 
 
 class Course(db.Model):
@@ -68,6 +155,12 @@ class Course(db.Model):
     teams = db.relationship(
         "Team", back_populates="course", cascade="all, delete-orphan"
     )
+    rollup = db.relationship(
+        "CourseTaskRollup",
+        back_populates="course",
+        uselist=False,
+        cascade="all, delete-orphan",
+    )
 
     def __repr__(self) -> str:
         return f"<Course {self.code}>"
@@ -84,6 +177,8 @@ class CourseMembership(db.Model):
 
     __table_args__ = (
         db.UniqueConstraint("user_id", "course_id", name="uq_user_course"),
+        # uq_user_course covers lookups by user; course rosters need this one
+        db.Index("ix_course_membership_course", "course_id", "role"),
     )
 
     def __repr__(self) -> str:
@@ -103,6 +198,8 @@ class Team(db.Model):
     )
     tasks = db.relationship("Task", back_populates="team")
 
+    __table_args__ = (db.Index("ix_team_course", "course_id"),)
+
     def member_names(self):
         return ", ".join(m.user.email for m in self.memberships) or "No members yet"
 
@@ -118,12 +215,41 @@ class TeamMembership(db.Model):
     user = db.relationship("User", back_populates="team_memberships")
     team = db.relationship("Team", back_populates="memberships")
 
-    __table_args__ = (db.UniqueConstraint("user_id", "team_id", name="uq_user_team"),)
+    __table_args__ = (
+        db.UniqueConstraint("user_id", "team_id", name="uq_user_team"),
+        db.Index("ix_team_membership_team", "team_id"),
+    )
 
     def __repr__(self) -> str:
         return f"<TeamMembership {self.user.email} -> {self.team.name}>"
 
 
+class TaskStatusCode(db.TypeDecorator):
+    """Task status stored as a SMALLINT code, read and written as its key.
+
+    Python code, forms, templates and JSON keep using the string keys;
+    only the column holds the integer. Codes are schema: add new statuses
+    with new codes and never renumber the existing ones.
+    """
+
+    impl = db.SmallInteger
+    cache_ok = True
+
+    CODES = {"todo": 0, "in_progress": 1, "done": 2}
+    KEYS = {code: key for key, code in CODES.items()}
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        try:
+            return self.CODES[value]
+        except KeyError:
+            raise ValueError(f"unknown task status {value!r}") from None
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else self.KEYS[value]
+
+
 class Task(db.Model):
     """Task doubles as an assignment in this prototype.
 
@@ -139,13 +265,14 @@ class Task(db.Model):
         (STATUS_IN_PROGRESS, "In progress"),
         (STATUS_DONE, "Done"),
     ]
+    STATUS_LABELS = dict(STATUS_CHOICES)
 
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(140), nullable=False)
     description = db.Column(db.Text)
     due_date = db.Column(db.Date)
     status = db.Column(
-        db.String(20),
+        TaskStatusCode,
         nullable=False,
         default=STATUS_TODO,
     )
@@ -154,6 +281,15 @@ class Task(db.Model):
     points = db.Column(db.Integer, nullable=False, default=100)
     score = db.Column(db.Integer)  # None = not graded yet
 
+    # bumped by touch() whenever the status, grade or comments change;
+    # cached board cards are keyed on it
+    version = db.Column(db.Integer, nullable=False, default=1)
+    updated_at = db.Column(
+        db.DateTime,
+        default=lambda: datetime.now(timezone.utc),
+        nullable=False,
+    )
+
     course_id = db.Column(db.Integer, db.ForeignKey("course.id"), nullable=False)
     team_id = db.Column(db.Integer, db.ForeignKey("team.id"))
     course = db.relationship("Course", back_populates="tasks")
@@ -165,13 +301,47 @@ class Task(db.Model):
         order_by="TaskComment.created_at.desc()",
     )
 
+    # Match the real access paths: course and team boards page each status
+    # column by (due_date, id), which also serves analytics' per-status
+    # counts, and ix_task_course_due lists a course's tasks by due date.
+    # ix_task_upcoming is the dashboard's view of open, dated tasks only;
+    # completing a task drops it from the index.
+    __table_args__ = (
+        db.Index("ix_task_course_board", "course_id", "status", "due_date", "id"),
+        db.Index("ix_task_course_due", "course_id", "due_date"),
+        db.Index("ix_task_team_board", "team_id", "status", "due_date", "id"),
+        db.Index(
+            "ix_task_upcoming",
+            "course_id",
+            "due_date",
+            "id",
+            sqlite_where=db.and_(status != STATUS_DONE, due_date.isnot(None)),
+            postgresql_where=db.and_(status != STATUS_DONE, due_date.isnot(None)),
+        ),
+        db.CheckConstraint(
+            "status IN ({})".format(
+                ", ".join(str(code) for code in TaskStatusCode.KEYS)
+            ),
+            name="ck_task_status",
+        ),
+    )
+
     def __repr__(self) -> str:
         return f"<Task {self.title} ({self.status})>"
 
     @property
     def status_label(self) -> str:
         """Human readable label for templates."""
-        return dict(self.STATUS_CHOICES).get(self.status, self.status)
+        return self.STATUS_LABELS.get(self.status, self.status)
+
+    def touch(self):
+        """Mark the card as changed so cached renderings are not reused."""
+        self.version = (self.version or 1) + 1
+        self.updated_at = datetime.now(timezone.utc)
+
+    def rollup_state(self):
+        """The fields CourseTaskRollup counts: (status, graded, due_date)."""
+        return (self.status or self.STATUS_TODO, self.score is not None, self.due_date)
 
 
 class TaskComment(db.Model):
@@ -189,5 +359,305 @@ class TaskComment(db.Model):
     task = db.relationship("Task", back_populates="comments")
     author = db.relationship("User", back_populates="task_comments")
 
+    __table_args__ = (
+        db.Index("ix_task_comment_task_created", "task_id", created_at.desc()),
+        db.Index("ix_task_comment_author", "author_id"),
+    )
+
     def __repr__(self) -> str:
         return f"<TaskComment {self.author.email} on {self.task.title}>"
+
+
+class CourseTaskRollup(db.Model):
+    """Per-course task counters behind the analytics page.
+
+    Write paths call ``record_change`` in the same transaction as the task
+    change, so reading the dashboard costs one row per course. Late counts
+    depend on the calendar, so they are stamped with ``late_as_of`` and
+    recomputed once a day by ``ensure_current``. ``rebuild`` resyncs
+    everything from the task table (``flask rebuild-analytics``).
+    """
+
+    STATUS_COLUMNS = {
+        Task.STATUS_TODO: "todo_count",
+        Task.STATUS_IN_PROGRESS: "in_progress_count",
+        Task.STATUS_DONE: "done_count",
+    }
+
+    course_id = db.Column(db.Integer, db.ForeignKey("course.id"), primary_key=True)
+    todo_count = db.Column(db.Integer, nullable=False, default=0)
+    in_progress_count = db.Column(db.Integer, nullable=False, default=0)
+    done_count = db.Column(db.Integer, nullable=False, default=0)
+    graded_count = db.Column(db.Integer, nullable=False, default=0)
+    late_count = db.Column(db.Integer, nullable=False, default=0)
+    late_as_of = db.Column(db.Date)
+    updated_at = db.Column(
+        db.DateTime,
+        default=lambda: datetime.now(timezone.utc),
+        onupdate=lambda: datetime.now(timezone.utc),
+        nullable=False,
+    )
+
+    course = db.relationship("Course", back_populates="rollup")
+
+    def __repr__(self) -> str:
+        return f"<CourseTaskRollup course={self.course_id}>"
+
+    @property
+    def counts(self):
+        """Task counts keyed by status value, in STATUS_CHOICES order."""
+        return {
+            value: getattr(self, self.STATUS_COLUMNS[value])
+            for value, _ in Task.STATUS_CHOICES
+        }
+
+    @property
+    def total(self) -> int:
+        return sum(self.counts.values())
+
+    @staticmethod
+    def _is_late(status, due_date, today) -> bool:
+        return bool(due_date) and due_date < today and status != Task.STATUS_DONE
+
+    @staticmethod
+    def _late_case(today):
+        return case(
+            (and_(Task.due_date < today, Task.status != Task.STATUS_DONE), 1),
+            else_=0,
+        )
+
+    @classmethod
+    def record_change(cls, course_id, before, after, today=None):
+        """Apply one task change to the course rollup.
+
+        ``before``/``after`` are ``Task.rollup_state()`` tuples, or ``None``
+        for a task that did not exist before or no longer exists. Counters
+        are bumped with a single ``UPDATE ... SET col = col + n`` so
+        concurrent writers never lose increments. Courses that have no
+        rollup row yet are rebuilt from the task table instead.
+        """
+        cls.record_changes([(course_id, before, after)], today)
+
+    @classmethod
+    def record_changes(cls, changes, today=None):
+        """Apply many ``(course_id, before, after)`` changes at once.
+
+        Deltas are summed per course first, so a batch costs one UPDATE per
+        course touched rather than one per task.
+        """
+        today = today or date.today()
+        deltas = defaultdict(lambda: defaultdict(int))
+        for course_id, before, after in changes:
+            course_deltas = deltas[course_id]
+            for state, sign in ((before, -1), (after, 1)):
+                if state is None:
+                    continue
+                status, graded, due_date = state
+                course_deltas[cls.STATUS_COLUMNS[status]] += sign
+                if graded:
+                    course_deltas["graded_count"] += sign
+                if cls._is_late(status, due_date, today):
+                    course_deltas["late_count"] += sign
+
+        missing = []
+        for course_id, course_deltas in deltas.items():
+            late = course_deltas.pop("late_count", 0)
+            values = {
+                name: getattr(cls, name) + delta
+                for name, delta in course_deltas.items()
+                if delta
+            }
+            if late:
+                # a stale late count gets recomputed wholesale by ensure_current
+                values["late_count"] = cls.late_count + case(
+                    (cls.late_as_of == today, late), else_=0
+                )
+            if not values:
+                continue
+            result = db.session.execute(
+                update(cls).where(cls.course_id == course_id).values(values)
+            )
+            if result.rowcount == 0:
+                missing.append(course_id)
+        if missing:
+            cls.rebuild(missing, today)
+
+    @classmethod
+    def rebuild(cls, course_ids=None, today=None):
+        """Recompute rollups from the task table (all courses by default)."""
+        today = today or date.today()
+        if course_ids is None:
+            course_ids = [row[0] for row in db.session.query(Course.id)]
+        course_ids = list(course_ids)
+        if not course_ids:
+            return
+
+        rollups = {}
+        for course_id in course_ids:
+            rollup = db.session.get(cls, course_id)
+            if rollup is None:
+                rollup = cls(course_id=course_id)
+                db.session.add(rollup)
+            for column in cls.STATUS_COLUMNS.values():
+                setattr(rollup, column, 0)
+            rollup.graded_count = 0
+            rollup.late_count = 0
+            rollup.late_as_of = today
+            rollups[course_id] = rollup
+
+        graded = case((Task.score.isnot(None), 1), else_=0)
+        rows = (
+            db.session.query(
+                Task.course_id,
+                Task.status,
+                func.count(Task.id),
+                func.sum(graded),
+                func.sum(cls._late_case(today)),
+            )
+            .filter(Task.course_id.in_(course_ids))
+            .group_by(Task.course_id, Task.status)
+        )
+        for course_id, status, count, graded_count, late_count in rows:
+            rollup = rollups[course_id]
+            column = cls.STATUS_COLUMNS[status]
+            setattr(rollup, column, getattr(rollup, column) + count)
+            rollup.graded_count += graded_count or 0
+            rollup.late_count += late_count or 0
+        db.session.flush()
+
+    @classmethod
+    def _outdated(cls, today):
+        return (
+            db.session.query(Course.id, cls.course_id)
+            .outerjoin(Course.rollup)
+            .filter(
+                or_(
+                    cls.course_id.is_(None),
+                    cls.late_as_of.is_(None),
+                    cls.late_as_of != today,
+                )
+            )
+        )
+
+    @classmethod
+    def needs_refresh(cls, today=None) -> bool:
+        """True if ``ensure_current`` has work to do; one read-only query."""
+        return db.session.query(cls._outdated(today or date.today()).exists()).scalar()
+
+    @classmethod
+    def ensure_current(cls, today=None) -> bool:
+        """Create missing rollups and refresh late counts from an earlier day.
+
+        The counts are written back as absolute values, so run this on the
+        primary, never from a replica that may lag. In the steady state it
+        is one query that finds nothing to do. Returns True when rows were
+        written, so the caller can commit.
+        """
+        today = today or date.today()
+        rows = cls._outdated(today).all()
+        if not rows:
+            return False
+
+        missing = [course_id for course_id, rollup_id in rows if rollup_id is None]
+        stale = [rollup_id for _, rollup_id in rows if rollup_id is not None]
+        if missing:
+            cls.rebuild(missing, today)
+        if stale:
+            late_counts = dict(
+                db.session.query(Task.course_id, func.sum(cls._late_case(today)))
+                .filter(Task.course_id.in_(stale))
+                .group_by(Task.course_id)
+            )
+            for course_id in stale:
+                rollup = db.session.get(cls, course_id)
+                rollup.late_count = late_counts.get(course_id) or 0
+                rollup.late_as_of = today
+            db.session.flush()
+        return True
+
+
+class Job(db.Model):
+    """A long-running operation queued for the background runner.
+
+    Rows are the queue: workers claim the oldest queued job with a guarded
+    UPDATE, so any number of in-process pools and ``flask jobs-worker``
+    processes can share one table. Files a job produces live under
+    JOB_DIR and are referenced by ``result_path``.
+    """
+
+    STATUS_QUEUED = "queued"
+    STATUS_RUNNING = "running"
+    STATUS_SUCCEEDED = "succeeded"
+    STATUS_FAILED = "failed"
+    FINISHED = (STATUS_SUCCEEDED, STATUS_FAILED)
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(40), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default=STATUS_QUEUED)
+    progress = db.Column(db.Integer, nullable=False, default=0)  # percent
+    params = db.Column(db.JSON, nullable=False, default=dict)
+    result = db.Column(db.JSON)
+    result_path = db.Column(db.String(255))
+    error = db.Column(db.Text)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    worker = db.Column(db.String(120))
+    owner_id = db.Column(db.Integer, db.ForeignKey("user.id"))
+    created_at = db.Column(
+        db.DateTime,
+        default=lambda: datetime.now(timezone.utc),
+        nullable=False,
+    )
+    started_at = db.Column(db.DateTime)
+    heartbeat_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+    owner = db.relationship("User")
+
+    # workers claim "oldest queued", the jobs page lists a user's newest
+    __table_args__ = (
+        db.Index("ix_job_status", "status", "id"),
+        db.Index("ix_job_owner", "owner_id", "id"),
+    )
+
+    def __repr__(self) -> str:
+        return f"<Job {self.id} {self.kind} ({self.status})>"
+
+    @property
+    def finished(self) -> bool:
+        return self.status in self.FINISHED
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "progress": self.progress,
+            "result": self.result,
+            "error": self.error,
+            "has_file": self.result_path is not None,
+        }
+
+
+class LiveEvent(db.Model):
+    """A live board event, as published; every web process relays new rows.
+
+    The row id is the SSE event id, so it has to keep growing even after
+    old rows are pruned (hence AUTOINCREMENT on SQLite).
+    """
+
+    __tablename__ = "live_event"
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    id = db.Column(db.Integer, primary_key=True)
+    # space-separated, e.g. "course:3 team:7"
+    channels = db.Column(db.String(255), nullable=False)
+    event = db.Column(db.String(32), nullable=False)
+    data = db.Column(db.Text, nullable=False)
+    created_at = db.Column(
+        db.DateTime,
+        default=lambda: datetime.now(timezone.utc),
+        nullable=False,
+    )
+
+    def __repr__(self) -> str:
+        return f"<LiveEvent {self.id} {self.event} {self.channels}>"
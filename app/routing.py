@@ -0,0 +1,66 @@
+"""Send read-only requests to a read replica.
+
+With SQLALCHEMY_READ_URI set, that database becomes the ``read`` bind and
+``db.session`` reads from it during GET, HEAD and OPTIONS requests.
+Everything else stays on the primary: other methods, CLI commands, job
+workers, and any flush or INSERT/UPDATE/DELETE, after which the rest of
+the request stays on the primary too.
+
+Replicas lag, so a browser that has just changed something would not see
+it on the page it is redirected to. After a successful write request the
+session remembers to read from the primary for READ_YOUR_WRITES_SECONDS.
+"""
+import time
+
+from flask import current_app, g, has_request_context, request, session
+from flask_sqlalchemy.session import Session
+from sqlalchemy.sql.dml import UpdateBase
+
+READ_BIND = "read"
+SAFE_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+# session key: epoch seconds until which this browser reads from the primary
+_PRIMARY_UNTIL = "primary_until"
+
+
+class RoutingSession(Session):
+    """``db.session`` class that picks the read bind while ``g.db_replica``."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_request_context() and g.get("db_replica"):
+            if self._flushing or isinstance(clause, UpdateBase):
+                # a "read-only" request wrote after all; keep it on the primary
+                g.db_replica = False
+            else:
+                return self._db.engines[READ_BIND]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def _choose_database():
+    g.db_replica = (
+        request.method in SAFE_METHODS
+        and session.get(_PRIMARY_UNTIL, 0) <= time.time()
+    )
+
+
+def _pin_after_write(response):
+    if request.method not in SAFE_METHODS and response.status_code < 400:
+        seconds = current_app.config["READ_YOUR_WRITES_SECONDS"]
+        session[_PRIMARY_UNTIL] = round(time.time() + seconds, 3)
+    return response
+
+
+def use_primary():
+    """Send the rest of this request to the primary.
+
+    For reads whose results are written back: a lagging replica would turn
+    them into stale writes.
+    """
+    if has_request_context():
+        g.db_replica = False
+
+
+def init_read_routing(app):
+    if READ_BIND not in app.config.get("SQLALCHEMY_BINDS", {}):
+        return
+    app.before_request(_choose_database)
+    app.after_request(_pin_after_write)
@@ -0,0 +1,209 @@
+"""Full-text search over tasks and feedback, backed by SQLite FTS5.
+
+``search_index`` holds one row per task (title + description) and one per
+comment (body). Triggers on ``task`` and ``task_comment`` keep it in step
+with every write path, including bulk UPDATEs and executemany imports that
+bypass the ORM. FTS rowids encode the source row (tasks ``2 * id``,
+comments ``2 * id + 1``) so triggers update by rowid instead of scanning
+the index. ``flask rebuild-search`` repopulates it from scratch. Migration 0002
+installs the table and triggers.
+
+Other databases have no FTS5; there the index is not installed and
+``/search`` says so.
+"""
+import logging
+import re
+
+from markupsafe import Markup, escape
+from sqlalchemy import bindparam, inspect, text
+from sqlalchemy.exc import OperationalError
+
+from app import db
+
+log = logging.getLogger(__name__)
+
+_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+        title,
+        body,
+        kind UNINDEXED,
+        task_id UNINDEXED,
+        course_id UNINDEXED,
+        tokenize = 'porter unicode61'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS search_task_insert AFTER INSERT ON task BEGIN
+        INSERT INTO search_index (rowid, title, body, kind, task_id, course_id)
+        VALUES (new.id * 2, new.title, coalesce(new.description, ''), 'task',
+                new.id, new.course_id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS search_task_update
+    AFTER UPDATE OF title, description, course_id ON task BEGIN
+        DELETE FROM search_index WHERE rowid = old.id * 2;
+        INSERT INTO search_index (rowid, title, body, kind, task_id, course_id)
+        VALUES (new.id * 2, new.title, coalesce(new.description, ''), 'task',
+                new.id, new.course_id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS search_task_delete AFTER DELETE ON task BEGIN
+        DELETE FROM search_index WHERE rowid = old.id * 2;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS search_comment_insert
+    AFTER INSERT ON task_comment BEGIN
+        INSERT INTO search_index (rowid, title, body, kind, task_id, course_id)
+        SELECT new.id * 2 + 1, '', new.body, 'comment', new.task_id, task.course_id
+        FROM task WHERE task.id = new.task_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS search_comment_update
+    AFTER UPDATE OF body, task_id ON task_comment BEGIN
+        DELETE FROM search_index WHERE rowid = old.id * 2 + 1;
+        INSERT INTO search_index (rowid, title, body, kind, task_id, course_id)
+        SELECT new.id * 2 + 1, '', new.body, 'comment', new.task_id, task.course_id
+        FROM task WHERE task.id = new.task_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS search_comment_delete
+    AFTER DELETE ON task_comment BEGIN
+        DELETE FROM search_index WHERE rowid = old.id * 2 + 1;
+    END
+    """,
+]
+
+_REBUILD = [
+    "DELETE FROM search_index",
+    """
+    INSERT INTO search_index (rowid, title, body, kind, task_id, course_id)
+    SELECT id * 2, title, coalesce(description, ''), 'task', id, course_id
+    FROM task
+    """,
+    """
+    INSERT INTO search_index (rowid, title, body, kind, task_id, course_id)
+    SELECT task_comment.id * 2 + 1, '', task_comment.body, 'comment',
+           task_comment.task_id, task.course_id
+    FROM task_comment JOIN task ON task.id = task_comment.task_id
+    """,
+]
+
+_TRIGGERS = [
+    "search_task_insert",
+    "search_task_update",
+    "search_task_delete",
+    "search_comment_insert",
+    "search_comment_update",
+    "search_comment_delete",
+]
+
+# snippet() highlight markers; never present in user text after escaping
+_OPEN, _CLOSE = "\x02", "\x03"
+
+_SEARCH = text(
+    """
+    SELECT search_index.kind,
+           search_index.task_id,
+           task.title,
+           course.id,
+           course.code,
+           snippet(search_index, -1, char(2), char(3), '…', 16),
+           bm25(search_index, 4.0, 1.0) AS rank
+    FROM search_index
+    JOIN task ON task.id = search_index.task_id
+    JOIN course ON course.id = search_index.course_id
+    WHERE search_index MATCH :query
+      AND search_index.course_id IN :course_ids
+    ORDER BY rank, search_index.rowid
+    LIMIT :limit OFFSET :offset
+    """
+).bindparams(bindparam("course_ids", expanding=True))
+
+
+def install_search_index(conn):
+    """Create the FTS table and triggers if missing; returns availability.
+
+    Runs inside the migration's transaction on ``conn``.
+    """
+    if conn.dialect.name != "sqlite":
+        return False
+    existed = inspect(conn).has_table("search_index")
+    try:
+        for statement in _DDL:
+            conn.exec_driver_sql(statement)
+    except OperationalError as exc:  # SQLite built without FTS5
+        log.warning("full-text search disabled: %s", exc)
+        return False
+    if not existed:
+        for statement in _REBUILD:
+            conn.exec_driver_sql(statement)
+    return True
+
+
+def drop_search_index(conn):
+    for trigger in _TRIGGERS:
+        conn.exec_driver_sql(f"DROP TRIGGER IF EXISTS {trigger}")
+    conn.exec_driver_sql("DROP TABLE IF EXISTS search_index")
+
+
+def search_index_available():
+    """Whether the FTS table exists; one catalogue lookup at startup."""
+    engine = db.engine
+    return engine.dialect.name == "sqlite" and inspect(engine).has_table(
+        "search_index"
+    )
+
+
+def rebuild_search_index():
+    for statement in _REBUILD:
+        db.session.execute(text(statement))
+    db.session.commit()
+
+
+def to_match_query(terms):
+    """Turn free text into an FTS5 query: every word must match, as a prefix.
+
+    Words are quoted so user input can never inject FTS5 syntax.
+    """
+    words = re.findall(r"\w+", terms or "")
+    return " ".join(f'"{word}"*' for word in words)
+
+
+def _highlight(snippet):
+    return Markup(
+        str(escape(snippet)).replace(_OPEN, "<mark>").replace(_CLOSE, "</mark>")
+    )
+
+
+def search(terms, course_ids, page=1, page_size=20):
+    """Ranked matches in ``course_ids``; returns (results, has_next_page)."""
+    query = to_match_query(terms)
+    if not query or not course_ids:
+        return [], False
+    rows = db.session.execute(
+        _SEARCH,
+        {
+            "query": query,
+            "course_ids": list(course_ids),
+            "limit": page_size + 1,
+            "offset": (page - 1) * page_size,
+        },
+    ).all()
+    results = [
+        {
+            "kind": kind,
+            "task_id": task_id,
+            "title": title,
+            "course_id": course_id,
+            "course_code": course_code,
+            "snippet": _highlight(snippet),
+        }
+        for kind, task_id, title, course_id, course_code, snippet, _ in rows[:page_size]
+    ]
+    return results, len(rows) > page_size
@@ -0,0 +1,97 @@
+from app import db
+from app.models import (
+    Course,
+    CourseMembership,
+    CourseTaskRollup,
+    Task,
+    Team,
+    TeamMembership,
+    User,
+)
+
+
+def seed_demo_data():
+    """Create demo users, courses and tasks if the DB has no courses yet.
+
+    This gives us:
+    - Users: instructor, ta, two students
+    - Courses: CMPE 131, ISE 140
+    - A few tasks in each course
+
+    Returns True when anything was created. Runs from ``flask seed-demo``
+    or once at startup when SEED_DEMO_DATA is on, never per request.
+    """
+    if Course.query.first() is not None:
+        return False
+
+    def user(email, role):
+        record = User.query.filter_by(email=email).first()
+        if record is None:
+            record = User(email=email, role=role)
+            db.session.add(record)
+            db.session.flush()
+        return record
+
+    prof = user("prof@example.com", "instructor")
+    ta = user("ta@example.com", "ta")
+    student = user("student@example.com", "student")
+    student2 = user("student2@example.com", "student")
+
+    course1 = Course(code="CMPE 131", title="Software Engineering")
+    course2 = Course(code="ISE 140", title="Operations Planning and Control")
+    db.session.add_all([course1, course2])
+    db.session.flush()
+
+    memberships = [
+        CourseMembership(user=prof, course=course1, role="instructor"),
+        CourseMembership(user=ta, course=course1, role="ta"),
+        CourseMembership(user=student, course=course1, role="student"),
+        CourseMembership(user=student2, course=course1, role="student"),
+        CourseMembership(user=prof, course=course2, role="instructor"),
+        CourseMembership(user=student, course=course2, role="student"),
+    ]
+    db.session.add_all(memberships)
+    db.session.flush()
+
+    alpha = Team(name="Velocity", course=course1)
+    beta = Team(name="Nimbus", course=course1)
+    db.session.add_all([alpha, beta])
+    db.session.flush()
+
+    db.session.add_all(
+        [
+            TeamMembership(user=student, team=alpha),
+            TeamMembership(user=ta, team=alpha),
+            TeamMembership(user=student2, team=beta),
+        ]
+    )
+
+    t1 = Task(
+        title="Project proposal",
+        description="Submit 1-page project idea.",
+        course=course1,
+        status="todo",
+        points=50,
+        team=alpha,
+    )
+    t2 = Task(
+        title="Unit test suite",
+        description="Add tests for your Flask routes.",
+        course=course1,
+        status="in_progress",
+        points=100,
+        team=beta,
+    )
+    t3 = Task(
+        title="HW 3 – Forecasting",
+        description="Solve forecasting problems 1–5.",
+        course=course2,
+        status="todo",
+        points=75,
+    )
+
+    db.session.add_all([t1, t2, t3])
+    db.session.flush()
+    CourseTaskRollup.rebuild([course1.id, course2.id])
+    db.session.commit()
+    return True
@@ -0,0 +1,54 @@
+// Submits card status and feedback forms in the background and swaps in the
+// card fragment the server answers with, instead of reloading the board.
+// Without JavaScript the forms post and redirect as before.
+(function () {
+  var board = document.querySelector("[data-board]");
+  if (!board || !window.fetch) {
+    return;
+  }
+
+  function placeCard(card) {
+    var select = card.querySelector('select[name="status"]');
+    var column = select && board.querySelector('.board-column[data-status="' + select.value + '"]');
+    if (column && card.parentNode !== column) {
+      var empty = column.querySelector(".empty-state");
+      if (empty) {
+        empty.remove();
+      }
+      column.insertBefore(card, column.querySelector("h3").nextSibling);
+    }
+  }
+
+  board.addEventListener("submit", function (event) {
+    var form = event.target;
+    if (!form.matches(".status-form, .comment-form")) {
+      return;
+    }
+    event.preventDefault();
+    var url = form.action + (form.action.indexOf("?") < 0 ? "?" : "&") + "board=" + board.dataset.board;
+    fetch(url, {
+      method: "POST",
+      body: new FormData(form),
+      headers: { "HX-Request": "true" },
+      credentials: "same-origin",
+    })
+      .then(function (response) {
+        if (!response.ok) {
+          throw new Error(response.statusText);
+        }
+        return response.text();
+      })
+      .then(function (html) {
+        var old = form.closest(".task-card");
+        var holder = document.createElement("div");
+        holder.innerHTML = html.trim();
+        var card = holder.firstElementChild;
+        old.replaceWith(card);
+        placeCard(card);
+      })
+      .catch(function () {
+        // never re-post: the change may already be saved
+        window.location.reload();
+      });
+  });
+})();
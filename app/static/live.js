@@ -0,0 +1,60 @@
+// Keeps a task board in step with the server's event stream: moves cards
+// between columns and updates scores in place; anything the stream cannot
+// describe (new tasks, new feedback text) shows a reload notice instead.
+(function () {
+  var board = document.querySelector("[data-events-url]");
+  if (!board || !window.EventSource) {
+    return;
+  }
+  var notice = board.parentNode.querySelector(".live-notice");
+
+  function showNotice() {
+    if (notice) {
+      notice.hidden = false;
+    }
+  }
+
+  function moveCard(card, status) {
+    var column = board.querySelector('.board-column[data-status="' + status + '"]');
+    if (!column || card.parentNode === column) {
+      return;
+    }
+    var empty = column.querySelector(".empty-state");
+    if (empty) {
+      empty.remove();
+    }
+    column.insertBefore(card, column.querySelector("h3").nextSibling);
+  }
+
+  var source = new EventSource(board.dataset.eventsUrl);
+  source.addEventListener("task", function (event) {
+    var data = JSON.parse(event.data);
+    var card = document.getElementById("task-" + data.id);
+    if (!card) {
+      showNotice();
+      return;
+    }
+    var select = card.querySelector('select[name="status"]');
+    if (select) {
+      select.value = data.status;
+    }
+    moveCard(card, data.status);
+    var score = card.querySelector(".task-score");
+    if (score) {
+      score.hidden = data.score === null;
+      score.querySelector("span").textContent = data.score === null ? "" : data.score;
+    }
+    if (String(data.comments) !== card.dataset.comments) {
+      showNotice();
+    }
+  });
+  source.addEventListener("reload", showNotice);
+  source.addEventListener("error", function () {
+    // the server turned the stream away (too many open boards); the board
+    // still works, it just no longer follows other people's changes
+    if (source.readyState === EventSource.CLOSED && notice) {
+      notice.firstChild.textContent = "Live updates are off for this board. ";
+      showNotice();
+    }
+  });
+})();
@@ -0,0 +1,72 @@
+"""Get a freshly started worker ready before it takes traffic.
+
+``wsgi.py`` calls ``warm_up`` once per worker process, after ``create_app``
+and before the server hands it a request, so the first visitors to a new
+or recycled worker do not pay for connecting to the database, compiling
+templates or configuring mappers.
+"""
+import logging
+import time
+
+from sqlalchemy.orm import configure_mappers
+from sqlalchemy.pool import QueuePool
+
+from app import db
+
+log = logging.getLogger(__name__)
+
+
+def warm_pool(engine, connections):
+    """Open up to ``connections`` pooled connections and hand them back.
+
+    Capped at the pool size, since anything past it would be closed on
+    return. Each new connection also runs the SQLite pragmas.
+    """
+    if isinstance(engine.pool, QueuePool):
+        connections = min(connections, engine.pool.size())
+    else:
+        connections = 1
+    opened = [engine.connect() for _ in range(connections)]
+    try:
+        for conn in opened:
+            conn.exec_driver_sql("SELECT 1")
+    finally:
+        for conn in opened:
+            conn.close()
+    return len(opened)
+
+
+def compile_templates(app):
+    """Load every HTML template into the Jinja cache; returns how many."""
+    names = app.jinja_env.list_templates(extensions=["html"])
+    for name in names:
+        app.jinja_env.get_template(name)
+    return len(names)
+
+
+def warm_up(app):
+    """Pool, templates, mappers and one request through the whole stack.
+
+    The request is an anonymous ``GET /auth/login``: it touches no data,
+    but builds the session, CSRF and instrumentation paths (and starts the
+    in-process job runner, if there is one). The card and user caches are
+    keyed by task version and login, so they fill from real traffic.
+    Returns the timings, which are also logged.
+    """
+    timings = {}
+    started = time.perf_counter()
+    with app.app_context():
+        timings["connections"] = warm_pool(db.engine, app.config["WARMUP_CONNECTIONS"])
+    timings["templates"] = compile_templates(app)
+    configure_mappers()
+    status = app.test_client().get("/auth/login").status_code
+    if status != 200:
+        log.warning("warmup request returned %s", status)
+    timings["ms"] = round((time.perf_counter() - started) * 1000, 1)
+    log.info(
+        "worker warm in %.1f ms: %d connection(s), %d template(s)",
+        timings["ms"],
+        timings["connections"],
+        timings["templates"],
+    )
+    return timings
@@ -0,0 +1,196 @@
+"""Time the hot task queries with and without the model indexes.
+
+Builds a throwaway SQLite database from the app's metadata, fills it with
+synthetic courses, teams, tasks and comments, then runs the board,
+dashboard and analytics access paths twice: once with every ``ix_*`` index
+dropped and once with them created.
+
+    python benchmarks/bench_indexes.py --tasks 1000000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import create_engine
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app import db  # noqa: E402
+from app import models  # noqa: E402,F401
+from app.models import TaskStatusCode  # noqa: E402
+
+# raw SQL sees the stored integer codes, not the status keys
+STATUSES = tuple(TaskStatusCode.CODES.values())
+DONE = TaskStatusCode.CODES["done"]
+
+
+def board_page(column):
+    """First page of one board status column, as _board_page builds it."""
+    where = f"{column} = :{column.split('_')[0]} AND status = :status"
+    return (
+        "SELECT id, title, status, due_date FROM task WHERE id IN ("
+        f"SELECT id FROM (SELECT id FROM task WHERE {where} "
+        "AND due_date IS NOT NULL ORDER BY due_date, id LIMIT 26) "
+        f"UNION ALL SELECT id FROM (SELECT id FROM task WHERE {where} "
+        "AND due_date IS NULL ORDER BY id LIMIT 26)) "
+        "ORDER BY due_date IS NULL, due_date, id LIMIT 26"
+    )
+
+
+QUERIES = {
+    "course board": board_page("course_id"),
+    "team board": board_page("team_id"),
+    "status counts": (
+        "SELECT status, count(*) FROM task WHERE course_id = :course GROUP BY status"
+    ),
+    # one of the per-course legs of the dashboard's UNION ALL
+    "dashboard upcoming": (
+        "SELECT id, title, due_date FROM task WHERE course_id = :course "
+        f"AND status != {DONE} AND due_date >= :today ORDER BY due_date, id LIMIT 5"
+    ),
+    "late tasks": (
+        "SELECT count(*) FROM task WHERE course_id = :course "
+        f"AND due_date < :today AND status != {DONE}"
+    ),
+    "card comments": (
+        "SELECT id, body FROM task_comment WHERE task_id IN "
+        "(SELECT id FROM task WHERE course_id = :course LIMIT 50) "
+        "ORDER BY task_id, created_at DESC"
+    ),
+}
+
+
+def populate(path, courses, tasks, comments, seed):
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=OFF")
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.executemany(
+        "INSERT INTO user (id, email, role) VALUES (?, ?, ?)",
+        [(1, "prof@example.com", "instructor")],
+    )
+    conn.executemany(
+        "INSERT INTO course (id, code, title) VALUES (?, ?, ?)",
+        [(i, f"C {i}", f"Course {i}") for i in range(1, courses + 1)],
+    )
+    teams_per_course = 8
+    conn.executemany(
+        "INSERT INTO team (id, name, course_id) VALUES (?, ?, ?)",
+        [
+            (i, f"Team {i}", (i - 1) // teams_per_course + 1)
+            for i in range(1, courses * teams_per_course + 1)
+        ],
+    )
+
+    start = date.today() - timedelta(days=120)
+    now = datetime(2025, 1, 1)
+    chunk = []
+    for task_id in range(1, tasks + 1):
+        course = rng.randint(1, courses)
+        team = (course - 1) * teams_per_course + rng.randint(1, teams_per_course)
+        due = start + timedelta(days=rng.randint(0, 240)) if rng.random() < 0.8 else None
+        chunk.append(
+            (task_id, f"Task {task_id}", rng.choice(STATUSES), due, 100, 1, now,
+             course, team)
+        )
+        if len(chunk) == 50_000:
+            conn.executemany(
+                "INSERT INTO task (id, title, status, due_date, points, version, "
+                "updated_at, course_id, team_id) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                chunk,
+            )
+            chunk.clear()
+    if chunk:
+        conn.executemany(
+            "INSERT INTO task (id, title, status, due_date, points, version, "
+            "updated_at, course_id, team_id) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            chunk,
+        )
+
+    rows = (
+        (i, f"Comment {i}", now - timedelta(minutes=i), rng.randint(1, tasks), 1)
+        for i in range(1, comments + 1)
+    )
+    conn.executemany(
+        "INSERT INTO task_comment (id, body, created_at, task_id, author_id) "
+        "VALUES (?, ?, ?, ?, ?)",
+        rows,
+    )
+    conn.commit()
+    conn.close()
+
+
+def time_queries(path, courses, repeat, seed):
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    results = {}
+    for name, sql in QUERIES.items():
+        samples = []
+        for _ in range(repeat):
+            course = rng.randint(1, courses)
+            params = {
+                "course": course,
+                "other": rng.randint(1, courses),
+                "team": (course - 1) * 8 + 1,
+                "status": rng.choice(STATUSES),
+                "today": date.today().isoformat(),
+            }
+            started = time.perf_counter()
+            conn.execute(sql, params).fetchall()
+            samples.append((time.perf_counter() - started) * 1000)
+        results[name] = statistics.median(samples)
+    conn.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--courses", type=int, default=200)
+    parser.add_argument("--tasks", type=int, default=1_000_000)
+    parser.add_argument("--comments", type=int, default=300_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=131)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        engine = create_engine(f"sqlite:///{path}")
+        db.metadata.create_all(engine)
+        indexes = [
+            index
+            for table in db.metadata.sorted_tables
+            for index in table.indexes
+            if index.name.startswith("ix_")
+        ]
+        for index in indexes:
+            index.drop(engine)
+
+        started = time.perf_counter()
+        populate(path, args.courses, args.tasks, args.comments, args.seed)
+        print(
+            f"populated {args.tasks} tasks / {args.comments} comments "
+            f"in {time.perf_counter() - started:.1f}s"
+        )
+
+        before = time_queries(path, args.courses, args.repeat, args.seed)
+        for index in indexes:
+            index.create(engine)
+        with engine.begin() as conn:
+            conn.exec_driver_sql("ANALYZE")
+        engine.dispose()
+        after = time_queries(path, args.courses, args.repeat, args.seed)
+
+    print(f"{'query':<20} {'no index ms':>12} {'indexed ms':>12} {'speedup':>8}")
+    for name in QUERIES:
+        speedup = before[name] / after[name] if after[name] else float("inf")
+        print(f"{name:<20} {before[name]:>12.2f} {after[name]:>12.2f} {speedup:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""Route latency and SQL query counts on a synthetic dataset.
+
+Generates a skewed dataset with ``datagen.generate`` in a throwaway SQLite
+file, then drives the main pages and POST routes through the Flask test
+client. Each route gets latency percentiles and per-request query counts,
+written as a JSON report whose layout stays stable between runs. Pass
+``--baseline`` with an earlier report to print the deltas.
+
+    python benchmarks/bench_routes.py --tasks 20000 --output after.json \\
+        --baseline before.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy import event
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app import create_app, db  # noqa: E402
+from app.models import Task  # noqa: E402
+from benchmarks.datagen import generate  # noqa: E402
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def load_config(path):
+    module, _, name = path.rpartition(".")
+    return getattr(__import__(module, fromlist=[name]), name)
+
+
+def build_routes(summary, task_ids, rng):
+    """(name, viewer, method, url factory, form factory) for every route."""
+    course, team = summary["course_id"], summary["team_id"]
+    statuses = [value for value, _ in Task.STATUS_CHOICES]
+    counter = iter(range(10**9))
+    return [
+        ("GET /", "student", "GET", lambda: "/", None),
+        ("GET /courses/<id>", "prof", "GET", lambda: f"/courses/{course}", None),
+        ("GET /teams/<id>", "prof", "GET", lambda: f"/teams/{team}", None),
+        ("GET /analytics", "prof", "GET", lambda: "/analytics", None),
+        (
+            "POST /tasks/<id>/status",
+            "prof",
+            "POST",
+            lambda: f"/tasks/{rng.choice(task_ids)}/status",
+            lambda: {"status": rng.choice(statuses)},
+        ),
+        (
+            "POST /tasks/<id>/comments",
+            "ta",
+            "POST",
+            lambda: f"/tasks/{rng.choice(task_ids)}/comments",
+            lambda: {"body": "Benchmark feedback"},
+        ),
+        (
+            "POST /tasks/<id>/grade",
+            "prof",
+            "POST",
+            lambda: f"/tasks/{rng.choice(task_ids)}/grade",
+            lambda: {"score": rng.randint(0, 100)},
+        ),
+        (
+            "POST /courses/<id>/tasks/new",
+            "prof",
+            "POST",
+            lambda: f"/courses/{course}/tasks/new",
+            lambda: {"title": f"Bench task {next(counter)}", "points": 10, "team_id": 0},
+        ),
+    ]
+
+
+def run(args):
+    config = load_config(args.config)
+    with tempfile.TemporaryDirectory() as tmp:
+
+        class BenchConfig(config):
+            SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+            SEED_DEMO_DATA = False
+            WTF_CSRF_ENABLED = False
+
+        app = create_app(BenchConfig)
+        with app.app_context():
+            summary = generate(
+                args.courses, args.students, args.tasks, args.comments, args.seed
+            )
+            task_ids = [
+                task_id
+                for (task_id,) in db.session.query(Task.id).filter_by(
+                    course_id=summary["course_id"]
+                )
+            ]
+            engine = db.engine
+
+        statements = []
+        event.listen(
+            engine, "before_cursor_execute", lambda *a, **kw: statements.append(1)
+        )
+
+        clients = {}
+        for viewer, email in (
+            ("prof", "prof@example.com"),
+            ("ta", "ta@example.com"),
+            ("student", summary["student_email"]),
+        ):
+            clients[viewer] = app.test_client()
+            clients[viewer].post("/auth/login", data={"email": email})
+
+        rng = random.Random(args.seed)
+        results = {}
+        for name, viewer, method, url, form in build_routes(summary, task_ids, rng):
+            client = clients[viewer]
+            latencies, queries, codes = [], [], {}
+            for iteration in range(args.warmup + args.iterations):
+                data = form() if form else None
+                statements.clear()
+                started = time.perf_counter()
+                resp = client.open(url(), method=method, data=data)
+                elapsed = (time.perf_counter() - started) * 1000
+                if iteration < args.warmup:
+                    continue
+                latencies.append(elapsed)
+                queries.append(len(statements))
+                codes[str(resp.status_code)] = codes.get(str(resp.status_code), 0) + 1
+            results[name] = {
+                "p50_ms": round(percentile(latencies, 50), 3),
+                "p90_ms": round(percentile(latencies, 90), 3),
+                "p99_ms": round(percentile(latencies, 99), 3),
+                "mean_ms": round(sum(latencies) / len(latencies), 3),
+                "queries_mean": round(sum(queries) / len(queries), 2),
+                "queries_max": max(queries),
+                "status_codes": codes,
+            }
+        engine.dispose()
+
+    return {
+        "meta": {
+            "generated_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "config": args.config,
+            "iterations": args.iterations,
+            "warmup": args.warmup,
+            "dataset": {
+                key: summary[key] for key in ("courses", "students", "tasks", "comments")
+            },
+            "seed": args.seed,
+        },
+        "routes": results,
+    }
+
+
+def print_report(report, baseline=None):
+    header = f"{'route':<30} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'queries':>8}"
+    if baseline:
+        header += f" {'p50 vs base':>12} {'queries vs base':>16}"
+    print(header)
+    for name, row in report["routes"].items():
+        line = (
+            f"{name:<30} {row['p50_ms']:>9.2f} {row['p90_ms']:>9.2f} "
+            f"{row['p99_ms']:>9.2f} {row['queries_mean']:>8.1f}"
+        )
+        base = (baseline or {}).get("routes", {}).get(name)
+        if base:
+            change = (row["p50_ms"] / base["p50_ms"] - 1) * 100 if base["p50_ms"] else 0
+            line += f" {change:>+11.0f}% {row['queries_mean'] - base['queries_mean']:>+16.1f}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--courses", type=int, default=10)
+    parser.add_argument("--students", type=int, default=300)
+    parser.add_argument("--tasks", type=int, default=5000)
+    parser.add_argument("--comments", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=131)
+    parser.add_argument("--iterations", type=int, default=30)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--config", default="app.config.Config")
+    parser.add_argument("--output", help="write the JSON report here")
+    parser.add_argument("--baseline", help="earlier JSON report to compare with")
+    args = parser.parse_args()
+
+    report = run(args)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as handle:
+            baseline = json.load(handle)
+    print_report(report, baseline)
+    if args.output:
+        with open(args.output, "w") as handle:
+            json.dump(report, handle, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""Concurrent status updates against the default and production profiles.
+
+Each worker process builds its own app on a shared SQLite file, logs in as
+the instructor and alternates board reads with status-update POSTs through
+the Flask test client, the way students hammer a board during a sprint
+review. Reports throughput and how many requests failed (usually with
+"database is locked") for each config profile.
+
+    python benchmarks/bench_sqlite_writers.py --workers 8 --requests 200
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app import create_app, db  # noqa: E402
+from app.config import Config, ProductionConfig  # noqa: E402
+from app.models import Course, Task  # noqa: E402
+from app.seed import seed_demo_data  # noqa: E402
+
+PROFILES = {"default": Config, "production": ProductionConfig}
+
+
+def make_config(profile, path):
+    class BenchConfig(PROFILES[profile]):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{path}"
+        SECRET_KEY = "bench"
+        SEED_DEMO_DATA = False
+        WTF_CSRF_ENABLED = False
+        # the production profile only checks the schema revision; build the
+        # throwaway database on first start
+        SCHEMA_AUTO_UPGRADE = True
+
+    return BenchConfig
+
+
+def prepare(profile, path, tasks):
+    app = create_app(make_config(profile, path))
+    with app.app_context():
+        seed_demo_data()
+        course = Course.query.filter_by(code="CMPE 131").first()
+        db.session.add_all(
+            Task(title=f"Bench task {i}", course=course) for i in range(tasks)
+        )
+        db.session.commit()
+        course_id = course.id
+        task_ids = [row[0] for row in db.session.query(Task.id)]
+        db.session.remove()
+        db.engine.dispose()
+    return course_id, task_ids
+
+
+def worker(args):
+    profile, path, course_id, task_ids, requests, write_ratio, seed = args
+    rng = random.Random(seed)
+    app = create_app(make_config(profile, path))
+    client = app.test_client()
+    client.post("/auth/login", data={"email": "prof@example.com"})
+    statuses = [value for value, _ in Task.STATUS_CHOICES]
+    failures = 0
+    for i in range(requests):
+        if rng.random() >= write_ratio:
+            resp = client.get(f"/courses/{course_id}")
+        else:
+            resp = client.post(
+                f"/tasks/{rng.choice(task_ids)}/status",
+                data={"status": rng.choice(statuses)},
+            )
+        failures += resp.status_code >= 500
+    return failures
+
+
+def run(profile, workers, requests, tasks, write_ratio, directory):
+    with tempfile.TemporaryDirectory(dir=directory) as tmp:
+        path = os.path.join(tmp, f"{profile}.db")
+        course_id, task_ids = prepare(profile, path, tasks)
+        jobs = [
+            (profile, path, course_id, task_ids, requests, write_ratio, seed)
+            for seed in range(workers)
+        ]
+        started = time.perf_counter()
+        with multiprocessing.get_context("fork").Pool(workers) as pool:
+            failures = sum(pool.map(worker, jobs))
+        elapsed = time.perf_counter() - started
+    total = workers * requests
+    return total / elapsed, failures, total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--tasks", type=int, default=300)
+    parser.add_argument("--write-ratio", type=float, default=0.5)
+    parser.add_argument(
+        "--dir",
+        default=None,
+        help="Where to put the database; use a real disk, fsync on tmpfs is free.",
+    )
+    args = parser.parse_args()
+
+    print(
+        f"{args.workers} workers x {args.requests} requests, "
+        f"{args.write_ratio:.0%} status updates"
+    )
+    print(f"{'profile':<12} {'req/s':>8} {'failed':>8}")
+    for profile in PROFILES:
+        rate, failures, total = run(
+            profile, args.workers, args.requests, args.tasks, args.write_ratio, args.dir
+        )
+        print(f"{profile:<12} {rate:>8.1f} {failures:>4}/{total}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Team member candidates: per-membership Python filtering vs the anti-join.
+
+Builds a course with ``--students`` enrolled students and a team holding
+``--members`` of them, then times the pre-anti-join comprehension (walk
+every CourseMembership, lazy-load its user, rebuild the team's member set
+each time) against ``_team_candidates``. Reports the median time and SQL
+statement count for each.
+
+    python benchmarks/bench_team_candidates.py --students 600
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+from sqlalchemy import event
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app import create_app, db  # noqa: E402
+from app.config import Config  # noqa: E402
+from app.main.routes import _team_candidates  # noqa: E402
+from app.models import Course, CourseMembership, Team, TeamMembership, User  # noqa: E402
+
+
+class BenchConfig(Config):
+    SQLALCHEMY_DATABASE_URI = "sqlite://"
+    SEED_DEMO_DATA = False
+
+
+def legacy_candidates(team):
+    """The comprehension add_team_member used before the anti-join."""
+    return [
+        (m.user.id, m.user.email)
+        for m in team.course.memberships
+        if m.role == "student"
+        and m.user_id not in {member.user_id for member in team.memberships}
+    ]
+
+
+def measure(team_id, fn, repeat, statements):
+    timings, counts = [], []
+    for _ in range(repeat):
+        # start each run from a cold session, as a fresh request would
+        db.session.expunge_all()
+        team = db.session.get(Team, team_id)
+        statements.clear()
+        started = time.perf_counter()
+        result = fn(team)
+        timings.append((time.perf_counter() - started) * 1000)
+        counts.append(len(statements))
+    return statistics.median(timings), max(counts), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--students", type=int, default=600)
+    parser.add_argument("--members", type=int, default=150)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    app = create_app(BenchConfig)
+    with app.app_context():
+        course = Course(code="BIG 600", title="Large course")
+        team = Team(name="Everyone", course=course)
+        students = [
+            User(email=f"student{i}@example.com", role="student")
+            for i in range(args.students)
+        ]
+        db.session.add_all([course, team, *students])
+        db.session.add_all(
+            CourseMembership(user=user, course=course, role="student")
+            for user in students
+        )
+        db.session.add_all(
+            TeamMembership(user=user, team=team) for user in students[: args.members]
+        )
+        db.session.commit()
+
+        statements = []
+        event.listen(
+            db.engine, "before_cursor_execute", lambda *a, **kw: statements.append(1)
+        )
+        legacy = measure(team.id, legacy_candidates, args.repeat, statements)
+        anti_join = measure(team.id, _team_candidates, args.repeat, statements)
+        assert legacy[2] == anti_join[2], "both strategies must agree"
+
+    print(f"{args.students} students, {args.members} already on the team")
+    print(f"{'strategy':<12} {'median ms':>10} {'queries':>8}")
+    for name, (ms, queries, _) in (("legacy", legacy), ("anti-join", anti_join)):
+        print(f"{name:<12} {ms:>10.2f} {queries:>8}")
+
+
+if __name__ == "__main__":
+    main()
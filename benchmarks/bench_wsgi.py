@@ -0,0 +1,236 @@
+"""Throughput of the production launcher against the development server.
+
+Generates a synthetic dataset (``datagen.generate``) in a throwaway SQLite
+file, then starts each server on it in turn with the production profile:
+``flask run`` (the threaded Werkzeug development server that ``run.py``
+uses) and gunicorn with ``gunicorn.conf.py`` and ``wsgi:app``. Concurrent
+clients log in as the instructor and cycle through the dashboard, course
+board, team board and analytics over keep-alive connections. Reports
+requests per second, latency percentiles and failed requests per server.
+
+    python benchmarks/bench_wsgi.py --clients 16 --seconds 20 --workers 4
+"""
+import argparse
+import http.client
+import importlib.util
+import os
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlencode
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+from app import create_app, db  # noqa: E402
+from app.config import ProductionConfig  # noqa: E402
+from benchmarks.datagen import generate  # noqa: E402
+
+_CSRF = re.compile(r'name="csrf_token" type="hidden" value="([^"]+)"')
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def prepare(path, args):
+    class BenchConfig(ProductionConfig):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{path}"
+        SECRET_KEY = "bench"
+        SEED_DEMO_DATA = False
+        SCHEMA_AUTO_UPGRADE = True
+
+    app = create_app(BenchConfig)
+    with app.app_context():
+        summary = generate(
+            args.courses, args.students, args.tasks, args.comments, args.seed
+        )
+        db.session.remove()
+        db.engine.dispose()
+    return summary
+
+
+def server_commands(port):
+    flask_run = "-m flask --app run.py run --no-reload --no-debugger --with-threads"
+    commands = {"flask run": [sys.executable, *flask_run.split(), "--port", str(port)]}
+    if importlib.util.find_spec("gunicorn"):
+        gunicorn = "-m gunicorn -c gunicorn.conf.py wsgi:app"
+        commands["gunicorn"] = [sys.executable, *gunicorn.split()]
+    else:
+        print("gunicorn is not installed; only the development server is measured")
+    return commands
+
+
+def wait_until_ready(port, process, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"server exited with {process.returncode}")
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+            conn.request("GET", "/auth/login")
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("server did not come up")
+
+
+class Client:
+    """One keep-alive connection with its own session cookie."""
+
+    def __init__(self, port):
+        self.conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        self.cookie = ""
+
+    def request(self, method, url, form=None):
+        headers = {"Cookie": self.cookie} if self.cookie else {}
+        body = None
+        if form is not None:
+            body = urlencode(form)
+            headers["Content-Type"] = "application/x-www-form-urlencoded"
+        self.conn.request(method, url, body=body, headers=headers)
+        resp = self.conn.getresponse()
+        data = resp.read()
+        cookie = resp.getheader("Set-Cookie")
+        if cookie:
+            self.cookie = cookie.split(";", 1)[0]
+        return resp.status, data
+
+    def login(self, email):
+        _, page = self.request("GET", "/auth/login")
+        token = _CSRF.search(page.decode()).group(1)
+        status, _ = self.request(
+            "POST", "/auth/login", {"email": email, "csrf_token": token}
+        )
+        if status != 302:
+            raise RuntimeError(f"login failed with {status}")
+
+
+def load(port, urls, clients, seconds):
+    latencies, failures = [], []
+    stop = time.monotonic() + seconds
+    lock = threading.Lock()
+
+    def drive(offset):
+        client = Client(port)
+        client.login("prof@example.com")
+        mine, failed, index = [], 0, offset
+        while time.monotonic() < stop:
+            url = urls[index % len(urls)]
+            index += 1
+            started = time.perf_counter()
+            try:
+                status, _ = client.request("GET", url)
+            except (OSError, http.client.HTTPException):
+                status = 0
+                client = Client(port)
+                client.login("prof@example.com")
+            mine.append((time.perf_counter() - started) * 1000)
+            failed += status != 200
+        with lock:
+            latencies.extend(mine)
+            failures.append(failed)
+
+    threads = [threading.Thread(target=drive, args=(i,)) for i in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    return {
+        "requests": len(latencies),
+        "rps": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 50),
+        "p99_ms": percentile(latencies, 99),
+        "failed": sum(failures),
+    }
+
+
+def run(args):
+    with tempfile.TemporaryDirectory(dir=args.dir) as tmp:
+        path = os.path.join(tmp, "bench.db")
+        summary = prepare(path, args)
+        urls = [
+            "/",
+            f"/courses/{summary['course_id']}",
+            f"/teams/{summary['team_id']}",
+            "/analytics",
+        ]
+        results = {}
+        port = free_port()
+        env = dict(
+            os.environ,
+            DATABASE_URL=f"sqlite:///{path}",
+            MICROCANVAS_CONFIG="app.config.ProductionConfig",
+            SECRET_KEY="bench",
+            MICROCANVAS_SEED_DEMO="0",
+            MICROCANVAS_AUTO_MIGRATE="0",
+            MICROCANVAS_JOB_RUNNER="external",
+            MICROCANVAS_JOB_DIR=os.path.join(tmp, "jobs"),
+            MICROCANVAS_BIND=f"127.0.0.1:{port}",
+            WEB_CONCURRENCY=str(args.workers),
+            MICROCANVAS_THREADS=str(args.threads),
+        )
+        for name, command in server_commands(port).items():
+            process = subprocess.Popen(
+                command,
+                cwd=ROOT,
+                env=env,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+            try:
+                wait_until_ready(port, process)
+                load(port, urls, args.clients, args.warmup)
+                results[name] = load(port, urls, args.clients, args.seconds)
+            finally:
+                process.terminate()
+                process.wait(timeout=30)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--courses", type=int, default=10)
+    parser.add_argument("--students", type=int, default=300)
+    parser.add_argument("--tasks", type=int, default=5000)
+    parser.add_argument("--comments", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=131)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=20)
+    parser.add_argument("--warmup", type=float, default=3)
+    parser.add_argument("--workers", type=int, default=4, help="gunicorn workers")
+    parser.add_argument("--threads", type=int, default=16, help="threads per worker")
+    parser.add_argument(
+        "--dir",
+        default=None,
+        help="Where to put the database; use a real disk, fsync on tmpfs is free.",
+    )
+    args = parser.parse_args()
+
+    print(f"{args.clients} clients for {args.seconds:g}s against GET pages")
+    print(f"{'server':<12} {'req/s':>8} {'p50 ms':>9} {'p99 ms':>9} {'failed':>8}")
+    for name, row in run(args).items():
+        print(
+            f"{name:<12} {row['rps']:>8.1f} {row['p50_ms']:>9.2f} "
+            f"{row['p99_ms']:>9.2f} {row['failed']:>4}/{row['requests']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+"""Synthetic MicroCanvas data with realistic skew.
+
+Course sizes, task counts and comment threads all follow Zipf-like
+weights, so a few big courses and busy tasks dominate the way they do in
+a real semester. Rows are inserted with executemany through Core and the
+analytics rollups are rebuilt at the end.
+
+Use from code inside an app context via ``generate(...)``, or run directly
+to fill a database file:
+
+    python benchmarks/datagen.py --db /tmp/load.db --tasks 50000
+"""
+import argparse
+import os
+import random
+import sys
+from collections import Counter
+from datetime import date, datetime, timedelta, timezone
+
+from sqlalchemy import insert
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app import db  # noqa: E402
+from app.models import (  # noqa: E402
+    Course,
+    CourseMembership,
+    CourseTaskRollup,
+    Task,
+    TaskComment,
+    Team,
+    TeamMembership,
+    User,
+)
+
+STATUS_WEIGHTS = {
+    Task.STATUS_TODO: 5,
+    Task.STATUS_IN_PROGRESS: 2,
+    Task.STATUS_DONE: 3,
+}
+TEAM_SIZE = 5
+CHUNK = 5000
+
+
+def zipf_weights(n, skew=1.1):
+    return [1 / (rank**skew) for rank in range(1, n + 1)]
+
+
+def _insert(model, rows):
+    for start in range(0, len(rows), CHUNK):
+        db.session.execute(insert(model), rows[start : start + CHUNK])
+
+
+def _ids(*columns):
+    return db.session.query(*columns).order_by(columns[0]).all()
+
+
+def generate(courses=10, students=200, tasks=2000, comments=4000, seed=131):
+    """Insert a skewed dataset and return a summary of what was created.
+
+    Every course gets one instructor and one TA. ``prof@example.com`` and
+    ``ta@example.com`` teach the largest course, so a benchmark can log in
+    as them. The summary also names the biggest course, its busiest team
+    and a student enrolled there.
+    """
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    today = date.today()
+
+    staff = [
+        ("prof@example.com", "ta@example.com")
+        if i == 0
+        else (f"prof{i}@example.com", f"ta{i}@example.com")
+        for i in range(courses)
+    ]
+    users = []
+    for prof, ta in staff:
+        users.append({"email": prof, "role": "instructor"})
+        users.append({"email": ta, "role": "ta"})
+    users += [
+        {"email": f"student{i}@example.com", "role": "student"}
+        for i in range(students)
+    ]
+    _insert(User, users)
+    user_ids = dict(_ids(User.email, User.id))
+
+    _insert(
+        Course,
+        [
+            {"code": f"SYN {100 + i}", "title": f"Synthetic course {i}"}
+            for i in range(courses)
+        ],
+    )
+    course_ids = [course_id for (course_id,) in _ids(Course.id)]
+    course_weights = zipf_weights(courses)
+
+    # students take 1-4 courses, biased towards the big ones
+    rosters = {course_id: [] for course_id in course_ids}
+    memberships = []
+    for course_id, (prof, ta) in zip(course_ids, staff):
+        for email, role in ((prof, "instructor"), (ta, "ta")):
+            memberships.append(
+                {"user_id": user_ids[email], "course_id": course_id, "role": role}
+            )
+    for i in range(students):
+        email = f"student{i}@example.com"
+        picks = set(rng.choices(course_ids, course_weights, k=rng.randint(1, 4)))
+        for course_id in sorted(picks):
+            rosters[course_id].append(email)
+            memberships.append(
+                {"user_id": user_ids[email], "course_id": course_id, "role": "student"}
+            )
+    _insert(CourseMembership, memberships)
+
+    _insert(
+        Team,
+        [
+            {"name": f"Team {course_id}-{index}", "course_id": course_id}
+            for course_id, roster in rosters.items()
+            for index in range(max(1, len(roster) // TEAM_SIZE))
+        ],
+    )
+    teams = {course_id: [] for course_id in course_ids}
+    for team_id, course_id in _ids(Team.id, Team.course_id):
+        teams[course_id].append(team_id)
+    _insert(
+        TeamMembership,
+        [
+            {
+                "user_id": user_ids[email],
+                "team_id": teams[course_id][index % len(teams[course_id])],
+            }
+            for course_id, roster in rosters.items()
+            for index, email in enumerate(roster)
+        ],
+    )
+
+    task_rows = []
+    for i in range(tasks):
+        course_id = rng.choices(course_ids, course_weights)[0]
+        status = rng.choices(list(STATUS_WEIGHTS), list(STATUS_WEIGHTS.values()))[0]
+        graded = status == Task.STATUS_DONE and rng.random() < 0.6
+        task_rows.append(
+            {
+                "title": f"Synthetic task {i}",
+                "description": f"Generated work item {i}.",
+                "due_date": (
+                    today + timedelta(days=rng.randint(-60, 90))
+                    if rng.random() < 0.85
+                    else None
+                ),
+                "status": status,
+                "points": rng.choice((10, 25, 50, 100)),
+                "score": rng.randint(0, 100) if graded else None,
+                "course_id": course_id,
+                "team_id": (
+                    rng.choice(teams[course_id]) if rng.random() < 0.6 else None
+                ),
+            }
+        )
+    _insert(Task, task_rows)
+
+    # a few hot tasks collect most of the feedback
+    task_ids = [task_id for (task_id,) in _ids(Task.id)]
+    rng.shuffle(task_ids)
+    reviewers = [user_ids[email] for pair in staff for email in pair]
+    targets = (
+        rng.choices(task_ids, zipf_weights(len(task_ids), skew=0.9), k=comments)
+        if task_ids
+        else []
+    )
+    _insert(
+        TaskComment,
+        [
+            {
+                "body": f"Feedback {i}",
+                "created_at": now - timedelta(minutes=rng.randint(0, 60 * 24 * 30)),
+                "task_id": task_id,
+                "author_id": rng.choice(reviewers),
+            }
+            for i, task_id in enumerate(targets)
+        ],
+    )
+
+    CourseTaskRollup.rebuild(course_ids, today)
+    db.session.commit()
+
+    big_course = course_ids[0]
+    team_load = Counter(row["team_id"] for row in task_rows if row["team_id"])
+    return {
+        "courses": courses,
+        "students": students,
+        "tasks": tasks,
+        "comments": comments,
+        "course_id": big_course,
+        "team_id": max(teams[big_course], key=lambda team_id: team_load[team_id]),
+        "student_email": rosters[big_course][0] if rosters[big_course] else None,
+    }
+
+
+def main():
+    from app import create_app
+    from app.config import Config
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", required=True, help="SQLite file to create")
+    parser.add_argument("--courses", type=int, default=10)
+    parser.add_argument("--students", type=int, default=200)
+    parser.add_argument("--tasks", type=int, default=2000)
+    parser.add_argument("--comments", type=int, default=4000)
+    parser.add_argument("--seed", type=int, default=131)
+    args = parser.parse_args()
+
+    class GenerateConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.abspath(args.db)}"
+        SEED_DEMO_DATA = False
+
+    app = create_app(GenerateConfig)
+    with app.app_context():
+        print(generate(args.courses, args.students, args.tasks, args.comments, args.seed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+"""Gunicorn settings for ``gunicorn -c gunicorn.conf.py wsgi:app``.
+
+Every value can be overridden from the environment. Workers are preforked
+processes with a few request threads each; the app is not preloaded, so
+each worker builds (and warms) its own engine pool after the fork instead
+of inheriting sockets from the master.
+"""
+import multiprocessing
+import os
+
+
+def _env_int(name, default):
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+
+bind = os.environ.get("MICROCANVAS_BIND", "0.0.0.0:8000")
+workers = _env_int("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1)
+# threads let one worker overlap database waits and hold live board
+# streams. Each open board holds a thread for up to LIVE_STREAM_SECONDS
+# and a worker takes at most LIVE_MAX_STREAMS of them (default three
+# quarters of the threads), so the rest always serve pages. Streams do not
+# use a database connection; keep DB_POOL_SIZE plus DB_MAX_OVERFLOW at
+# least MICROCANVAS_THREADS anyway, for when no boards are open.
+worker_class = "gthread"
+threads = _env_int("MICROCANVAS_THREADS", 16)
+preload_app = False
+# a worker that stops heartbeating this long is killed and replaced; it
+# does not limit requests, so live board streams are unaffected
+timeout = _env_int("MICROCANVAS_TIMEOUT", 30)
+graceful_timeout = _env_int("MICROCANVAS_GRACEFUL_TIMEOUT", 30)
+keepalive = _env_int("MICROCANVAS_KEEPALIVE", 5)
+# recycle workers now and then so slow leaks cannot build up; the jitter
+# keeps them from all restarting at once
+max_requests = _env_int("MICROCANVAS_MAX_REQUESTS", 5000)
+max_requests_jitter = max_requests // 10
+accesslog = os.environ.get("MICROCANVAS_ACCESS_LOG") or None
+errorlog = "-"
@@ -1,6 +1,8 @@
+import os
+
 from app import create_app
 
-app = create_app()
+app = create_app(os.environ.get("MICROCANVAS_CONFIG", "app.config.Config"))
 
 if __name__ == "__main__":
     app.run(debug=True)
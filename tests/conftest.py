@@ -13,14 +13,16 @@ class TestConfig(Config):
     TESTING = True
     SQLALCHEMY_DATABASE_URI = "sqlite:///:memory:"
     WTF_CSRF_ENABLED = False
+    SEED_DEMO_DATA = False
     SECRET_KEY = "test"
+    JOB_RUNNER = "external"
+    # no poller thread on the shared in-memory connection
+    LIVE_POLL_SECONDS = 0
 
 
 @pytest.fixture()
 def app():
     app = create_app(TestConfig)
-    with app.app_context():
-        db.create_all()
     yield app
     with app.app_context():
         db.drop_all()
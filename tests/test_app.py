@@ -1,12 +1,81 @@
-from app import db
-from app.models import Course, Task, TaskComment, User
-from app.main.routes import _ensure_sample_data
+import csv
+import io
+import json
+import os
+import re
+import runpy
+import shutil
+import sqlite3
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+
+import pytest
+from sqlalchemy import event, func, inspect, select, update
+from sqlalchemy.exc import IntegrityError, OperationalError, StatementError
+from werkzeug.http import http_date
+
+from app import create_app, db
+from app.config import Config, ProductionConfig
+from app.migrations import MigrationError, _set_revision, current_revision, head
+from app.models import (
+    Course,
+    CourseMembership,
+    CourseTaskRollup,
+    Job,
+    LiveEvent,
+    Task,
+    TaskComment,
+    Team,
+    User,
+)
+from app import jobs as jobs_module
+from app.live import publish_task_changes
+from app.seed import seed_demo_data
+from app.warmup import warm_up
+from benchmarks.datagen import generate
 
 
 def seed_demo(app):
     """Create sample data without requiring a logged-in request."""
     with app.app_context():
-        _ensure_sample_data()
+        seed_demo_data()
+
+
+@contextmanager
+def count_queries(app):
+    """Count SQL statements issued while the block runs."""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+def add_board_tasks(app, count):
+    """Pile extra team tasks with feedback onto the CMPE 131 board."""
+    with app.app_context():
+        course = Course.query.filter_by(code="CMPE 131").first()
+        ta = User.query.filter_by(email="ta@example.com").first()
+        teams = course.teams
+        for i in range(count):
+            task = Task(
+                title=f"Bulk task {i}",
+                course=course,
+                team=teams[i % len(teams)],
+                status=Task.STATUS_CHOICES[i % 3][0],
+            )
+            task.comments.append(TaskComment(body=f"Note {i}", author=ta))
+            db.session.add(task)
+        db.session.commit()
+        return course.id, teams[0].id
 
 
 def login(client, email):
@@ -219,3 +288,1527 @@ def test_bad_status_input_returns_400_page(client, app):
     )
     assert resp.status_code == 400
     assert b"We couldn't process that" in resp.data
+
+
+def test_board_query_count_is_constant(client, app):
+    seed_demo(app)
+    login(client, "ta@example.com")
+    # enough tasks that every column of both boards has cards
+    course_id, team_id = add_board_tasks(app, 6)
+
+    budgets = {}
+    for url in (f"/courses/{course_id}", f"/teams/{team_id}"):
+        with count_queries(app) as statements:
+            assert client.get(url).status_code == 200
+        budgets[url] = len(statements)
+        assert budgets[url] <= 10
+
+    add_board_tasks(app, 60)
+    for url, budget in budgets.items():
+        with count_queries(app) as statements:
+            resp = client.get(url)
+        assert resp.status_code == 200
+        assert b"Bulk task 58" in resp.data
+        assert len(statements) == budget
+
+
+def test_analytics_counts_statuses_and_late_tasks(client, app):
+    seed_demo(app)
+    with app.app_context():
+        course = Course.query.filter_by(code="ISE 140").first()
+        db.session.add_all(
+            [
+                Task(title="Overdue", course=course, due_date=date(2000, 1, 1)),
+                Task(
+                    title="Finished late",
+                    course=course,
+                    status=Task.STATUS_DONE,
+                    due_date=date(2000, 1, 1),
+                ),
+                Course(code="EMPTY 1", title="No tasks yet"),
+            ]
+        )
+        db.session.commit()
+
+    # rows written behind the app's back need a resync
+    result = app.test_cli_runner().invoke(args=["rebuild-analytics"])
+    assert "Rebuilt analytics for 3 course(s)" in result.output
+
+    login(client, "prof@example.com")
+    with count_queries(app) as statements:
+        resp = client.get("/analytics")
+    assert resp.status_code == 200
+    html = resp.data.decode()
+    # ISE 140: three tasks, one done, none graded, one late -> 33% completion
+    row = html[html.index("<td>ISE 140</td>"):]
+    row = row[: row.index("</tr>")]
+    cells = [cell.split("</td>")[0].strip() for cell in row.split("<td>")[1:]]
+    assert cells == ["ISE 140", "3", "2", "0", "1", "0", "33%", "1"]
+    assert "<td>EMPTY 1</td>" in html
+    assert not [s for s in statements if "FROM task" in s or "JOIN task" in s]
+
+
+def test_task_writes_keep_analytics_rollup_in_sync(client, app):
+    seed_demo(app)
+    login(client, "prof@example.com")
+    with app.app_context():
+        course_id = Course.query.filter_by(code="CMPE 131").first().id
+
+    client.post(
+        f"/courses/{course_id}/tasks/new",
+        data={"title": "Retro", "due_date": "2000-01-01", "points": 10, "team_id": 0},
+    )
+    with app.app_context():
+        task_id = Task.query.filter_by(title="Retro").one().id
+    client.post(f"/tasks/{task_id}/grade", data={"score": 8})
+    client.post(f"/tasks/{task_id}/status", data={"status": Task.STATUS_IN_PROGRESS})
+
+    with app.app_context():
+        rollup = db.session.get(CourseTaskRollup, course_id)
+        live = (
+            rollup.todo_count,
+            rollup.in_progress_count,
+            rollup.done_count,
+            rollup.graded_count,
+            rollup.late_count,
+        )
+        CourseTaskRollup.rebuild([course_id])
+        rebuilt = (
+            rollup.todo_count,
+            rollup.in_progress_count,
+            rollup.done_count,
+            rollup.graded_count,
+            rollup.late_count,
+        )
+    assert live == rebuilt == (1, 2, 0, 1, 1)
+
+
+def test_board_columns_page_with_keyset_cursor(client, app):
+    seed_demo(app)
+    app.config["BOARD_PAGE_SIZE"] = 4
+    login(client, "student@example.com")
+    course_id, _ = add_board_tasks(app, 30)
+    with app.app_context():
+        for i, task in enumerate(Task.query.filter(Task.title.like("Bulk%"))):
+            # mix dated and undated cards, with ties on the due date
+            task.due_date = date(2030, 1, 1 + i % 3) if i % 4 else None
+        db.session.commit()
+        expected = [
+            task.title
+            for task in Task.query.filter_by(course_id=course_id, status=Task.STATUS_TODO)
+            .order_by(Task.due_date.is_(None), Task.due_date, Task.id)
+        ]
+
+    seen = []
+    url = f"/courses/{course_id}"
+    while url:
+        html = client.get(url).data.decode()
+        todo = html[html.index("<h3>To do</h3>"):html.index("<h3>In progress</h3>")]
+        titles = re.findall(r"<header>\s*<strong>(.*?)</strong>", todo)
+        assert len(titles) <= 4
+        seen.extend(titles)
+        if "Load more" not in todo:
+            break
+        url = todo.split('<p class="column-pager">')[1].split("Load more")[0]
+        url = url.rsplit('href="', 1)[1].split('"')[0].replace("&amp;", "&")
+    assert seen == expected
+
+
+def test_board_columns_walk_the_board_index(client, app):
+    seed_demo(app)
+    login(client, "prof@example.com")
+    with app.app_context():
+        course_id = Course.query.filter_by(code="CMPE 131").first().id
+        statements = []
+        event.listen(
+            db.engine,
+            "before_cursor_execute",
+            lambda conn, cursor, sql, params, *args: statements.append((sql, params)),
+        )
+        client.get(f"/courses/{course_id}?todo_after=2030-01-01:1")
+        sql, params = next(s for s in statements if "UNION ALL" in s[0])
+        plan = " | ".join(
+            row[-1]
+            for row in db.session.connection().exec_driver_sql(
+                "EXPLAIN QUERY PLAN " + sql, params
+            )
+        )
+    assert plan.count("COVERING INDEX ix_task_course_board") == 2
+    assert "SEARCH task USING INTEGER PRIMARY KEY" in plan
+
+
+def test_board_index_migration_replaces_status_indexes(app):
+    runner = app.test_cli_runner()
+    with app.app_context():
+        names = lambda: {ix["name"] for ix in inspect(db.engine).get_indexes("task")}
+        assert runner.invoke(args=["db-downgrade", "2"]).exit_code == 0
+        assert {"ix_task_course_status", "ix_task_team_status"} <= names()
+        assert not {"ix_task_course_board", "ix_task_team_board"} & names()
+        assert runner.invoke(args=["db-upgrade"]).exit_code == 0
+        assert {"ix_task_course_board", "ix_task_team_board"} <= names()
+        assert not {"ix_task_course_status", "ix_task_team_status"} & names()
+
+
+def test_bad_board_cursor_returns_400(client, app):
+    seed_demo(app)
+    login(client, "student@example.com")
+    with app.app_context():
+        course = Course.query.filter_by(code="CMPE 131").first()
+    resp = client.get(f"/courses/{course.id}?todo_after=nonsense")
+    assert resp.status_code == 400
+
+
+def test_seed_demo_command_is_idempotent(app):
+    runner = app.test_cli_runner()
+    assert "Demo data created" in runner.invoke(args=["seed-demo"]).output
+    assert "nothing to seed" in runner.invoke(args=["seed-demo"]).output
+    with app.app_context():
+        assert Course.query.count() == 2
+        assert User.query.filter_by(email="prof@example.com").one().is_instructor
+
+
+def test_requests_do_not_run_seeding_checks(client, app):
+    seed_demo(app)
+    login(client, "prof@example.com")
+    for url in ("/", "/courses", "/analytics", "/auth/login"):
+        with count_queries(app) as statements:
+            client.get(url)
+        assert not [
+            s
+            for s in statements
+            if "LIMIT" in s and ("FROM course" in s or "FROM user" in s)
+        ]
+
+
+def test_user_loader_serves_cached_snapshot(client, app):
+    seed_demo(app)
+    login(client, "student@example.com")
+    with count_queries(app) as statements:
+        resp = client.get("/feature")
+    assert resp.status_code == 200
+    assert b"student@example.com" in resp.data
+    assert statements == []
+    assert app.extensions["user_cache"].stats()["hits"] >= 1
+
+
+def test_role_and_membership_changes_invalidate_user_cache(client, app):
+    seed_demo(app)
+    login(client, "student2@example.com")
+    assert client.get("/analytics").status_code == 403
+    assert b"ISE 140" not in client.get("/").data
+
+    with app.app_context():
+        user = User.query.filter_by(email="student2@example.com").one()
+        user.role = "ta"
+        course = Course.query.filter_by(code="ISE 140").one()
+        db.session.add(CourseMembership(user=user, course=course, role="ta"))
+        db.session.commit()
+
+    assert client.get("/analytics").status_code == 200
+    assert b"ISE 140" in client.get("/").data
+
+
+def test_task_cards_come_from_fragment_cache_until_changed(client, app):
+    seed_demo(app)
+    login(client, "prof@example.com")
+    with app.app_context():
+        course = Course.query.filter_by(code="CMPE 131").first()
+        task = Task.query.filter_by(course_id=course.id).first()
+
+    first = client.get(f"/courses/{course.id}")
+    assert first.headers["X-Card-Cache"] == "hits=0, misses=2"
+    second = client.get(f"/courses/{course.id}")
+    assert second.headers["X-Card-Cache"] == "hits=2, misses=0"
+    assert second.data == first.data
+
+    client.post(f"/tasks/{task.id}/comments", data={"body": "Looks good"})
+    third = client.get(f"/courses/{course.id}")
+    assert third.headers["X-Card-Cache"] == "hits=1, misses=1"
+    assert b"Looks good" in third.data
+    with app.app_context():
+        assert db.session.get(Task, task.id).version == 2
+
+
+def test_cached_cards_carry_the_viewers_own_csrf_token(app):
+    seed_demo(app)
+    pages = []
+    for email in ("student@example.com", "student2@example.com"):
+        client = app.test_client()
+        login(client, email)
+        app.config["WTF_CSRF_ENABLED"] = True
+        with app.app_context():
+            course = Course.query.filter_by(code="CMPE 131").first()
+        html = client.get(f"/courses/{course.id}").data.decode()
+        app.config["WTF_CSRF_ENABLED"] = False
+        pages.append(set(re.findall(r'name="csrf_token" type="hidden" value="([^"]+)"', html)))
+
+    assert all(len(tokens) == 1 for tokens in pages)
+    assert pages[0] != pages[1]
+    assert app.extensions["card_cache"].stats()["hits"] == 2
+
+
+def test_boards_answer_conditional_gets_with_304(client, app):
+    seed_demo(app)
+    login(client, "prof@example.com")
+    with app.app_context():
+        course = Course.query.filter_by(code="CMPE 131").first()
+        task = Task.query.filter_by(course_id=course.id).first()
+        team_id = course.teams[0].id
+
+    etags = {}
+    for url in (f"/courses/{course.id}", f"/teams/{team_id}", "/analytics"):
+        first = client.get(url)
+        assert first.status_code == 200
+        etag = etags[url] = first.headers["ETag"]
+        # validation is ETag-only; If-Modified-Since is never answered
+        assert "Last-Modified" not in first.headers
+
+        with count_queries(app) as statements:
+            cached = client.get(url, headers={"If-None-Match": etag})
+        assert cached.status_code == 304
+        assert cached.data == b""
+        # the validator SELECT, plus the analytics rollup freshness check
+        assert len(statements) <= 2
+
+        since = client.get(url, headers={"If-Modified-Since": http_date(time.time())})
+        assert since.status_code == 200
+
+    client.post(f"/tasks/{task.id}/status", data={"status": Task.STATUS_DONE})
+    client.get(f"/courses/{course.id}")  # consume the flash message
+    for url in (f"/courses/{course.id}", "/analytics"):
+        resp = client.get(url, headers={"If-None-Match": etags[url]})
+        assert resp.status_code == 200
+
+
+def test_new_team_membership_is_never_hidden_by_if_modified_since(client, app):
+    seed_demo(app)
+    login(client, "prof@example.com")
+    with app.app_context():
+        course = Course.query.filter_by(code="CMPE 131").first()
+        team_id = course.teams[0].id
+        student = User(email="late@example.com", role="student")
+        db.session.add(student)
+        db.session.add(CourseMembership(user=student, course=course, role="student"))
+        db.session.commit()
+        student_id, url = student.id, f"/courses/{course.id}"
+    first = client.get(url)
+    since = http_date(time.time() + 60)
+
+    # a membership changes the board but touches no timestamp
+    client.post(f"/teams/{team_id}/members", data={"user_id": student_id})
+    client.get(url)  # consume the flash message
+    resp = client.get(url, headers={"If-Modified-Since": since})
+    assert resp.status_code == 200
+    assert "late@example.com" in resp.data.decode()
+    # a stale ETag is not rescued by a newer If-Modified-Since
+    resp = client.get(
+        url, headers={"If-None-Match": first.headers["ETag"], "If-Modified-Since": since}
+    )
+    assert resp.status_code == 200
+
+
+def test_conditional_get_is_per_viewer(app):
+    seed_demo(app)
+    with app.app_context():
+        course_id = Course.query.filter_by(code="CMPE 131").first().id
+    etags = []
+    for email in ("prof@example.com", "student@example.com"):
+        client = app.test_client()
+        login(client, email)
+        etags.append(client.get(f"/courses/{course_id}").headers["ETag"])
+    assert etags[0] != etags[1]
+
+
+def rollup_counts(course_id):
+    rollup = db.session.get(CourseTaskRollup, course_id)
+    return (rollup.todo_count, rollup.in_progress_count, rollup.done_count)
+
+
+def test_bulk_status_update_applies_batch_with_one_update_per_status(client, app):
+    seed_demo(app)
+    login(client, "prof@example.com")
+    course_id, _ = add_board_tasks(app, 6)
+    with app.app_context():
+        CourseTaskRollup.rebuild([course_id])
+        db.session.commit()
+        ids = [t.id for t in Task.query.filter_by(course_id=course_id).order_by(Task.id)]
+
+    data = {}
+    for index, task_id in enumerate(ids):
+        data[f"updates-{index}-task_id"] = task_id
+        data[f"updates-{index}-status"] = Task.STATUS_DONE if index % 2 else Task.STATUS_TODO
+    with count_queries(app) as statements:
+        resp = client.post("/tasks/status", data=data, follow_redirects=False)
+    assert resp.status_code == 302
+    assert len([s for s in statements if s.startswith("UPDATE task ")]) == 2
+
+    with app.app_context():
+        statuses = [db.session.get(Task, task_id).status for task_id in ids]
+        assert statuses == [Task.STATUS_TODO, Task.STATUS_DONE] * (len(ids) // 2)
+        live = rollup_counts(course_id)
+        CourseTaskRollup.rebuild([course_id])
+        assert live == rollup_counts(course_id)
+
+    resp = client.post(
+        "/tasks/status",
+        json={
+            "updates": [
+                {"task_id": ids[0], "status": Task.STATUS_IN_PROGRESS},
+                {"task_id": ids[1], "status": Task.STATUS_DONE},
+            ]
+        },
+    )
+    assert resp.get_json() == {"updated": 1, "unchanged": 1}
+
+
+def test_bulk_status_update_rejects_whole_batch_on_bad_pair(client, app):
+    seed_demo(app)
+    login(client, "prof@example.com")
+    with app.app_context():
+        task_id = Task.query.first().id
+        before = db.session.get(Task, task_id).status
+
+    resp = client.post(
+        "/tasks/status",
+        json={
+            "updates": [
+                {"task_id": task_id, "status": Task.STATUS_DONE},
+                {"task_id": task_id, "status": "shipped"},
+            ]
+        },
+    )
+    assert resp.status_code == 400
+    assert "updates" in resp.get_json()["errors"]
+    resp = client.post(
+        "/tasks/status",
+        json={"updates": [{"task_id": 9999, "status": Task.STATUS_DONE}]},
+    )
+    assert resp.status_code == 404
+    with app.app_context():
+        assert db.session.get(Task, task_id).status == before
+
+
+def test_bulk_status_update_rejects_oversize_batch(client, app):
+    seed_demo(app)
+    login(client, "prof@example.com")
+    course_id, _ = add_board_tasks(app, 501)
+    with app.app_context():
+        before = {
+            t.id: (t.status, t.version)
+            for t in Task.query.filter_by(course_id=course_id).limit(501)
+        }
+    ids = list(before)
+    assert len(ids) == 501
+
+    updates = [{"task_id": i, "status": Task.STATUS_DONE} for i in ids]
+    resp = client.post("/tasks/status", json={"updates": updates})
+    assert resp.status_code == 413
+    assert "At most 500 updates" in resp.get_json()["errors"]["updates"][0]
+
+    form = {}
+    for index, task_id in enumerate(ids):
+        form[f"updates-{index}-task_id"] = task_id
+        form[f"updates-{index}-status"] = Task.STATUS_DONE
+    assert client.post("/tasks/status", data=form).status_code == 413
+    with app.app_context():
+        after = {t.id: (t.status, t.version) for t in Task.query.filter(Task.id.in_(ids))}
+    assert after == before
+
+
+def test_students_cannot_bulk_update(client, app):
+    seed_demo(app)
+    login(client, "student@example.com")
+    resp = client.post("/tasks/status", json={"updates": []})
+    assert resp.status_code == 403
+
+
+def test_instructor_imports_tasks_from_csv(client, app):
+    seed_demo(app)
+    login(client, "prof@example.com")
+    with app.app_context():
+        course_id = Course.query.filter_by(code="CMPE 131").first().id
+    csv_body = (
+        "title,description,due_date,points,team\n"
+        "Sprint 1 demo,Show the MVP,2030-02-01,40,Velocity\n"
+        "Sprint 2 demo,,,,\n"
+    )
+    resp = client.post(
+        f"/courses/{course_id}/tasks/import",
+        data={"file": (io.BytesIO(csv_body.encode()), "backlog.csv"), "format": "auto"},
+        content_type="multipart/form-data",
+        follow_redirects=True,
+    )
+    assert b"Imported 2 task(s)" in resp.data
+
+    with app.app_context():
+        first = Task.query.filter_by(title="Sprint 1 demo").one()
+        assert first.points == 40
+        assert first.team.name == "Velocity"
+        assert first.due_date == date(2030, 2, 1)
+        second = Task.query.filter_by(title="Sprint 2 demo").one()
+        assert (second.points, second.team_id) == (100, None)
+        assert db.session.get(CourseTaskRollup, course_id).todo_count == 3
+
+
+def test_import_rejects_file_with_invalid_rows(client, app):
+    seed_demo(app)
+    login(client, "prof@example.com")
+    with app.app_context():
+        course_id = Course.query.filter_by(code="CMPE 131").first().id
+        tasks_before = Task.query.count()
+    csv_body = (
+        "title,points,team\n"
+        "Fine,10,\n"
+        ",10,\n"
+        "Too many points,5000,\n"
+        "Ghost team,10,Nobody\n"
+    )
+    resp = client.post(
+        f"/courses/{course_id}/tasks/import",
+        data={"file": (io.BytesIO(csv_body.encode()), "backlog.csv"), "format": "csv"},
+        content_type="multipart/form-data",
+    )
+    html = resp.data.decode()
+    assert "3 invalid row(s)" in html
+    assert "Line 3: title" in html
+    assert "Line 4: points" in html
+    assert "Line 5: team: unknown team" in html
+    with app.app_context():
+        assert Task.query.count() == tasks_before
+
+
+def test_import_reports_file_that_is_not_utf8(client, app):
+    seed_demo(app)
+    login(client, "prof@example.com")
+    with app.app_context():
+        course_id = Course.query.filter_by(code="CMPE 131").first().id
+        tasks_before = Task.query.count()
+    latin1 = "title,points\nCafé review,10\nRésumé draft,20\n".encode("latin-1")
+    resp = client.post(
+        f"/courses/{course_id}/tasks/import",
+        data={"file": (io.BytesIO(latin1), "backlog.csv"), "format": "csv"},
+        content_type="multipart/form-data",
+    )
+    assert resp.status_code == 200
+    html = resp.data.decode()
+    assert "1 invalid row(s)" in html
+    assert "file is not UTF-8 text" in html
+    with app.app_context():
+        assert Task.query.count() == tasks_before
+
+
+def test_import_command_streams_jsonl_across_courses(app, tmp_path):
+    seed_demo(app)
+    app.config["IMPORT_BATCH_SIZE"] = 7
+    path = tmp_path / "semester.jsonl"
+    with path.open("w") as handle:
+        for i in range(40):
+            course = "CMPE 131" if i % 2 else "ISE 140"
+            row = {"title": f"Imported {i}", "course": course, "points": i + 1}
+            handle.write(json.dumps(row) + "\n")
+
+    with count_queries(app) as statements:
+        result = app.test_cli_runner().invoke(args=["import-tasks", str(path)])
+    assert "Imported 40 task(s)" in result.output
+    assert len([s for s in statements if s.startswith("INSERT INTO task ")]) <= 6
+
+    with app.app_context():
+        assert Task.query.filter(Task.title.like("Imported %")).count() == 40
+        live = {c.id: rollup_counts(c.id) for c in Course.query}
+        CourseTaskRollup.rebuild()
+        assert live == {c.id: rollup_counts(c.id) for c in Course.query}
+
+
+def test_course_export_streams_tasks_with_feedback(client, app):
+    seed_demo(app)
+    app.config["EXPORT_BATCH_SIZE"] = 2
+    login(client, "prof@example.com")
+    with app.app_context():
+        course = Course.query.filter_by(code="CMPE 131").first()
+        task = Task.query.filter_by(title="Project proposal").one()
+        task.score = 45
+        db.session.commit()
+        course_id, task_id = course.id, task.id
+    client.post(f"/tasks/{task_id}/comments", data={"body": "Solid scope"})
+    client.post(f"/tasks/{task_id}/comments", data={"body": "Add risks"})
+
+    resp = client.get(f"/courses/{course_id}/export.csv")
+    assert resp.status_code == 200
+    assert resp.is_streamed
+    assert resp.mimetype == "text/csv"
+    assert "cmpe-131-gradebook.csv" in resp.headers["Content-Disposition"]
+    rows = list(csv.DictReader(io.StringIO(resp.get_data(as_text=True))))
+    proposal = [row for row in rows if row["title"] == "Project proposal"]
+    assert [row["comment_body"] for row in proposal] == ["Add risks", "Solid scope"]
+    assert proposal[0]["score"] == "45"
+    assert proposal[0]["team"] == "Velocity"
+    unit_tests = [row for row in rows if row["title"] == "Unit test suite"]
+    assert len(unit_tests) == 1 and unit_tests[0]["comment_body"] == ""
+
+    with app.app_context():
+        team_id = Team.query.filter_by(name="Nimbus").one().id
+    lines = client.get(f"/teams/{team_id}/export.jsonl").get_data(as_text=True).splitlines()
+    assert [json.loads(line)["title"] for line in lines] == ["Unit test suite"]
+
+
+def test_students_cannot_export_gradebook(client, app):
+    seed_demo(app)
+    login(client, "student@example.com")
+    with app.app_context():
+        course_id = Course.query.filter_by(code="CMPE 131").first().id
+    assert client.get(f"/courses/{course_id}/export.csv").status_code == 403
+    assert client.get(f"/courses/{course_id}/export.xml").status_code == 404
+
+
+def test_production_profile_sets_sqlite_pragmas(tmp_path):
+    class ProductionTestConfig(ProductionConfig):
+        TESTING = True
+        SECRET_KEY = "test"
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'prod.db'}"
+
+    app = create_app(ProductionTestConfig)
+    with app.app_context():
+        with db.engine.connect() as conn:
+
+            def pragma(name):
+                return conn.exec_driver_sql(f"PRAGMA {name}").scalar()
+
+            assert pragma("journal_mode") == "wal"
+            assert pragma("synchronous") == 1  # NORMAL
+            assert pragma("busy_timeout") == 5000
+            assert pragma("cache_size") == -65536
+        assert db.engine.pool.size() == 10
+        db.engine.dispose()
+
+
+def test_production_profile_refuses_to_start_without_secret_key(tmp_path):
+    class ProductionTestConfig(ProductionConfig):
+        TESTING = True
+        SECRET_KEY = None
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'prod.db'}"
+
+    with pytest.raises(RuntimeError, match="SECRET_KEY is not set"):
+        create_app(ProductionTestConfig)
+
+
+def test_synthetic_dataset_keeps_route_query_counts_flat(client, app):
+    with app.app_context():
+        summary = generate(courses=3, students=40, tasks=300, comments=600)
+        assert Task.query.count() == 300
+        assert TaskComment.query.count() == 600
+        assert db.session.get(CourseTaskRollup, summary["course_id"]).total > 0
+
+    login(client, "prof@example.com")
+    urls = [
+        "/",
+        f"/courses/{summary['course_id']}",
+        f"/teams/{summary['team_id']}",
+        "/analytics",
+    ]
+    for url in urls:
+        with count_queries(app) as statements:
+            assert client.get(url).status_code == 200
+        assert len(statements) <= 10, url
+
+
+def test_server_timing_reports_request_queries(client, app):
+    seed_demo(app)
+    login(client, "prof@example.com")
+    with app.app_context():
+        course_id = Course.query.filter_by(code="CMPE 131").first().id
+
+    with count_queries(app) as statements:
+        resp = client.get(f"/courses/{course_id}")
+    timing = resp.headers["Server-Timing"]
+    assert f'desc="{len(statements)} queries"' in timing
+    assert re.search(r"db;dur=[\d.]+", timing)
+    assert re.search(r"app;dur=[\d.]+", timing)
+
+
+def test_slow_requests_are_logged_as_json(client, app, caplog):
+    seed_demo(app)
+    app.config["SLOW_REQUEST_MS"] = 0
+    login(client, "prof@example.com")
+    with caplog.at_level("WARNING", logger="microcanvas.slow_requests"):
+        client.get("/analytics")
+    entries = [json.loads(record.getMessage()) for record in caplog.records]
+    analytics = [entry for entry in entries if entry["endpoint"] == "main.analytics"]
+    assert analytics and analytics[0]["status"] == 200
+    assert analytics[0]["queries"] >= 1
+    assert analytics[0]["slowest"][0]["sql"].startswith("SELECT")
+
+
+def test_sql_profile_page_is_debug_only(client, app):
+    seed_demo(app)
+    login(client, "prof@example.com")
+    client.get("/courses")
+    assert client.get("/debug/sql").status_code == 404
+
+    app.config["SQL_DEBUG_PAGE"] = True
+    resp = client.get("/debug/sql")
+    assert resp.status_code == 200
+    assert b"main.courses" in resp.data
+    assert b"card_cache" in resp.data
+
+
+def test_team_member_candidates_come_from_one_anti_join(client, app):
+    seed_demo(app)
+    with app.app_context():
+        course = Course.query.filter_by(code="CMPE 131").first()
+        team = Team.query.filter_by(name="Velocity").one()
+        db.session.add_all(
+            CourseMembership(
+                user=User(email=f"extra{i}@example.com", role="student"),
+                course=course,
+                role="student",
+            )
+            for i in range(50)
+        )
+        db.session.commit()
+        team_id = team.id
+
+    login(client, "prof@example.com")
+    with count_queries(app) as statements:
+        html = client.get(f"/teams/{team_id}").data.decode()
+    options = re.findall(r'<option value="\d+">([^<]+)</option>', html)
+    # student@ is already on Velocity; staff are never candidates
+    assert options[:1] == ["student2@example.com"]
+    assert len(options) == 51
+    assert "student@example.com" not in options
+    assert len(statements) <= 10
+
+    with app.app_context():
+        extra = User.query.filter_by(email="extra0@example.com").one().id
+    client.post(f"/teams/{team_id}/members", data={"user_id": extra})
+    html = client.get(f"/teams/{team_id}").data.decode()
+    assert "extra0@example.com</li>" in html
+    assert '">extra0@example.com</option>' not in html
+
+
+def test_search_ranks_tasks_and_feedback_within_member_courses(client, app):
+    seed_demo(app)
+    login(client, "ta@example.com")
+    with app.app_context():
+        task = Task.query.filter_by(title="Unit test suite").one()
+        ta = User.query.filter_by(email="ta@example.com").one()
+        db.session.add(
+            TaskComment(task=task, author=ta, body="Mock the forecasting service.")
+        )
+        db.session.commit()
+        task_id = task.id
+
+    html = client.get("/search?q=forecast").data.decode()
+    # the ISE 140 homework is outside the TA's courses; the comment is not
+    assert "HW 3" not in html
+    assert f"#task-{task_id}" in html
+    assert "<mark>forecasting</mark>" in html
+
+    prof = app.test_client()
+    login(prof, "prof@example.com")
+    html = prof.get("/search?q=forecast").data.decode()
+    assert html.index("HW 3") < html.index("Unit test suite")
+
+    # edits that bypass the ORM stay in sync through the triggers
+    with app.app_context():
+        db.session.execute(
+            Task.__table__.update()
+            .where(Task.id == task_id)
+            .values(title="Integration harness")
+        )
+        db.session.commit()
+    html = prof.get("/search?q=integration").data.decode()
+    assert "Integration harness" in html
+
+
+def test_search_paginates_and_tolerates_query_syntax(client, app):
+    seed_demo(app)
+    add_board_tasks(app, 25)
+    login(client, "prof@example.com")
+    app.config["SEARCH_PAGE_SIZE"] = 10
+
+    titles = []
+    for page in (1, 2, 3):
+        html = client.get(f"/search?q=bulk+task&page={page}").data.decode()
+        titles += re.findall(r"<strong>(Bulk task \d+)</strong>", html)
+        assert ("page=%d" % (page + 1) in html) == (page < 3)
+    assert sorted(titles) == sorted(f"Bulk task {i}" for i in range(25))
+
+    response = client.get('/search?q="unbalanced AND (')
+    assert response.status_code == 200
+    assert b"No matches" in response.data
+    assert client.get("/search?q=bulk&page=0").status_code == 400
+
+
+def test_rebuild_search_command_restores_index(app):
+    seed_demo(app)
+    with app.app_context():
+        db.session.execute(db.text("DELETE FROM search_index"))
+        db.session.commit()
+
+    result = app.test_cli_runner().invoke(args=["rebuild-search"])
+    assert result.exit_code == 0
+    assert "Indexed 3 task(s)" in result.output
+    with app.app_context():
+        from app.search import search
+
+        course_ids = [course.id for course in Course.query]
+        results, has_next = search("proposal", course_ids)
+        assert [r["title"] for r in results] == ["Project proposal"]
+        assert has_next is False
+
+
+def _sse_events(chunks):
+    """Parse ``(event, data)`` pairs out of raw SSE chunks."""
+    events = []
+    for chunk in chunks:
+        fields = dict(
+            line.split(": ", 1) for line in chunk.decode().splitlines() if ": " in line
+        )
+        if "event" in fields:
+            events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+def test_board_streams_push_task_changes(client, app):
+    seed_demo(app)
+    login(client, "prof@example.com")
+    with app.app_context():
+        task = Task.query.filter_by(title="Project proposal").one()
+        task_id, course_id, team_id = task.id, task.course_id, task.team_id
+
+    course_stream = client.get(f"/courses/{course_id}/events")
+    team_stream = client.get(f"/teams/{team_id}/events")
+    assert course_stream.mimetype == "text/event-stream"
+    course_chunks = iter(course_stream.response)
+    team_chunks = iter(team_stream.response)
+    assert next(course_chunks).startswith(b"retry:")
+    next(team_chunks)
+    assert app.extensions["live"].subscriber_count() == 2
+
+    client.post(f"/tasks/{task_id}/status", data={"status": "done"})
+    client.post(f"/tasks/{task_id}/comments", data={"body": "Nice scope."})
+    client.post(f"/tasks/{task_id}/grade", data={"score": 45})
+
+    expected = [
+        ("task", {"id": task_id, "status": "done", "score": None, "comments": 0}),
+        ("task", {"id": task_id, "status": "done", "score": None, "comments": 1}),
+        ("task", {"id": task_id, "status": "done", "score": 45, "comments": 1}),
+    ]
+    assert _sse_events(next(course_chunks) for _ in expected) == expected
+    assert _sse_events(next(team_chunks) for _ in expected) == expected
+
+    course_stream.close()
+    team_stream.close()
+    assert app.extensions["live"].subscriber_count() == 0
+
+
+def test_broker_replays_missed_events_and_drops_stalled_clients():
+    from app.live import Broker
+
+    broker = Broker(queue_size=2, replay_size=3)
+    for n in range(4):
+        broker.publish(["course:1"], "task", {"n": n})
+
+    # ids 2..4 are still buffered, so a client that saw id 2 just catches up
+    caught_up = broker.subscribe("course:1", last_event_id=2)
+    assert [caught_up.get(0) for _ in range(2)] == [
+        'id: 3\nevent: task\ndata: {"n":2}\n\n',
+        'id: 4\nevent: task\ndata: {"n":3}\n\n',
+    ]
+    # id 1 has been evicted, so this client is told to reload
+    behind = broker.subscribe("course:1", last_event_id=0)
+    assert behind.get(0).startswith("event: reload")
+
+    caught_up.close()
+    behind.close()
+
+    stalled = broker.subscribe("course:1")
+    reader = broker.subscribe("course:1")
+    for n in range(3):
+        broker.publish(["course:1"], "task", {"n": n})
+        assert reader.get(0).endswith('{"n":%d}\n\n' % n)
+    assert stalled.get(0) is None
+    stalled.close()
+    reader.close()
+    assert broker.subscriber_count() == 0
+
+
+def test_board_streams_get_events_published_by_other_processes(tmp_path):
+    class SharedConfig(Config):
+        TESTING = True
+        SEED_DEMO_DATA = False
+        WTF_CSRF_ENABLED = False
+        JOB_RUNNER = "external"
+        LIVE_POLL_SECONDS = 0
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'shared.db'}"
+
+    writer, reader = create_app(SharedConfig), create_app(SharedConfig)
+    seed_demo(writer)
+    with writer.app_context():
+        task = Task.query.filter_by(title="Project proposal").one()
+        task_id, course_id = task.id, task.course_id
+    writer_client, reader_client = writer.test_client(), reader.test_client()
+    login(writer_client, "prof@example.com")
+    login(reader_client, "prof@example.com")
+
+    stream = reader_client.get(f"/courses/{course_id}/events")
+    chunks = iter(stream.response)
+    next(chunks)
+    writer_client.post(f"/tasks/{task_id}/status", data={"status": "done"})
+    assert reader.extensions["live"].subscriber_count() == 1
+    with reader.app_context():
+        # what the reader's poller thread does every LIVE_POLL_SECONDS
+        assert reader.extensions["live_relay"].poll() == 1
+    chunk = next(chunks)
+    assert _sse_events([chunk]) == [
+        ("task", {"id": task_id, "status": "done", "score": None, "comments": 0})
+    ]
+    stream.close()
+
+    # ids are row ids, so Last-Event-ID means the same thing on every worker
+    last_id = re.search(rb"^id: (\d+)$", chunk, re.M).group(1).decode()
+    with writer.app_context():
+        assert db.session.get(LiveEvent, int(last_id)).channels.startswith("course:")
+    resumed = writer_client.get(
+        f"/courses/{course_id}/events", headers={"Last-Event-ID": last_id}
+    )
+    resumed_chunks = iter(resumed.response)
+    next(resumed_chunks)
+    writer_client.post(f"/tasks/{task_id}/status", data={"status": "todo"})
+    assert _sse_events([next(resumed_chunks)]) == [
+        ("task", {"id": task_id, "status": "todo", "score": None, "comments": 0})
+    ]
+    resumed.close()
+
+    with writer.app_context():
+        db.session.execute(update(LiveEvent).values(created_at=datetime(2000, 1, 1)))
+        db.session.commit()
+        assert writer.extensions["live_relay"].prune() == 2
+        db.session.commit()
+        db.drop_all()
+
+
+def test_live_events_commit_with_their_change_and_prune_without_relay(client, app):
+    seed_demo(app)
+    login(client, "prof@example.com")
+    with app.app_context():
+        task_id = Task.query.filter_by(title="Project proposal").one().id
+        publish_task_changes([task_id])
+        db.session.rollback()
+        # a change that never commits never reaches a board
+        assert LiveEvent.query.count() == 0
+
+    client.post(f"/tasks/{task_id}/status", data={"status": "done"})
+    relay = app.extensions["live_relay"]
+    with app.app_context():
+        assert LiveEvent.query.count() == 1
+        db.session.execute(update(LiveEvent).values(created_at=datetime(2000, 1, 1)))
+        db.session.commit()
+    # LIVE_POLL_SECONDS = 0: no relay thread, so publishers prune
+    relay.PRUNE_EVERY = 0
+    client.post(f"/tasks/{task_id}/status", data={"status": "todo"})
+    with app.app_context():
+        assert [json.loads(e.data)["status"] for e in LiveEvent.query] == ["todo"]
+
+
+def test_board_streams_are_capped_per_process(app):
+    app.config["LIVE_MAX_STREAMS"] = 1
+    seed_demo(app)
+    client = app.test_client()
+    login(client, "prof@example.com")
+    with app.app_context():
+        course_id = Course.query.first().id
+
+    first = client.get(f"/courses/{course_id}/events")
+    assert first.status_code == 200
+    refused = client.get(f"/courses/{course_id}/events")
+    assert refused.status_code == 503
+    assert app.extensions["live"].subscriber_count() == 1
+    first.close()
+    assert client.get(f"/courses/{course_id}/events").status_code == 200
+
+
+def test_card_mutations_answer_with_fragments(client, app):
+    seed_demo(app)
+    login(client, "prof@example.com")
+    with app.app_context():
+        task = Task.query.filter_by(title="Project proposal").one()
+        task_id, course_id = task.id, task.course_id
+
+    response = client.post(
+        f"/tasks/{task_id}/status?board=team",
+        data={"status": "done"},
+        headers={"HX-Request": "true"},
+    )
+    assert response.status_code == 200
+    html = response.data.decode()
+    assert html.strip().startswith(f'<article class="task-card" id="task-{task_id}"')
+    assert '<option value="done" selected>' in html
+    assert "Course task" in html  # the team-board flavour of the card
+
+    response = client.post(
+        f"/tasks/{task_id}/comments",
+        data={"body": "Looks good."},
+        headers={"HX-Request": "true"},
+    )
+    assert "Looks good." in response.data.decode()
+    assert 'data-comments="1"' in response.data.decode()
+
+    response = client.post(
+        f"/tasks/{task_id}/grade",
+        data={"score": 48},
+        headers={"Accept": "application/json"},
+    )
+    assert response.get_json() == {
+        "id": task_id,
+        "status": "done",
+        "score": 48,
+        "comments": 1,
+    }
+
+    response = client.post(
+        f"/tasks/{task_id}/comments",
+        data={"body": "   "},
+        headers={"Accept": "application/json"},
+    )
+    assert response.status_code == 400
+    assert "body" in response.get_json()["errors"]
+
+    # fragment responses leave no flash behind for the next full page
+    html = client.get(f"/courses/{course_id}").data.decode()
+    assert "Grade saved." not in html
+    assert "Feedback posted." not in html
+    assert client.post(
+        f"/tasks/{task_id}/status?board=nope",
+        data={"status": "todo"},
+        headers={"HX-Request": "true"},
+    ).status_code == 400
+    with app.app_context():
+        assert db.session.get(Task, task_id).status == "done"
+
+
+def test_task_status_is_stored_as_checked_integer_code(client, app):
+    seed_demo(app)
+    with app.app_context():
+        raw = db.session.execute(
+            db.text("SELECT title, status FROM task ORDER BY id")
+        ).all()
+        assert [status for _, status in raw] == [0, 1, 0]
+        task = Task.query.filter_by(status=Task.STATUS_IN_PROGRESS).one()
+        assert (task.status, task.status_label) == ("in_progress", "In progress")
+
+        with pytest.raises(IntegrityError):
+            db.session.execute(db.text("UPDATE task SET status = 7"))
+        db.session.rollback()
+        with pytest.raises(StatementError):
+            db.session.add(Task(title="Bad", course_id=task.course_id, status="later"))
+            db.session.flush()
+        db.session.rollback()
+
+
+def test_startup_upgrades_text_status_column(tmp_path):
+    class LegacyConfig(Config):
+        TESTING = True
+        SEED_DEMO_DATA = False
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'legacy.db'}"
+
+    with create_app(LegacyConfig).app_context():
+        db.engine.dispose()
+    conn = sqlite3.connect(tmp_path / "legacy.db")
+    conn.executescript(
+        """
+        DROP TABLE schema_revision;
+        DROP TABLE task;
+        CREATE TABLE task (
+            id INTEGER NOT NULL PRIMARY KEY,
+            title VARCHAR(140) NOT NULL,
+            description TEXT,
+            due_date DATE,
+            status VARCHAR(20) NOT NULL,
+            points INTEGER NOT NULL,
+            score INTEGER,
+            course_id INTEGER NOT NULL REFERENCES course (id),
+            team_id INTEGER REFERENCES team (id)
+        );
+        CREATE INDEX ix_task_course_status ON task (course_id, status);
+        INSERT INTO course (id, code, title) VALUES (1, 'OLD 1', 'Legacy');
+        INSERT INTO task (id, title, status, points, course_id) VALUES
+            (1, 'Draft', 'todo', 10, 1),
+            (2, 'Review', 'in_progress', 10, 1),
+            (3, 'Ship', 'done', 10, 1);
+        """
+    )
+    conn.commit()
+    conn.close()
+
+    app = create_app(LegacyConfig)
+    with app.app_context():
+        columns = {c["name"]: c for c in inspect(db.engine).get_columns("task")}
+        assert str(columns["status"]["type"]) == "SMALLINT"
+        assert {ix["name"] for ix in inspect(db.engine).get_indexes("task")} >= {
+            "ix_task_course_board",
+            "ix_task_team_board",
+        }
+        tasks = Task.query.order_by(Task.id).all()
+        assert [(t.status, t.version) for t in tasks] == [
+            ("todo", 1),
+            ("in_progress", 1),
+            ("done", 1),
+        ]
+        # the search triggers came back with the rebuilt table
+        db.session.add(Task(title="Retro notes", course_id=1))
+        db.session.commit()
+        from app.search import search
+
+        assert [r["title"] for r in search("retro", [1])[0]] == ["Retro notes"]
+        db.engine.dispose()
+
+
+def run_jobs(app):
+    result = app.test_cli_runner().invoke(args=["jobs-worker", "--once"])
+    assert result.exit_code == 0, result.output
+    return result.output
+
+
+def test_background_export_job_matches_inline_export(client, app, tmp_path):
+    seed_demo(app)
+    add_board_tasks(app, 7)
+    app.config.update(JOB_DIR=str(tmp_path), EXPORT_BATCH_SIZE=3)
+    login(client, "prof@example.com")
+    with app.app_context():
+        course_id = Course.query.filter_by(code="CMPE 131").first().id
+
+    resp = client.post(
+        f"/courses/{course_id}/export.csv/job",
+        headers={"Accept": "application/json"},
+    )
+    assert resp.status_code == 202
+    job_url = resp.headers["Location"]
+    assert resp.get_json()["status"] == "queued"
+    assert client.get(f"{job_url}/result").status_code == 404
+
+    assert "Ran 1 job(s)." in run_jobs(app)
+    job = client.get(job_url, headers={"Accept": "application/json"}).get_json()
+    assert (job["status"], job["progress"], job["result"]) == (
+        "succeeded",
+        100,
+        {"tasks": 9},
+    )
+    download = client.get(f"{job_url}/result")
+    assert "cmpe-131-gradebook.csv" in download.headers["Content-Disposition"]
+    inline = client.get(f"/courses/{course_id}/export.csv")
+    assert download.get_data(as_text=True) == inline.get_data(as_text=True)
+
+    other = app.test_client()
+    login(other, "ta@example.com")
+    assert other.get(job_url).status_code == 403
+
+
+def test_large_import_runs_as_job_and_reports_errors(client, app, tmp_path):
+    seed_demo(app)
+    app.config.update(JOB_DIR=str(tmp_path), IMPORT_BACKGROUND_BYTES=10)
+    login(client, "prof@example.com")
+    with app.app_context():
+        course_id = Course.query.filter_by(code="CMPE 131").first().id
+
+    def upload(body):
+        return client.post(
+            f"/courses/{course_id}/tasks/import",
+            data={"file": (io.BytesIO(body.encode()), "big.csv"), "format": "auto"},
+            content_type="multipart/form-data",
+        )
+
+    good = upload("title,points\nQueued one,10\nQueued two,20\n")
+    bad = upload("title,points\n,10\n")
+    assert good.status_code == bad.status_code == 302
+    assert "/jobs/" in good.headers["Location"]
+    with app.app_context():
+        assert Task.query.filter(Task.title.like("Queued%")).count() == 0
+
+    run_jobs(app)
+    with app.app_context():
+        assert Task.query.filter(Task.title.like("Queued%")).count() == 2
+        assert db.session.get(CourseTaskRollup, course_id).todo_count == 3
+    assert list((tmp_path / "uploads").iterdir()) == []
+    html = client.get(bad.headers["Location"]).data.decode()
+    assert "1 invalid row(s); nothing was imported." in html
+    assert "Line 2: title" in html
+
+
+def test_import_job_keeps_upload_until_it_finishes(
+    client, app, tmp_path, monkeypatch
+):
+    seed_demo(app)
+    app.config.update(JOB_DIR=str(tmp_path), IMPORT_BACKGROUND_BYTES=10)
+    login(client, "prof@example.com")
+    with app.app_context():
+        course_id = Course.query.filter_by(code="CMPE 131").first().id
+    resp = client.post(
+        f"/courses/{course_id}/tasks/import",
+        data={
+            "file": (io.BytesIO(b"title,points\nRetried one,10\n"), "big.csv"),
+            "format": "auto",
+        },
+        content_type="multipart/form-data",
+    )
+    with app.app_context():
+        # the first worker died mid-import, after the upload was read
+        job = Job.query.one()
+        job.status, job.attempts, job.worker = "running", 1, "gone:1:cli"
+        job.heartbeat_at = datetime(2000, 1, 1)
+        db.session.commit()
+
+    real_import = jobs_module.import_tasks
+    calls = []
+
+    def locked_once(*args, **kwargs):
+        calls.append(1)
+        if len(calls) == 1:
+            locked = sqlite3.OperationalError("database is locked")
+            raise OperationalError("INSERT", {}, locked)
+        return real_import(*args, **kwargs)
+
+    monkeypatch.setattr(jobs_module, "import_tasks", locked_once)
+    run_jobs(app)
+    job = client.get(resp.headers["Location"], headers={"Accept": "application/json"})
+    assert job.get_json()["status"] == "succeeded"
+    assert len(calls) == 2
+    with app.app_context():
+        assert Job.query.one().attempts == 3
+        assert Task.query.filter_by(title="Retried one").count() == 1
+    assert list((tmp_path / "uploads").iterdir()) == []
+
+
+def test_import_job_heartbeats_while_it_reads(client, app, tmp_path, monkeypatch):
+    seed_demo(app)
+    app.config.update(
+        JOB_DIR=str(tmp_path), IMPORT_BACKGROUND_BYTES=10, IMPORT_BATCH_SIZE=2
+    )
+    login(client, "prof@example.com")
+    with app.app_context():
+        course_id = Course.query.filter_by(code="CMPE 131").first().id
+    rows = "".join(f"Beat {n},10\n" for n in range(5))
+    for body in (f"title,points\n,10\n{rows}", f"title,points\n{rows}"):
+        client.post(
+            f"/courses/{course_id}/tasks/import",
+            data={"file": (io.BytesIO(body.encode()), "big.csv"), "format": "auto"},
+            content_type="multipart/form-data",
+        )
+
+    real_import = jobs_module.import_tasks
+    beats = []
+
+    def recording(*args, heartbeat, **kwargs):
+        def beat():
+            heartbeat()
+            beats.append(db.session.scalar(select(Job.heartbeat_at).order_by(Job.id)))
+
+        return real_import(*args, heartbeat=beat, **kwargs)
+
+    monkeypatch.setattr(jobs_module, "import_tasks", recording)
+    run_jobs(app)
+    with app.app_context():
+        rejected, imported = Job.query.order_by(Job.id).all()
+        assert rejected.status == "failed" and imported.status == "succeeded"
+        assert Task.query.filter(Task.title.like("Beat%")).count() == 5
+        # every 2 rows: the rejected file never writes, so each heartbeat
+        # lands; the good one holds SQLite's write lock after its first batch
+        assert len(beats) == 5
+        assert beats[0] > rejected.started_at and beats[1] > beats[0]
+
+
+def test_assign_teams_job_resumes_after_worker_dies(client, app, tmp_path):
+    seed_demo(app)
+    app.config["JOB_DIR"] = str(tmp_path)
+    login(client, "prof@example.com")
+    with app.app_context():
+        course = Course.query.filter_by(code="CMPE 131").first()
+        for i in range(5):
+            user = User(email=f"late{i}@example.com", role="student")
+            db.session.add(CourseMembership(user=user, course=course, role="student"))
+        db.session.commit()
+        course_id = course.id
+
+    job_url = client.post(f"/courses/{course_id}/teams/assign").headers["Location"]
+    with app.app_context():
+        # a worker claimed the job, then the process was killed
+        job = Job.query.one()
+        job.status, job.attempts, job.worker = "running", 1, "gone:1:cli"
+        job.heartbeat_at = datetime(2000, 1, 1)
+        db.session.commit()
+
+    run_jobs(app)
+    job = client.get(job_url, headers={"Accept": "application/json"}).get_json()
+    assert (job["status"], job["result"]) == ("succeeded", {"assigned": 5})
+    with app.app_context():
+        assert Job.query.one().attempts == 2
+        sizes = sorted(len(team.memberships) for team in db.session.get(Course, course_id).teams)
+        # seeded Velocity has 2 members and Nimbus 1; 5 more even them out at 4
+        assert sizes == [4, 4]
+
+
+def test_dashboard_lists_next_open_deadlines_in_one_query(client, app):
+    seed_demo(app)
+    today = date.today()
+    with app.app_context():
+        course = Course.query.filter_by(code="CMPE 131").first()
+        velocity, nimbus = (Team.query.filter_by(name=n).one() for n in ("Velocity", "Nimbus"))
+        other = Course.query.filter_by(code="ISE 140").first()
+
+        def add(title, days, **fields):
+            fields.setdefault("course", course)
+            db.session.add(
+                Task(title=title, due_date=today + timedelta(days=days), **fields)
+            )
+
+        add("Overdue", -1)
+        add("Retro", 3)
+        add("Standup", 1, team=velocity)
+        add("Nimbus only", 0, team=nimbus)
+        add("Already done", 2, status="done")
+        add("Midterm", 2, course=other)
+        for i in range(4):
+            add(f"Later {i}", 10 + i)
+        db.session.commit()
+        retro_id = Task.query.filter_by(title="Retro").one().id
+
+    # student is on Velocity and enrolled in both courses
+    login(client, "student@example.com")
+    with count_queries(app) as statements:
+        html = client.get("/").data.decode()
+    assert len([s for s in statements if "FROM task" in s]) == 1
+    titles = re.findall(r"<li>\s*(.+?) \(", html)
+    # open overdue work stays listed, first
+    assert titles == ["Overdue", "Standup", "Midterm", "Retro", "Later 0"]
+    assert f"overdue since {today - timedelta(days=1)}" in html
+
+    ta = app.test_client()
+    login(ta, "ta@example.com")
+    assert "Nimbus only" in ta.get("/").data.decode()
+
+    client.post(f"/tasks/{retro_id}/status", data={"status": "done"})
+    titles = re.findall(r"<li>\s*(.+?) \(", client.get("/").data.decode())
+    assert titles == ["Overdue", "Standup", "Midterm", "Later 0", "Later 1"]
+
+    # no enrollments: every course is on the dashboard, and so are its tasks
+    with app.app_context():
+        db.session.add(User(email="visitor@example.com", role="student"))
+        db.session.commit()
+    visitor = app.test_client()
+    login(visitor, "visitor@example.com")
+    titles = re.findall(r"<li>\s*(.+?) \(", visitor.get("/").data.decode())
+    assert titles == ["Overdue", "Midterm", "Later 0", "Later 1", "Later 2"]
+
+
+def test_baseline_adds_indexes_missing_from_premigration_database(tmp_path):
+    class FileConfig(Config):
+        TESTING = True
+        SEED_DEMO_DATA = False
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'old.db'}"
+
+    with create_app(FileConfig).app_context():
+        db.session.execute(db.text("DROP INDEX ix_task_upcoming"))
+        db.session.execute(db.text("DROP TABLE schema_revision"))
+        db.session.commit()
+        db.engine.dispose()
+
+    with create_app(FileConfig).app_context():
+        names = {ix["name"] for ix in inspect(db.engine).get_indexes("task")}
+        assert "ix_task_upcoming" in names
+        assert current_revision() == head()
+        db.engine.dispose()
+
+
+def test_new_database_is_stamped_at_head(app):
+    with app.app_context():
+        assert current_revision() == head()
+        assert inspect(db.engine).has_table("search_index")
+    result = app.test_cli_runner().invoke(args=["db-current"])
+    assert f"revision {head()}; latest is {head()} (up to date)" in result.output
+
+
+def test_startup_only_checks_revision_when_auto_upgrade_is_off(tmp_path):
+    class FileConfig(Config):
+        TESTING = True
+        SEED_DEMO_DATA = False
+        JOB_RUNNER = "external"
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'prod.db'}"
+
+    class ProdConfig(FileConfig):
+        SCHEMA_AUTO_UPGRADE = False
+
+    app = create_app(FileConfig)
+    runner = app.test_cli_runner()
+    result = runner.invoke(args=["db-downgrade", "1"])
+    assert "Reverted 2: FTS5 search index" in result.output
+    with app.app_context():
+        assert not inspect(db.engine).has_table("search_index")
+        db.engine.dispose()
+
+    behind = create_app(ProdConfig)
+    assert behind.extensions["search"] is False
+    assert behind.test_client().get("/auth/login").status_code == 503
+    result = behind.test_cli_runner().invoke(args=["db-upgrade"])
+    assert result.exit_code == 0, result.output
+    assert f"Database at revision {head()}." in result.output
+    with behind.app_context():
+        db.engine.dispose()
+
+    upgraded = create_app(ProdConfig)
+    assert upgraded.extensions["search"] is True
+    assert upgraded.test_client().get("/auth/login").status_code == 200
+    with upgraded.app_context():
+        db.engine.dispose()
+
+
+def test_migration_revisions_are_guarded(app):
+    runner = app.test_cli_runner()
+    result = runner.invoke(args=["db-downgrade", "0"])
+    assert result.exit_code != 0
+    assert "between 1 and" in result.output
+    with app.app_context():
+        with db.engine.begin() as conn:
+            conn.execute(db.text("UPDATE schema_revision SET revision = 1"))
+        # someone else already moved the database on: the bump must fail
+        with pytest.raises(MigrationError):
+            with db.engine.begin() as conn:
+                _set_revision(conn, 0, 1)
+
+
+def test_warm_up_fills_pool_and_template_cache(tmp_path):
+    class FileConfig(Config):
+        TESTING = True
+        SEED_DEMO_DATA = False
+        JOB_RUNNER = "external"
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'warm.db'}"
+        WARMUP_CONNECTIONS = 3
+
+    app = create_app(FileConfig)
+    timings = warm_up(app)
+    assert timings["connections"] == 3
+    templates = app.jinja_env.list_templates(extensions=["html"])
+    assert timings["templates"] == len(templates)
+    assert {name for _, name in app.jinja_env.cache.keys()} >= set(templates)
+    with app.app_context():
+        assert db.engine.pool.checkedin() == 3
+        db.engine.dispose()
+
+
+def test_gunicorn_settings_come_from_environment(monkeypatch):
+    monkeypatch.setenv("WEB_CONCURRENCY", "3")
+    monkeypatch.setenv("MICROCANVAS_THREADS", "6")
+    monkeypatch.setenv("MICROCANVAS_BIND", "127.0.0.1:9000")
+    settings = runpy.run_path(
+        os.path.join(os.path.dirname(__file__), "..", "gunicorn.conf.py")
+    )
+    assert (settings["workers"], settings["threads"]) == (3, 6)
+    assert settings["bind"] == "127.0.0.1:9000"
+    assert settings["worker_class"] == "gthread"
+    assert settings["preload_app"] is False
+
+
+def test_get_requests_read_from_replica_except_after_a_write(tmp_path):
+    path = tmp_path / "primary.db"
+
+    class ReplicaConfig(Config):
+        TESTING = True
+        SEED_DEMO_DATA = False
+        WTF_CSRF_ENABLED = False
+        JOB_RUNNER = "external"
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{path}"
+        SQLALCHEMY_READ_URI = f"sqlite:///file:{path}?mode=ro&uri=true"
+
+    app = create_app(ReplicaConfig)
+    seed_demo(app)
+    with app.app_context():
+        course = Course.query.filter_by(code="CMPE 131").first()
+        task = Task.query.filter_by(course_id=course.id).first()
+        urls = [
+            "/",
+            f"/courses/{course.id}",
+            f"/teams/{course.teams[0].id}",
+            "/analytics",
+            "/search?q=sprint",
+        ]
+        engines = {"primary": db.engine, "read": db.engines["read"]}
+    seen = dict.fromkeys(engines, 0)
+    for name, engine in engines.items():
+        event.listen(
+            engine,
+            "before_cursor_execute",
+            lambda *args, name=name, **kwargs: seen.__setitem__(name, seen[name] + 1),
+        )
+
+    client = app.test_client()
+    app.config["READ_YOUR_WRITES_SECONDS"] = 0
+    login(client, "prof@example.com")
+    seen.update(primary=0, read=0)
+    for url in urls:
+        assert client.get(url).status_code == 200, url
+    assert seen["primary"] == 0 and seen["read"] > 0
+
+    # a write pins this browser to the primary so it sees its own change
+    app.config["READ_YOUR_WRITES_SECONDS"] = 60
+    resp = client.post(f"/tasks/{task.id}/status", data={"status": "done"})
+    assert resp.status_code == 302
+    seen.update(primary=0, read=0)
+    assert client.get(f"/courses/{course.id}").status_code == 200
+    assert seen["read"] == 0 and seen["primary"] > 0
+
+    # other browsers keep reading from the replica
+    other = app.test_client()
+    app.config["READ_YOUR_WRITES_SECONDS"] = 0
+    login(other, "ta@example.com")
+    seen.update(primary=0, read=0)
+    assert other.get(f"/courses/{course.id}").status_code == 200
+    assert seen["primary"] == 0 and seen["read"] > 0
+
+    with app.app_context():
+        with pytest.raises(OperationalError, match="readonly"):
+            with db.engines["read"].begin() as conn:
+                conn.execute(db.text("DELETE FROM task"))
+        db.engine.dispose()
+        db.engines["read"].dispose()
+
+
+def test_analytics_refreshes_late_counts_from_the_primary(tmp_path):
+    primary, replica = tmp_path / "primary.db", tmp_path / "replica.db"
+
+    class ReplicaConfig(Config):
+        TESTING = True
+        SEED_DEMO_DATA = False
+        WTF_CSRF_ENABLED = False
+        JOB_RUNNER = "external"
+        LIVE_POLL_SECONDS = 0
+        READ_YOUR_WRITES_SECONDS = 0
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{primary}"
+        SQLALCHEMY_READ_URI = f"sqlite:///file:{replica}?mode=ro&uri=true"
+
+    replica.touch()
+    app = create_app(ReplicaConfig)
+    seed_demo(app)
+    yesterday = date.today() - timedelta(days=1)
+    with app.app_context():
+        db.session.execute(update(CourseTaskRollup).values(late_as_of=yesterday))
+        db.session.commit()
+        db.engine.dispose()
+        db.engines["read"].dispose()
+        # the replica lags: it has yesterday's rollups but not the change below
+        shutil.copyfile(primary, replica)
+        db.session.execute(
+            update(Task).values(due_date=yesterday, status=Task.STATUS_TODO)
+        )
+        db.session.commit()
+        overdue = dict(
+            db.session.query(Task.course_id, func.count()).group_by(Task.course_id)
+        )
+
+    client = app.test_client()
+    login(client, "prof@example.com")
+    assert client.get("/analytics").status_code == 200
+    with app.app_context():
+        rollups = CourseTaskRollup.query.all()
+        assert {r.course_id: r.late_count for r in rollups if r.course_id in overdue} == overdue
+        assert {r.late_as_of for r in rollups} == {date.today()}
+        db.engine.dispose()
+        db.engines["read"].dispose()
@@ -0,0 +1,12 @@
+"""Production entry point: ``gunicorn -c gunicorn.conf.py wsgi:app``.
+
+Each worker imports this module after the fork, so it gets its own app,
+engine and job runner, warmed up before the first request arrives.
+"""
+import os
+
+from app import create_app
+from app.warmup import warm_up
+
+app = create_app(os.environ.get("MICROCANVAS_CONFIG", "app.config.ProductionConfig"))
+warm_up(app)